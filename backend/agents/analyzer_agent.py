@@ -0,0 +1,190 @@
+"""
+Analyzer Agent - Parses a raw problem and selects a strategy in one LLM call
+Used by the fused pipeline mode in place of ParserAgent + IntentRouterAgent
+"""
+from typing import Dict, Any, List
+from agents.base_agent import BaseAgent
+from agents.parser_agent import ParserAgent
+from agents.intent_router_agent import IntentRouterAgent
+from utils.rate_limiter import QuotaExceededError
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class AnalyzerAgent(BaseAgent):
+    """Analyzer Agent - Combined parsing and intent routing"""
+
+    TEMPERATURE = 0.3
+
+    SYSTEM_PROMPT = """You are the Analyzer Agent for a JEE-level math mentor system.
+In ONE response you must (A) parse the raw problem into a structured form and
+(B) choose the best solution strategy and tools for it.
+
+PARSING RULES:
+1. Clean OCR/ASR noise aggressively (e.g., "Ol" -> "of", "SUI" -> "sum", "O" -> "0", "l" -> "1")
+2. Standardize mathematical notation
+3. Identify the topic (algebra, calculus, probability, or linear_algebra)
+4. Extract variables, constraints, and equations; treat named quantities like "N times" as parameters
+5. Make REASONABLE INFERENCES for missing information (fair dice, etc.)
+6. Only set needs_clarification=true if the problem is TRULY unsolvable without more info
+
+Available strategies: symbolic_manipulation, numerical_computation,
+step_by_step_derivation, probability_analysis, matrix_operations
+Available tools: sympy, numpy, scipy, manual
+
+STRICT OUTPUT FORMAT (JSON only):
+{
+  "parsed_problem": {
+    "problem_text": "cleaned problem statement with inferred missing parts",
+    "topic": "algebra|calculus|probability|linear_algebra",
+    "variables": ["x"],
+    "constraints": ["x is real"],
+    "equations": ["x^2 + 5x + 6 = 0"],
+    "needs_clarification": false,
+    "confidence": 0.95,
+    "reasoning": "brief explanation of parsing decisions"
+  },
+  "strategy": {
+    "strategy": "name of primary strategy",
+    "tools": ["tool1", "tool2"],
+    "approach": "detailed approach description",
+    "confidence": 0.9
+  }
+}
+"""
+
+    RESPONSE_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "parsed_problem": ParserAgent.RESPONSE_SCHEMA,
+            "strategy": IntentRouterAgent.RESPONSE_SCHEMA
+        },
+        "required": ["parsed_problem", "strategy"]
+    }
+
+    def __init__(self):
+        super().__init__(
+            name="AnalyzerAgent",
+            role="Structures math problems and selects a solution strategy"
+        )
+
+    def _build_messages(self, input_data: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Build the chat messages for a combined parse + route request"""
+        raw_text = input_data.get("raw_text", "")
+        input_type = input_data.get("input_type", "text")
+
+        logger.info(f"Analyzing input: {raw_text[:100]}...")
+
+        user_prompt = f"""Parse this mathematical problem and choose its solution strategy:
+
+Raw Input: {raw_text}
+Input Type: {input_type}
+
+Return ONLY the JSON output, no additional text."""
+
+        return [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _default_parsed_problem(self, raw_text: str, confidence: float, reasoning: str) -> Dict[str, Any]:
+        """ParserAgent-compatible fallback"""
+        return {
+            "problem_text": raw_text,
+            "topic": "unknown",
+            "variables": [],
+            "constraints": [],
+            "equations": [],
+            "needs_clarification": True,
+            "confidence": confidence,
+            "reasoning": reasoning
+        }
+
+    def _default_strategy(self, approach: str, confidence: float) -> Dict[str, Any]:
+        """IntentRouterAgent-compatible fallback"""
+        return {
+            "strategy": "manual",
+            "tools": ["manual"],
+            "approach": approach,
+            "confidence": confidence
+        }
+
+    def _parse_response(self, response: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Split the combined response into parser and router outputs"""
+        raw_text = input_data.get("raw_text", "")
+
+        # Extract JSON from response (repairing common defects)
+        combined = self._parse_json(response)
+        if combined is None:
+            logger.error("Failed to parse JSON response")
+            logger.debug(f"Response was: {response}")
+            combined = {}
+
+        parsed_problem = combined.get("parsed_problem")
+        if not isinstance(parsed_problem, dict):
+            parsed_problem = self._default_parsed_problem(
+                raw_text, 0.3, "Failed to parse problem structure"
+            )
+
+        strategy = combined.get("strategy")
+        if not isinstance(strategy, dict):
+            strategy = self._default_strategy("Solve step-by-step manually", 0.5)
+
+        return {"parsed_problem": parsed_problem, "strategy": strategy}
+
+    def _error_output(self, input_data: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        """Fallback output when analysis fails entirely"""
+        logger.error(f"Error in AnalyzerAgent: {error}")
+        return {
+            "parsed_problem": self._default_parsed_problem(
+                input_data.get("raw_text", ""), 0.0, f"Error: {str(error)}"
+            ),
+            "strategy": self._default_strategy(f"Error in routing: {str(error)}", 0.0)
+        }
+
+    def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Parse raw input and determine its solution strategy
+
+        Args:
+            input_data: {
+                "raw_text": str,
+                "input_type": "text|image|audio"
+            }
+
+        Returns:
+            {
+                "parsed_problem": Dict in ParserAgent format,
+                "strategy": Dict in IntentRouterAgent format
+            }
+        """
+        try:
+            messages = self._build_messages(input_data)
+            response = self._call_llm_json(messages, temperature=self.TEMPERATURE)
+            output = self._parse_response(response, input_data)
+
+            self.log_execution(input_data, output)
+            return output
+
+        except QuotaExceededError:
+            # Let the orchestrator stop the pipeline instead of burning more calls
+            raise
+        except Exception as e:
+            return self._error_output(input_data, e)
+
+    async def aexecute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Async variant of `execute` built on `_acall_llm`"""
+        try:
+            messages = self._build_messages(input_data)
+            response = await self._acall_llm_json(messages, temperature=self.TEMPERATURE)
+            output = self._parse_response(response, input_data)
+
+            self.log_execution(input_data, output)
+            return output
+
+        except QuotaExceededError:
+            # Let the orchestrator stop the pipeline instead of burning more calls
+            raise
+        except Exception as e:
+            return self._error_output(input_data, e)
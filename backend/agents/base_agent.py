@@ -1,46 +1,100 @@
-"""Base Agent class for multi-agent system using Gemini"""
+"""Base Agent class for multi-agent system using Gemini (or another LLMBackend)"""
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import asyncio
+import contextvars
+import hashlib
+import json
+import threading
 import time
 import re
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 
-import google.generativeai as genai  # type: ignore[attr-defined]
-
+from agents.llm_backends import LLMBackend, LLMResponse, get_llm_backend
 from utils.logger import setup_logger
 from utils.config import Config
+from utils.deadline import (
+    cancellable_asleep, cancellable_sleep, check_cancelled, time_left, with_deadline
+)
+from utils.llm_cache import ResponseCache, get_response_cache, make_cache_key
+from utils.rate_limiter import QuotaExceededError, get_rate_limiter
+from utils.request_context import current_api_key
+from utils.json_stream import IncrementalJSONParser
+from utils.json_repair import parse_json_response
+from utils.usage_tracker import LLMCallRecord, get_usage_tracker
+from utils.context_budget import get_context_budget
+from utils.latency_stats import get_model_latency_stats
+from utils.timing import record_span
 
 logger = setup_logger(__name__)
 
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor_lock = threading.Lock()
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    """Shared worker pool for hedged synchronous LLM calls"""
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(
+                max_workers=Config.LLM_HEDGE_MAX_WORKERS,
+                thread_name_prefix="llm-hedge"
+            )
+        return _hedge_executor
+
 
 class BaseAgent(ABC):
     """Base class for all agents using Gemini"""
 
-    def __init__(self, name: str, role: str):
+    # Sampling temperature for execute()/execute_stream(); agents override
+    TEMPERATURE = 0.7
+
+    # JSON schema of the agent output; requested as structured JSON output
+    # when Config.LLM_JSON_MODE is enabled
+    RESPONSE_SCHEMA: Optional[Dict[str, Any]] = None
+
+    def __init__(self,
+                 name: str,
+                 role: str,
+                 response_cache: Optional[ResponseCache] = None,
+                 backend: Optional[LLMBackend] = None):
         self.name = name
         self.role = role
-        self._model = None
+        # Generation backend; Gemini unless Config.LLM_BACKEND selects another
+        self.backend = backend or get_llm_backend()
+        # Falls back to the process-wide cache (None when caching is disabled)
+        self.response_cache = response_cache or get_response_cache()
+        self.rate_limiter = get_rate_limiter()
+        self.usage_tracker = get_usage_tracker()
+        # Token budget for RAG context and step lists in this agent's prompts
+        self.context_budget = get_context_budget(name)
+        self.latency_stats = get_model_latency_stats()
 
-    def _initialize_client(self) -> None:
-        """Lazy initialization of Gemini client and model.
+    def set_response_cache(self, response_cache: Optional[ResponseCache]) -> None:
+        """Replace (or disable with None) the response cache used by this agent"""
+        self.response_cache = response_cache
 
-        Uses GEMINI_API_KEY and GEMINI_MODEL from Config.
-        """
-        if self._model is not None:
-            return
+    def set_backend(self, backend: LLMBackend) -> None:
+        """Replace the generation backend (e.g. a ReplayBackend for load tests)"""
+        self.backend = backend
 
-        try:
-            # Ensure we have a usable model name
-            model_name = Config.GEMINI_MODEL or "gemini-1.5-flash"
+    def _model_name(self) -> str:
+        """Primary model name used for generation (and cache keys)"""
+        return Config.GEMINI_MODEL or "gemini-1.5-flash"
 
-            # Configure the client
-            genai.configure(api_key=Config.GEMINI_API_KEY)  # type: ignore[attr-defined]
+    def _model_candidates(self) -> List[str]:
+        """Ordered models to try: the primary model, then GEMINI_FALLBACK_MODELS"""
+        primary = self._model_name()
+        return [primary] + [m for m in Config.GEMINI_FALLBACK_MODELS if m != primary]
 
-            # Create model instance
-            self._model = genai.GenerativeModel(model_name)  # type: ignore[attr-defined]
-            logger.info(f"Initialized Gemini model: {model_name}")
-        except Exception as e:
-            logger.error(f"Failed to initialize Gemini client: {e}")
-            raise
+    def prompt_fingerprint(self) -> str:
+        """Hash of the agent's prompt, output schema and temperature (for result cache versions)"""
+        prompt = getattr(self, "SYSTEM_PROMPT", None) or getattr(self, "SYSTEM_PROMPT_TEMPLATE", "")
+        payload = json.dumps(
+            [self.name, prompt, self.RESPONSE_SCHEMA, self.TEMPERATURE], sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
 
     def _messages_to_prompt(self, messages: List[Dict[str, Any]]) -> str:
         """Convert chat-style messages into a single prompt string."""
@@ -51,72 +105,699 @@ class BaseAgent(ABC):
             parts.append(f"{role}: {content}")
         return "\n".join(parts)
 
-    def _call_llm(self, messages: list, temperature: float = 0.7, max_retries: int = 3) -> str:
-        """Call Gemini API with a chat-style message list with retry logic.
+    def _cached_response(self,
+                         prompt: str,
+                         temperature: float,
+                         response_schema: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Look up a response to a prompt in the response cache.
+
+        Responses are stored under the model that generated them, so every
+        model in the failover order is tried, the primary model first.
+
+        Returns:
+            The cached text, or None on a miss or when caching is disabled.
+        """
+        if self.response_cache is None:
+            return None
+        for model in self._model_candidates():
+            cached = self.response_cache.get(make_cache_key(model, prompt, temperature, response_schema))
+            if cached is not None:
+                logger.info(f"{self.name}: LLM response ({model}) served from cache")
+                return cached
+        return None
+
+    def _cache_response(self,
+                        prompt: str,
+                        temperature: float,
+                        response_schema: Optional[Dict[str, Any]],
+                        model: Optional[str],
+                        text: str) -> None:
+        """Store a response under the model that generated it.
+
+        JSON-mode responses are only stored if they parse, so a malformed one
+        is not replayed (and repaired again) on every later hit.
+        """
+        if self.response_cache is None:
+            return
+        if response_schema is not None and self._parse_json(text) is None:
+            return
+        self.response_cache.set(
+            make_cache_key(model or self._model_name(), prompt, temperature, response_schema), text
+        )
+
+    def _estimate_tokens(self, text: str) -> int:
+        """Rough token estimate (~4 characters per token) used for TPM admission."""
+        return len(text) // 4 + 1
+
+    def _acquire_quota(self,
+                       prompt: str,
+                       model: Optional[str] = None,
+                       max_wait: Optional[float] = None) -> None:
+        """Wait for a request slot from the shared rate limiter."""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(
+                current_api_key(),
+                model or self._model_name(),
+                self._estimate_tokens(prompt),
+                max_wait=max_wait
+            )
+
+    async def _aacquire_quota(self,
+                              prompt: str,
+                              model: Optional[str] = None,
+                              max_wait: Optional[float] = None) -> None:
+        """Async variant of `_acquire_quota`."""
+        if self.rate_limiter is not None:
+            await self.rate_limiter.aacquire(
+                current_api_key(),
+                model or self._model_name(),
+                self._estimate_tokens(prompt),
+                max_wait=max_wait
+            )
+
+    def _acquire_model(self, prompt: str, exclude: Tuple[str, ...] = ()) -> str:
+        """Acquire a request slot on the first candidate model that has one free.
+
+        Models other than the last candidate are only tried without waiting,
+        so a rate-limited primary fails over instead of blocking.
+
+        Args:
+            prompt: Prompt used for the TPM estimate.
+            exclude: Models that already failed for this call.
+
+        Returns:
+            The model a slot was acquired for.
+        """
+        candidates = [m for m in self._model_candidates() if m not in exclude]
+        if not candidates:
+            candidates = self._model_candidates()[-1:]
+        for model in candidates[:-1]:
+            try:
+                self._acquire_quota(prompt, model, max_wait=0.0)
+                return model
+            except QuotaExceededError:
+                logger.info(f"{self.name}: no request slot for {model}, failing over")
+        self._acquire_quota(prompt, candidates[-1])
+        return candidates[-1]
+
+    async def _aacquire_model(self, prompt: str, exclude: Tuple[str, ...] = ()) -> str:
+        """Async variant of `_acquire_model`."""
+        candidates = [m for m in self._model_candidates() if m not in exclude]
+        if not candidates:
+            candidates = self._model_candidates()[-1:]
+        for model in candidates[:-1]:
+            try:
+                await self._aacquire_quota(prompt, model, max_wait=0.0)
+                return model
+            except QuotaExceededError:
+                logger.info(f"{self.name}: no request slot for {model}, failing over")
+        await self._aacquire_quota(prompt, candidates[-1])
+        return candidates[-1]
+
+    def _record_output_tokens(self, response: Optional[LLMResponse], model: Optional[str] = None) -> None:
+        """Charge output tokens reported by the backend against the TPM budget."""
+        if self.rate_limiter is not None and response is not None:
+            self.rate_limiter.record_tokens(
+                current_api_key(),
+                model or self._model_name(),
+                response.usage.get("output_tokens", 0)
+            )
+
+    def _record_call(self,
+                     prompt: str,
+                     started: float,
+                     response: Optional[LLMResponse] = None,
+                     cached: bool = False,
+                     streamed: bool = False,
+                     error: Optional[Exception] = None,
+                     model: Optional[str] = None) -> None:
+        """Record token usage, wall time and prompt size for one LLM call.
+
+        Args:
+            prompt: Flattened prompt sent to the backend.
+            started: `time.perf_counter()` value taken before the call.
+            response: Backend response (the final chunk when streaming).
+            cached: Whether the response came from the response cache.
+            streamed: Whether the call used the streaming API.
+            error: Exception raised by the backend, if the call failed.
+            model: Model that served the call (default: primary model).
+        """
+        ended = time.perf_counter()
+        model = model or self._model_name()
+        status = "ok" if error is None else "error"
+        record_span("llm_call", started, ended, agent=self.name, model=model,
+                    cached=cached, streamed=streamed, status=status)
+
+        usage = response.usage if response is not None else {}
+        if cached:
+            prompt_tokens = 0
+        else:
+            # Fall back to the estimate when the backend reports no usage
+            prompt_tokens = usage.get("prompt_tokens") or self._estimate_tokens(prompt)
+        output_tokens = usage.get("output_tokens", 0)
+        self.usage_tracker.record(LLMCallRecord(
+            agent=self.name,
+            model=model,
+            backend=self.backend.name,
+            prompt_chars=len(prompt),
+            prompt_tokens=prompt_tokens,
+            output_tokens=output_tokens,
+            total_tokens=usage.get("total_tokens") or prompt_tokens + output_tokens,
+            latency_ms=(ended - started) * 1000.0,
+            cached=cached,
+            streamed=streamed,
+            status=status,
+            error=str(error)[:200] if error is not None else None
+        ))
+
+    def _response_text(self,
+                       response: LLMResponse,
+                       prompt: str,
+                       temperature: float,
+                       response_schema: Optional[Dict[str, Any]]) -> str:
+        """Extract the text from a backend response and store it in the cache."""
+        text = response.text
+        if not text:
+            logger.error("LLM response had no text content.")
+            raise ValueError("LLM response had no text content.")
+        self._cache_response(prompt, temperature, response_schema, response.model, text)
+        return text
+
+    @staticmethod
+    def _is_quota_error(error: Exception) -> bool:
+        """Whether a backend error is a quota / rate limit (429) error."""
+        error_msg = str(error)
+        return "429" in error_msg or "quota" in error_msg.lower()
+
+    def _penalize_quota(self, error: Exception, model: str) -> None:
+        """Tell the shared limiter about a 429 so other agents and sessions back off too."""
+        if self.rate_limiter is not None and self._is_quota_error(error):
+            error_msg = str(error)
+            self.rate_limiter.penalize(
+                current_api_key(),
+                model,
+                self._extract_retry_delay(error_msg),
+                daily="PerDay" in error_msg
+            )
+
+    def _is_valid_response(self,
+                           response: LLMResponse,
+                           response_schema: Optional[Dict[str, Any]]) -> bool:
+        """Whether a response is usable (non-empty, and parseable JSON in JSON mode)."""
+        if not response.text:
+            return False
+        return response_schema is None or self._parse_json(response.text) is not None
+
+    def _hedge_delay(self, model: str) -> float:
+        """Seconds to wait for a model before sending a hedged request."""
+        delay_ms = None
+        if self.latency_stats.count(model) >= Config.LLM_HEDGE_MIN_SAMPLES:
+            delay_ms = self.latency_stats.percentile(model, Config.LLM_HEDGE_PERCENTILE)
+        if delay_ms is None:
+            delay_ms = Config.LLM_HEDGE_DEFAULT_DELAY_MS
+        return delay_ms / 1000.0
+
+    def _hedge_model(self, model: str, exclude: Tuple[str, ...]) -> Optional[str]:
+        """Next candidate after `model` to hedge to, if hedging is enabled."""
+        if not Config.LLM_HEDGE_ENABLED:
+            return None
+        candidates = [m for m in self._model_candidates() if m not in exclude]
+        if model in candidates and candidates.index(model) + 1 < len(candidates):
+            return candidates[candidates.index(model) + 1]
+        return None
+
+    def _generate_once(self,
+                       prompt: str,
+                       model: str,
+                       temperature: float,
+                       response_schema: Optional[Dict[str, Any]]) -> LLMResponse:
+        """One backend call on a model whose request slot is already acquired."""
+        check_cancelled()
+        started = time.perf_counter()
+        try:
+            response = self.backend.generate(prompt, model, temperature, response_schema)
+        except Exception as e:
+            self._record_call(prompt, started, error=e, model=model)
+            self._penalize_quota(e, model)
+            raise
+        self._record_call(prompt, started, response, model=model)
+        self.latency_stats.observe(model, (time.perf_counter() - started) * 1000.0)
+        self._record_output_tokens(response, model)
+        response.model = model
+        return response
+
+    async def _agenerate_once(self,
+                              prompt: str,
+                              model: str,
+                              temperature: float,
+                              response_schema: Optional[Dict[str, Any]]) -> LLMResponse:
+        """Async variant of `_generate_once`; abandoned at the request deadline."""
+        check_cancelled()
+        started = time.perf_counter()
+        try:
+            response = await with_deadline(
+                self.backend.agenerate(prompt, model, temperature, response_schema)
+            )
+        except Exception as e:
+            self._record_call(prompt, started, error=e, model=model)
+            self._penalize_quota(e, model)
+            raise
+        self._record_call(prompt, started, response, model=model)
+        self.latency_stats.observe(model, (time.perf_counter() - started) * 1000.0)
+        self._record_output_tokens(response, model)
+        response.model = model
+        return response
+
+    def _generate_hedged(self,
+                         prompt: str,
+                         model: str,
+                         hedge_model: Optional[str],
+                         temperature: float,
+                         response_schema: Optional[Dict[str, Any]]) -> LLMResponse:
+        """Call `model`; if it is slower than its latency percentile, also call
+        `hedge_model` and return the first valid response.
+
+        The slower request is not cancelled (the HTTP call cannot be aborted);
+        its result is discarded.
+        """
+        if hedge_model is None:
+            return self._generate_once(prompt, model, temperature, response_schema)
+
+        executor = _get_hedge_executor()
+        primary = executor.submit(
+            contextvars.copy_context().run,
+            self._generate_once, prompt, model, temperature, response_schema
+        )
+        done, _ = wait([primary], timeout=time_left(self._hedge_delay(model)))
+        if done:
+            return primary.result()
+
+        try:
+            self._acquire_quota(prompt, hedge_model, max_wait=0.0)
+        except QuotaExceededError:
+            return self._future_result(primary)
+        logger.info(f"{self.name}: {model} is slow, hedging with {hedge_model}")
+        hedge = executor.submit(
+            contextvars.copy_context().run,
+            self._generate_once, prompt, hedge_model, temperature, response_schema
+        )
+
+        pending = {primary, hedge}
+        fallback: Optional[LLMResponse] = None
+        first_error: Optional[Exception] = None
+        while pending:
+            done, pending = wait(pending, timeout=time_left(), return_when=FIRST_COMPLETED)
+            check_cancelled()
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    first_error = first_error or e
+                    continue
+                if self._is_valid_response(response, response_schema):
+                    return response
+                fallback = fallback or response
+        if fallback is not None:
+            return fallback
+        raise first_error  # type: ignore[misc]
+
+    @staticmethod
+    def _future_result(future: Future) -> Any:
+        """`future.result()`, given up on at the request deadline."""
+        wait([future], timeout=time_left())
+        check_cancelled()
+        return future.result()
+
+    async def _agenerate_hedged(self,
+                                prompt: str,
+                                model: str,
+                                hedge_model: Optional[str],
+                                temperature: float,
+                                response_schema: Optional[Dict[str, Any]]) -> LLMResponse:
+        """Async variant of `_generate_hedged`; the losing request is cancelled."""
+        if hedge_model is None:
+            return await self._agenerate_once(prompt, model, temperature, response_schema)
+
+        primary = asyncio.ensure_future(
+            self._agenerate_once(prompt, model, temperature, response_schema)
+        )
+        done, _ = await asyncio.wait({primary}, timeout=time_left(self._hedge_delay(model)))
+        if done:
+            return primary.result()
+
+        try:
+            await self._aacquire_quota(prompt, hedge_model, max_wait=0.0)
+        except QuotaExceededError:
+            return await primary
+        logger.info(f"{self.name}: {model} is slow, hedging with {hedge_model}")
+        hedge = asyncio.ensure_future(
+            self._agenerate_once(prompt, hedge_model, temperature, response_schema)
+        )
+
+        pending = {primary, hedge}
+        fallback: Optional[LLMResponse] = None
+        first_error: Optional[Exception] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        first_error = first_error or task.exception()
+                        continue
+                    if self._is_valid_response(task.result(), response_schema):
+                        return task.result()
+                    fallback = fallback or task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+        if fallback is not None:
+            return fallback
+        raise first_error  # type: ignore[misc]
+
+    def _generate(self,
+                  prompt: str,
+                  temperature: float,
+                  response_schema: Optional[Dict[str, Any]]) -> LLMResponse:
+        """Generate with hedging, failing over to the next model on 429.
+
+        Raises:
+            QuotaExceededError if no model has a request slot, or the backend
+            error of the last model tried.
+        """
+        failed: Tuple[str, ...] = ()
+        while True:
+            model = self._acquire_model(prompt, failed)
+            try:
+                return self._generate_hedged(
+                    prompt, model, self._hedge_model(model, failed), temperature, response_schema
+                )
+            except QuotaExceededError:
+                raise
+            except Exception as e:
+                failed += (model,)
+                remaining = [m for m in self._model_candidates() if m not in failed]
+                if not self._is_quota_error(e) or not remaining:
+                    raise
+                logger.warning(f"{self.name}: quota exceeded on {model}, failing over to {remaining[0]}")
+
+    async def _agenerate(self,
+                         prompt: str,
+                         temperature: float,
+                         response_schema: Optional[Dict[str, Any]]) -> LLMResponse:
+        """Async variant of `_generate`."""
+        failed: Tuple[str, ...] = ()
+        while True:
+            model = await self._aacquire_model(prompt, failed)
+            try:
+                return await self._agenerate_hedged(
+                    prompt, model, self._hedge_model(model, failed), temperature, response_schema
+                )
+            except QuotaExceededError:
+                raise
+            except Exception as e:
+                failed += (model,)
+                remaining = [m for m in self._model_candidates() if m not in failed]
+                if not self._is_quota_error(e) or not remaining:
+                    raise
+                logger.warning(f"{self.name}: quota exceeded on {model}, failing over to {remaining[0]}")
+
+    def _retry_delay_for(self, error: Exception, attempt: int, max_retries: int) -> float:
+        """Decide whether a failed LLM call should be retried.
+
+        Args:
+            error: Exception raised by the LLM backend.
+            attempt: Zero-based attempt number that failed.
+            max_retries: Maximum number of attempts.
+
+        Returns:
+            Seconds to wait before the next attempt.
+
+        Raises:
+            The original error for non-quota failures, or QuotaExceededError
+            once retries are exhausted or, with the rate limiter on, the
+            server asks for a longer wait than RATE_LIMIT_MAX_WAIT_SECONDS.
+        """
+        error_msg = str(error)
+
+        # Check if it's a quota error (429)
+        if self._is_quota_error(error):
+            # Try to extract retry delay from error message
+            retry_delay = self._extract_retry_delay(error_msg)
+
+            within_wait = self.rate_limiter is None or retry_delay <= Config.RATE_LIMIT_MAX_WAIT_SECONDS
+            if attempt < max_retries - 1 and within_wait:
+                logger.warning(
+                    f"Quota exceeded. Retrying in {retry_delay} seconds "
+                    f"(attempt {attempt + 1}/{max_retries})..."
+                )
+                # With a limiter the next acquire already waits out the penalty
+                return 0.0 if self.rate_limiter is not None else retry_delay
+
+            logger.error(
+                f"Quota exceeded after {attempt + 1} attempts. "
+                "Please wait and try again later."
+            )
+            raise QuotaExceededError(
+                f"API quota exceeded. "
+                f"Please wait {retry_delay:.0f} seconds or upgrade your plan at "
+                "https://ai.google.dev/gemini-api/docs/rate-limits",
+                retry_after=retry_delay
+            )
+
+        # Non-quota error, raise immediately
+        logger.error(f"Error calling LLM ({self.backend.name}): {error}")
+        raise error
+
+    def _call_llm(self,
+                  messages: list,
+                  temperature: float = 0.7,
+                  max_retries: int = 3,
+                  response_schema: Optional[Dict[str, Any]] = None) -> str:
+        """Call the LLM backend with a chat-style message list with retry logic.
 
         Args:
             messages: List of message dicts with 'role' and 'content'.
             temperature: Sampling temperature.
             max_retries: Maximum number of retry attempts for quota errors.
+            response_schema: Request JSON output conforming to this schema.
 
         Returns:
             Response content as string.
         """
-        self._initialize_client()
         prompt = self._messages_to_prompt(messages)
+        started = time.perf_counter()
+        cached = self._cached_response(prompt, temperature, response_schema)
+        if cached is not None:
+            self._record_call(prompt, started, cached=True)
+            return cached
 
-        last_error = None
         for attempt in range(max_retries):
+            check_cancelled()
             try:
-                response = self._model.generate_content(  # type: ignore[operator]
-                    prompt,
-                    generation_config={
-                        "temperature": temperature,
-                    },
-                )
-                # google-generativeai responses expose `.text` for the main content
-                text = getattr(response, "text", None)
-                if not text:
-                    logger.error("Gemini response had no text content.")
-                    raise ValueError("Gemini response had no text content.")
-                return text
-                
+                response = self._generate(prompt, temperature, response_schema)
+            except QuotaExceededError:
+                raise
             except Exception as e:
-                last_error = e
-                error_msg = str(e)
-                
-                # Check if it's a quota error (429)
-                if "429" in error_msg or "quota" in error_msg.lower():
-                    # Try to extract retry delay from error message
-                    retry_delay = self._extract_retry_delay(error_msg)
-                    
-                    if attempt < max_retries - 1:
-                        logger.warning(
-                            f"Quota exceeded. Retrying in {retry_delay} seconds "
-                            f"(attempt {attempt + 1}/{max_retries})..."
-                        )
-                        time.sleep(retry_delay)
-                        continue
-                    else:
-                        logger.error(
-                            f"Quota exceeded after {max_retries} attempts. "
-                            "Please wait and try again later."
-                        )
-                        raise Exception(
-                            f"API quota exceeded. You've used all 20 requests for today. "
-                            f"Please wait {retry_delay} seconds or upgrade your plan at "
-                            "https://ai.google.dev/gemini-api/docs/rate-limits"
-                        )
-                else:
-                    # Non-quota error, raise immediately
-                    logger.error(f"Error calling Gemini LLM: {e}")
-                    raise
-        
-        # If we exhausted all retries, raise the last error
-        if last_error:
-            raise last_error
+                cancellable_sleep(self._retry_delay_for(e, attempt, max_retries))
+                continue
+            return self._response_text(response, prompt, temperature, response_schema)
+
         raise Exception("Failed to call LLM after all retries")
-    
+
+    async def _acall_llm(self,
+                         messages: list,
+                         temperature: float = 0.7,
+                         max_retries: int = 3,
+                         response_schema: Optional[Dict[str, Any]] = None) -> str:
+        """Async variant of `_call_llm` using the backend's async client.
+
+        Retries wait on the event loop, so a quota backoff does not block
+        other solves sharing it.
+
+        Args:
+            messages: List of message dicts with 'role' and 'content'.
+            temperature: Sampling temperature.
+            max_retries: Maximum number of retry attempts for quota errors.
+            response_schema: Request JSON output conforming to this schema.
+
+        Returns:
+            Response content as string.
+        """
+        prompt = self._messages_to_prompt(messages)
+        started = time.perf_counter()
+        cached = self._cached_response(prompt, temperature, response_schema)
+        if cached is not None:
+            self._record_call(prompt, started, cached=True)
+            return cached
+
+        for attempt in range(max_retries):
+            check_cancelled()
+            try:
+                response = await self._agenerate(prompt, temperature, response_schema)
+            except QuotaExceededError:
+                raise
+            except Exception as e:
+                await cancellable_asleep(self._retry_delay_for(e, attempt, max_retries))
+                continue
+            return self._response_text(response, prompt, temperature, response_schema)
+
+        raise Exception("Failed to call LLM after all retries")
+
+    def _stream_llm(self,
+                    messages: list,
+                    temperature: float = 0.7,
+                    max_retries: int = 3,
+                    response_schema: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """Stream an LLM response chunk by chunk.
+
+        Quota retries and model failover only happen before the first chunk
+        arrives; once text has been yielded a failure is raised to the caller.
+        Streams are not hedged. A cache hit is yielded as a single chunk.
+
+        Args:
+            messages: List of message dicts with 'role' and 'content'.
+            temperature: Sampling temperature.
+            max_retries: Maximum number of retry attempts for quota errors.
+            response_schema: Request JSON output conforming to this schema.
+
+        Yields:
+            Text chunks as they arrive.
+        """
+        prompt = self._messages_to_prompt(messages)
+        started = time.perf_counter()
+        cached = self._cached_response(prompt, temperature, response_schema)
+        if cached is not None:
+            self._record_call(prompt, started, cached=True, streamed=True)
+            yield cached
+            return
+
+        chunks: List[str] = []
+        attempt = 0
+        failed: Tuple[str, ...] = ()
+        while attempt < max_retries:
+            check_cancelled()
+            model = self._acquire_model(prompt, failed)
+            started = time.perf_counter()
+            try:
+                last_chunk = None
+                for chunk in self.backend.stream(prompt, model, temperature, response_schema):
+                    check_cancelled()
+                    last_chunk = chunk
+                    if chunk.text:
+                        chunks.append(chunk.text)
+                        yield chunk.text
+                # Usage is reported on the final chunk
+                served_model = model
+                self._record_output_tokens(last_chunk, model)
+                self._record_call(prompt, started, last_chunk, streamed=True, model=model)
+                break
+            except Exception as e:
+                self._record_call(prompt, started, streamed=True, error=e, model=model)
+                if chunks:
+                    logger.error(f"LLM stream failed after partial output: {e}")
+                    raise
+                self._penalize_quota(e, model)
+                failed += (model,)
+                remaining = [m for m in self._model_candidates() if m not in failed]
+                if self._is_quota_error(e) and remaining:
+                    # Fail over immediately instead of waiting out the 429
+                    logger.warning(f"{self.name}: quota exceeded on {model}, failing over to {remaining[0]}")
+                    continue
+                cancellable_sleep(self._retry_delay_for(e, attempt, max_retries))
+                attempt += 1
+                failed = ()
+        else:
+            raise Exception("Failed to call LLM after all retries")
+
+        full_text = "".join(chunks)
+        if not full_text:
+            logger.error("LLM response had no text content.")
+            raise ValueError("LLM response had no text content.")
+        self._cache_response(prompt, temperature, response_schema, served_model, full_text)
+
+    def _response_schema(self) -> Optional[Dict[str, Any]]:
+        """Schema to request structured output with, if JSON mode is on"""
+        return self.RESPONSE_SCHEMA if Config.LLM_JSON_MODE else None
+
+    def _parse_json(self, response: str) -> Optional[Dict[str, Any]]:
+        """Decode a JSON object from an LLM response, repairing it locally if needed.
+
+        Returns:
+            The decoded object, or None if the response is not repairable.
+        """
+        value = parse_json_response(response)
+        return value if isinstance(value, dict) else None
+
+    def _repair_messages(self, response: str) -> List[Dict[str, str]]:
+        """Minimal prompt asking the model to fix its own malformed JSON"""
+        schema = json.dumps(self.RESPONSE_SCHEMA) if self.RESPONSE_SCHEMA else "a single JSON object"
+        return [{
+            "role": "user",
+            "content": (
+                "The text below was meant to be valid JSON matching this schema but "
+                f"could not be parsed.\nSchema: {schema}\n"
+                "Rewrite it as valid JSON with the same content. Escape every "
+                "backslash (write \\\\frac, not \\frac). Return ONLY the JSON.\n\n"
+                f"{response[:4000]}"
+            )
+        }]
+
+    def _ensure_json(self, response: str) -> str:
+        """Re-ask once with a repair prompt if a response is not parseable JSON.
+
+        Args:
+            response: Raw LLM response.
+
+        Returns:
+            The original response if it parses (possibly after local repair),
+            otherwise the re-asked response (which may still be invalid).
+        """
+        if not Config.LLM_JSON_REASK or self._parse_json(response) is not None:
+            return response
+        logger.warning(f"{self.name}: unparseable JSON response, re-asking once")
+        try:
+            return self._call_llm(
+                self._repair_messages(response),
+                temperature=0.0,
+                response_schema=self._response_schema()
+            )
+        except QuotaExceededError:
+            raise
+        except Exception as e:
+            logger.error(f"{self.name}: JSON repair request failed: {e}")
+            return response
+
+    async def _aensure_json(self, response: str) -> str:
+        """Async variant of `_ensure_json`."""
+        if not Config.LLM_JSON_REASK or self._parse_json(response) is not None:
+            return response
+        logger.warning(f"{self.name}: unparseable JSON response, re-asking once")
+        try:
+            return await self._acall_llm(
+                self._repair_messages(response),
+                temperature=0.0,
+                response_schema=self._response_schema()
+            )
+        except QuotaExceededError:
+            raise
+        except Exception as e:
+            logger.error(f"{self.name}: JSON repair request failed: {e}")
+            return response
+
+    def _call_llm_json(self, messages: list, temperature: float = 0.7) -> str:
+        """`_call_llm` with structured JSON output and one repair re-ask."""
+        response = self._call_llm(
+            messages, temperature=temperature, response_schema=self._response_schema()
+        )
+        return self._ensure_json(response)
+
+    async def _acall_llm_json(self, messages: list, temperature: float = 0.7) -> str:
+        """Async variant of `_call_llm_json`."""
+        response = await self._acall_llm(
+            messages, temperature=temperature, response_schema=self._response_schema()
+        )
+        return await self._aensure_json(response)
+
     def _extract_retry_delay(self, error_msg: str) -> float:
         """Extract retry delay from error message or use exponential backoff.
         
@@ -152,6 +833,66 @@ class BaseAgent(ABC):
         """
         raise NotImplementedError
 
+    def _build_messages(self, input_data: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Build the chat messages for a request (implemented by agents)"""
+        raise NotImplementedError
+
+    def _parse_response(self, response: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Turn the full LLM response into the agent output (implemented by agents)"""
+        raise NotImplementedError
+
+    def _error_output(self, input_data: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        """Fallback output when the agent fails (implemented by agents)"""
+        raise NotImplementedError
+
+    def execute_stream(self, input_data: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Execute agent logic, yielding output fields as they stream in
+
+        Args:
+            input_data: Input data for the agent
+
+        Yields:
+            {"type": "field", "agent": str, "field": str, "value": Any} for each
+            top-level JSON field as soon as it is complete, then
+            {"type": "result", "agent": str, "output": Dict} with the same
+            output `execute` would return
+        """
+        try:
+            messages = self._build_messages(input_data)
+            parser = IncrementalJSONParser()
+            chunks = []
+            for chunk in self._stream_llm(messages,
+                                          temperature=self.TEMPERATURE,
+                                          response_schema=self._response_schema()):
+                chunks.append(chunk)
+                for field, value in parser.feed(chunk):
+                    yield {"type": "field", "agent": self.name, "field": field, "value": value}
+            response = self._ensure_json("".join(chunks))
+            output = self._parse_response(response, input_data)
+            self.log_execution(input_data, output)
+        except QuotaExceededError:
+            raise
+        except Exception as e:
+            output = self._error_output(input_data, e)
+
+        yield {"type": "result", "agent": self.name, "output": output}
+
+    async def aexecute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Execute agent logic without blocking the event loop
+
+        Agents override this with a native implementation on `_acall_llm`;
+        the default runs `execute` in a worker thread.
+
+        Args:
+            input_data: Input data for the agent
+
+        Returns:
+            Output data from the agent
+        """
+        return await asyncio.to_thread(self.execute, input_data)
+
     def log_execution(self, input_data: Dict, output_data: Dict) -> None:
         """Log agent execution"""
         logger.info(f"Agent {self.name} executed successfully")
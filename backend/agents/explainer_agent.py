@@ -1,9 +1,9 @@
 """
 Explainer/Tutor Agent - Provides student-friendly explanations
 """
-import json
-from typing import Dict, Any
+from typing import Dict, Any, List
 from agents.base_agent import BaseAgent
+from utils.rate_limiter import QuotaExceededError
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -12,44 +12,9 @@ logger = setup_logger(__name__)
 class ExplainerAgent(BaseAgent):
     """Explainer Agent - Creates student-friendly explanations"""
     
-    def __init__(self):
-        super().__init__(
-            name="ExplainerAgent",
-            role="Provides clear, student-friendly explanations"
-        )
+    TEMPERATURE = 0.5
     
-    def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Generate student-friendly explanation
-        
-        Args:
-            input_data: {
-                "parsed_problem": Dict,
-                "solution": Dict,
-                "verification": Dict
-            }
-            
-        Returns:
-            {
-                "explanation": str,
-                "key_concepts": List[str],
-                "common_mistakes": List[str],
-                "tips": List[str]
-            }
-        """
-        try:
-            parsed_problem = input_data.get("parsed_problem", {})
-            solution = input_data.get("solution", {})
-            verification = input_data.get("verification", {})
-            
-            problem_text = parsed_problem.get("problem_text", "")
-            topic = parsed_problem.get("topic", "")
-            steps = solution.get("steps", [])
-            final_answer = solution.get("final_answer", "")
-            
-            logger.info("Generating student-friendly explanation...")
-            
-            system_prompt = """You are an Explainer/Tutor Agent for JEE-level mathematics.
+    SYSTEM_PROMPT = """You are an Explainer/Tutor Agent for JEE-level mathematics.
 Your job is to create clear, student-friendly explanations that help students understand the solution.
 
 You must:
@@ -70,8 +35,37 @@ STRICT OUTPUT FORMAT (JSON only):
   "tips": ["helpful tip 1", "helpful tip 2"]
 }
 """
-            
-            user_prompt = f"""Create a student-friendly explanation for this solution:
+    
+    RESPONSE_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "explanation": {"type": "string"},
+            "key_concepts": {"type": "array", "items": {"type": "string"}},
+            "common_mistakes": {"type": "array", "items": {"type": "string"}},
+            "tips": {"type": "array", "items": {"type": "string"}}
+        },
+        "required": ["explanation", "key_concepts"]
+    }
+    
+    def __init__(self):
+        super().__init__(
+            name="ExplainerAgent",
+            role="Provides clear, student-friendly explanations"
+        )
+    
+    def _build_messages(self, input_data: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Build the chat messages for an explanation request"""
+        parsed_problem = input_data.get("parsed_problem", {})
+        solution = input_data.get("solution", {})
+
+        problem_text = parsed_problem.get("problem_text", "")
+        topic = parsed_problem.get("topic", "")
+        steps = self.context_budget.steps(solution.get("steps", []))
+        final_answer = solution.get("final_answer", "")
+
+        logger.info("Generating student-friendly explanation...")
+
+        user_prompt = f"""Create a student-friendly explanation for this solution:
 
 Problem: {problem_text}
 Topic: {topic}
@@ -82,42 +76,85 @@ Solution Steps:
 Final Answer: {final_answer}
 
 Make it clear, encouraging, and educational. Return ONLY the JSON output."""
+
+        return [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _parse_response(self, response: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract the explanation from the LLM response"""
+        topic = input_data.get("parsed_problem", {}).get("topic", "")
+
+        # Extract JSON from response (repairing common defects)
+        output = self._parse_json(response)
+        if output is None:
+            logger.error("Failed to parse JSON response")
+            logger.debug(f"Response was: {response}")
+            output = {
+                "explanation": response[:1000],
+                "key_concepts": [topic],
+                "common_mistakes": [],
+                "tips": []
+            }
+
+        return output
+
+    def _error_output(self, input_data: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        """Fallback explanation when generation fails entirely"""
+        logger.error(f"Error in ExplainerAgent: {error}")
+        return {
+            "explanation": f"Error generating explanation: {str(error)}",
+            "key_concepts": [],
+            "common_mistakes": [],
+            "tips": []
+        }
+
+    def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Generate student-friendly explanation
+        
+        Args:
+            input_data: {
+                "parsed_problem": Dict,
+                "solution": Dict,
+                "verification": Dict
+            }
             
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
-            
-            response = self._call_llm(messages, temperature=0.5)
-            
-            # Extract JSON from response
-            try:
-                start_idx = response.find('{')
-                end_idx = response.rfind('}') + 1
-                if start_idx >= 0 and end_idx > start_idx:
-                    json_str = response[start_idx:end_idx]
-                    output = json.loads(json_str)
-                else:
-                    output = json.loads(response)
-                    
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON response: {e}")
-                logger.debug(f"Response was: {response}")
-                output = {
-                    "explanation": response[:1000],
-                    "key_concepts": [topic],
-                    "common_mistakes": [],
-                    "tips": []
-                }
+        Returns:
+            {
+                "explanation": str,
+                "key_concepts": List[str],
+                "common_mistakes": List[str],
+                "tips": List[str]
+            }
+        """
+        try:
+            messages = self._build_messages(input_data)
+            response = self._call_llm_json(messages, temperature=self.TEMPERATURE)
+            output = self._parse_response(response, input_data)
             
             self.log_execution(input_data, output)
             return output
             
+        except QuotaExceededError:
+            # Let the orchestrator stop the pipeline instead of burning more calls
+            raise
         except Exception as e:
-            logger.error(f"Error in ExplainerAgent: {e}")
-            return {
-                "explanation": f"Error generating explanation: {str(e)}",
-                "key_concepts": [],
-                "common_mistakes": [],
-                "tips": []
-            }
+            return self._error_output(input_data, e)
+
+    async def aexecute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Async variant of `execute` built on `_acall_llm`"""
+        try:
+            messages = self._build_messages(input_data)
+            response = await self._acall_llm_json(messages, temperature=self.TEMPERATURE)
+            output = self._parse_response(response, input_data)
+
+            self.log_execution(input_data, output)
+            return output
+
+        except QuotaExceededError:
+            # Let the orchestrator stop the pipeline instead of burning more calls
+            raise
+        except Exception as e:
+            return self._error_output(input_data, e)
@@ -1,9 +1,9 @@
 """
 Intent Router Agent - Selects solution strategy and tools
 """
-import json
-from typing import Dict, Any
+from typing import Dict, Any, List
 from agents.base_agent import BaseAgent
+from utils.rate_limiter import QuotaExceededError
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -11,38 +11,10 @@ logger = setup_logger(__name__)
 
 class IntentRouterAgent(BaseAgent):
     """Intent Router Agent - Routes problems to appropriate solution strategies"""
-    
-    def __init__(self):
-        super().__init__(
-            name="IntentRouterAgent",
-            role="Determines solution strategy and required tools"
-        )
-    
-    def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Determine solution strategy based on parsed problem
-        
-        Args:
-            input_data: {
-                "parsed_problem": Dict from ParserAgent
-            }
-            
-        Returns:
-            {
-                "strategy": str,
-                "tools": List[str],
-                "approach": str,
-                "confidence": float
-            }
-        """
-        try:
-            parsed_problem = input_data.get("parsed_problem", {})
-            topic = parsed_problem.get("topic", "unknown")
-            problem_text = parsed_problem.get("problem_text", "")
-            
-            logger.info(f"Routing problem with topic: {topic}")
-            
-            system_prompt = """You are an Intent Router Agent for a JEE-level math mentor.
+
+    TEMPERATURE = 0.3
+
+    SYSTEM_PROMPT = """You are an Intent Router Agent for a JEE-level math mentor.
 Your job is to analyze a parsed problem and determine the best solution strategy and tools.
 
 Available strategies:
@@ -66,8 +38,33 @@ STRICT OUTPUT FORMAT (JSON only):
   "confidence": 0.9
 }
 """
-            
-            user_prompt = f"""Determine the solution strategy for this problem:
+
+    RESPONSE_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "strategy": {"type": "string"},
+            "tools": {"type": "array", "items": {"type": "string"}},
+            "approach": {"type": "string"},
+            "confidence": {"type": "number"}
+        },
+        "required": ["strategy", "tools", "approach", "confidence"]
+    }
+
+    def __init__(self):
+        super().__init__(
+            name="IntentRouterAgent",
+            role="Determines solution strategy and required tools"
+        )
+
+    def _build_messages(self, input_data: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Build the chat messages for a routing request"""
+        parsed_problem = input_data.get("parsed_problem", {})
+        topic = parsed_problem.get("topic", "unknown")
+        problem_text = parsed_problem.get("problem_text", "")
+
+        logger.info(f"Routing problem with topic: {topic}")
+
+        user_prompt = f"""Determine the solution strategy for this problem:
 
 Topic: {topic}
 Problem: {problem_text}
@@ -75,41 +72,81 @@ Variables: {parsed_problem.get('variables', [])}
 Equations: {parsed_problem.get('equations', [])}
 
 Return ONLY the JSON output."""
-            
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
-            
-            response = self._call_llm(messages, temperature=0.3)
-            
-            # Extract JSON from response
-            try:
-                start_idx = response.find('{')
-                end_idx = response.rfind('}') + 1
-                if start_idx >= 0 and end_idx > start_idx:
-                    json_str = response[start_idx:end_idx]
-                    output = json.loads(json_str)
-                else:
-                    output = json.loads(response)
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON response: {e}")
-                # Return default strategy
-                output = {
-                    "strategy": "manual",
-                    "tools": ["manual"],
-                    "approach": "Solve step-by-step manually",
-                    "confidence": 0.5
-                }
-            
-            self.log_execution(input_data, output)
-            return output
-            
-        except Exception as e:
-            logger.error(f"Error in IntentRouterAgent: {e}")
-            return {
+
+        return [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _parse_response(self, response: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract the strategy from the LLM response"""
+        # Extract JSON from response (repairing common defects)
+        output = self._parse_json(response)
+        if output is None:
+            logger.error("Failed to parse JSON response")
+            # Return default strategy
+            output = {
                 "strategy": "manual",
                 "tools": ["manual"],
-                "approach": f"Error in routing: {str(e)}",
-                "confidence": 0.0
+                "approach": "Solve step-by-step manually",
+                "confidence": 0.5
+            }
+
+        return output
+
+    def _error_output(self, input_data: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        """Fallback strategy when routing fails entirely"""
+        logger.error(f"Error in IntentRouterAgent: {error}")
+        return {
+            "strategy": "manual",
+            "tools": ["manual"],
+            "approach": f"Error in routing: {str(error)}",
+            "confidence": 0.0
+        }
+
+    def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Determine solution strategy based on parsed problem
+
+        Args:
+            input_data: {
+                "parsed_problem": Dict from ParserAgent
             }
+
+        Returns:
+            {
+                "strategy": str,
+                "tools": List[str],
+                "approach": str,
+                "confidence": float
+            }
+        """
+        try:
+            messages = self._build_messages(input_data)
+            response = self._call_llm_json(messages, temperature=self.TEMPERATURE)
+            output = self._parse_response(response, input_data)
+
+            self.log_execution(input_data, output)
+            return output
+
+        except QuotaExceededError:
+            # Let the orchestrator stop the pipeline instead of burning more calls
+            raise
+        except Exception as e:
+            return self._error_output(input_data, e)
+
+    async def aexecute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Async variant of `execute` built on `_acall_llm`"""
+        try:
+            messages = self._build_messages(input_data)
+            response = await self._acall_llm_json(messages, temperature=self.TEMPERATURE)
+            output = self._parse_response(response, input_data)
+
+            self.log_execution(input_data, output)
+            return output
+
+        except QuotaExceededError:
+            # Let the orchestrator stop the pipeline instead of burning more calls
+            raise
+        except Exception as e:
+            return self._error_output(input_data, e)
@@ -0,0 +1,477 @@
+"""
+LLM Backends - Pluggable generation backends used by BaseAgent
+Gemini is the production backend; ReplayBackend serves recorded responses
+offline with configurable latency and error injection for load testing
+"""
+import asyncio
+import hashlib
+import json
+import random
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+from utils.logger import setup_logger
+from utils.config import Config
+from utils.deadline import cancellable_asleep, cancellable_sleep, time_left
+from utils.request_context import current_api_key
+
+logger = setup_logger(__name__)
+
+
+def prompt_hash(prompt: str) -> str:
+    """Stable hash used to key recorded responses"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class LLMResponse:
+    """Backend-neutral generation result (a whole response or one stream chunk)"""
+    text: str
+    usage: Dict[str, int] = field(default_factory=dict)
+    # Model that generated it; set by BaseAgent, which may fail over or hedge
+    model: Optional[str] = None
+
+
+class LLMBackend(ABC):
+    """Interface every generation backend implements"""
+
+    name = "base"
+
+    @abstractmethod
+    def generate(self,
+                 prompt: str,
+                 model: str,
+                 temperature: float,
+                 response_schema: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        """
+        Generate a full response
+
+        Args:
+            prompt: Flattened prompt string
+            model: Model name
+            temperature: Sampling temperature
+            response_schema: JSON schema; when given the backend should ask the
+                model for JSON output conforming to it (backends may ignore it)
+
+        Returns:
+            LLMResponse with text and token usage
+        """
+        raise NotImplementedError
+
+    async def agenerate(self,
+                        prompt: str,
+                        model: str,
+                        temperature: float,
+                        response_schema: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        """Async generation; defaults to running `generate` in a worker thread"""
+        return await asyncio.to_thread(self.generate, prompt, model, temperature, response_schema)
+
+    def stream(self,
+               prompt: str,
+               model: str,
+               temperature: float,
+               response_schema: Optional[Dict[str, Any]] = None) -> Iterator[LLMResponse]:
+        """Stream a response; defaults to a single chunk from `generate`"""
+        yield self.generate(prompt, model, temperature, response_schema)
+
+
+def key_id(api_key: str) -> str:
+    """Non-reversible identifier for an API key, safe to log and use as a dict key"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class GeminiClientPool:
+    """
+    Process-wide registry of Gemini clients keyed by (api_key, model)
+
+    Each API key gets its own GenerativeServiceClient (one HTTP/gRPC channel
+    reused by every model, agent and session using that key), and models are
+    bound to their key's client explicitly instead of via the global
+    `genai.configure`, so concurrent tenants never pick up each other's key.
+    Async clients are bound to an event loop and are pooled per loop.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, Any] = {}
+        self._models: Dict[Tuple[str, str], Any] = {}
+        # Keyed by event loop as well; entries of closed loops are pruned
+        self._async_models: Dict[Tuple[str, str, Any], Any] = {}
+        self._async_clients: Dict[Tuple[str, Any], Any] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _client_options(api_key: str) -> Dict[str, str]:
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY is required for the Gemini backend")
+        return {"api_key": api_key}
+
+    def get_model(self, api_key: str, model: str) -> Any:
+        """
+        Get the GenerativeModel for a key and model, creating it on first use
+
+        Args:
+            api_key: API key the calls are billed to
+            model: Model name
+
+        Returns:
+            google.generativeai GenerativeModel bound to the key's client
+        """
+        kid = key_id(api_key)
+        with self._lock:
+            instance = self._models.get((kid, model))
+            if instance is None:
+                import google.generativeai as genai  # type: ignore[attr-defined]
+                from google.ai import generativelanguage as glm
+
+                try:
+                    client = self._clients.get(kid)
+                    if client is None:
+                        client = glm.GenerativeServiceClient(
+                            client_options=self._client_options(api_key)
+                        )
+                        self._clients[kid] = client
+                        logger.info(f"Created Gemini client for key {kid[:8]}")
+
+                    instance = genai.GenerativeModel(model)  # type: ignore[attr-defined]
+                    instance._client = client
+                    self._models[(kid, model)] = instance
+                    logger.info(f"Initialized Gemini model: {model}")
+                except Exception as e:
+                    logger.error(f"Failed to initialize Gemini client: {e}")
+                    raise
+            return instance
+
+    def get_async_model(self, api_key: str, model: str) -> Any:
+        """Async counterpart of `get_model` for the running event loop"""
+        kid = key_id(api_key)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            instance = self._async_models.get((kid, model, loop))
+            if instance is None:
+                import google.generativeai as genai  # type: ignore[attr-defined]
+                from google.ai import generativelanguage as glm
+
+                self._prune_closed_loops()
+                client = self._async_clients.get((kid, loop))
+                if client is None:
+                    client = glm.GenerativeServiceAsyncClient(
+                        client_options=self._client_options(api_key)
+                    )
+                    self._async_clients[(kid, loop)] = client
+
+                instance = genai.GenerativeModel(model)  # type: ignore[attr-defined]
+                instance._async_client = client
+                self._async_models[(kid, model, loop)] = instance
+            return instance
+
+    def _prune_closed_loops(self) -> None:
+        """Drop async clients of event loops that have been closed (lock held)"""
+        for key in [k for k in self._async_models if k[2].is_closed()]:
+            del self._async_models[key]
+        for key in [k for k in self._async_clients if k[1].is_closed()]:
+            del self._async_clients[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "models": len(self._models),
+                "async_clients": len(self._async_clients)
+            }
+
+
+_client_pool = GeminiClientPool()
+
+
+def get_gemini_client_pool() -> GeminiClientPool:
+    """Get the process-wide Gemini client pool"""
+    return _client_pool
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini via google-generativeai"""
+
+    name = "gemini"
+
+    def __init__(self, client_pool: Optional[GeminiClientPool] = None):
+        self.client_pool = client_pool or get_gemini_client_pool()
+
+    def _get_model(self, model: str) -> Any:
+        """Pooled model for the current request's API key"""
+        return self.client_pool.get_model(current_api_key(), model)
+
+    @staticmethod
+    def _usage(response: Any) -> Dict[str, int]:
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return {}
+        return {
+            "prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+            "output_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+            "total_tokens": getattr(usage, "total_token_count", 0) or 0,
+        }
+
+    @staticmethod
+    def _text(response: Any) -> str:
+        # google-generativeai responses expose `.text` for the main content;
+        # it raises ValueError when there are no text parts
+        try:
+            return response.text or ""
+        except ValueError:
+            return ""
+
+    @classmethod
+    def _gemini_schema(cls, schema: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a lowercase JSON schema to Gemini's OpenAPI subset"""
+        converted: Dict[str, Any] = {}
+        for key, value in schema.items():
+            if key == "type":
+                converted[key] = value.upper()
+            elif key == "properties":
+                converted[key] = {k: cls._gemini_schema(v) for k, v in value.items()}
+            elif key == "items":
+                converted[key] = cls._gemini_schema(value)
+            elif key in ("required", "enum", "description", "nullable"):
+                converted[key] = value
+        return converted
+
+    def _generation_config(self,
+                           temperature: float,
+                           response_schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        config: Dict[str, Any] = {"temperature": temperature}
+        if response_schema is not None:
+            config["response_mime_type"] = "application/json"
+            config["response_schema"] = self._gemini_schema(response_schema)
+        return config
+
+    @staticmethod
+    def _request_options() -> Dict[str, Any]:
+        """HTTP timeout, capped by the time left for the current request"""
+        timeout = time_left(Config.LLM_REQUEST_TIMEOUT_SECONDS or None)
+        return {"timeout": max(timeout, 1.0)} if timeout is not None else {}
+
+    def generate(self,
+                 prompt: str,
+                 model: str,
+                 temperature: float,
+                 response_schema: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        response = self._get_model(model).generate_content(
+            prompt,
+            generation_config=self._generation_config(temperature, response_schema),
+            request_options=self._request_options(),
+        )
+        return LLMResponse(self._text(response), self._usage(response))
+
+    async def agenerate(self,
+                        prompt: str,
+                        model: str,
+                        temperature: float,
+                        response_schema: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        model_instance = self.client_pool.get_async_model(current_api_key(), model)
+        response = await model_instance.generate_content_async(
+            prompt,
+            generation_config=self._generation_config(temperature, response_schema),
+            request_options=self._request_options(),
+        )
+        return LLMResponse(self._text(response), self._usage(response))
+
+    def stream(self,
+               prompt: str,
+               model: str,
+               temperature: float,
+               response_schema: Optional[Dict[str, Any]] = None) -> Iterator[LLMResponse]:
+        response = self._get_model(model).generate_content(
+            prompt,
+            generation_config=self._generation_config(temperature, response_schema),
+            stream=True,
+            request_options=self._request_options(),
+        )
+        for chunk in response:
+            # Usage metadata is reported on the final chunk
+            yield LLMResponse(self._text(chunk), self._usage(chunk))
+
+
+class ReplayBackend(LLMBackend):
+    """
+    Deterministic offline backend that replays recorded responses
+
+    Recordings are JSONL lines {"prompt_hash": str, "text": str}. Latency and
+    failures are injected from a seeded RNG so load tests are reproducible.
+    """
+
+    name = "replay"
+
+    def __init__(self,
+                 recordings_path: Optional[Path] = None,
+                 latency_ms: float = 0.0,
+                 latency_jitter_ms: float = 0.0,
+                 error_rate: float = 0.0,
+                 quota_error_rate: float = 0.0,
+                 default_response: Optional[str] = None,
+                 seed: int = 0):
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.quota_error_rate = quota_error_rate
+        self.default_response = default_response
+        self.recordings: Dict[str, str] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        if recordings_path is not None:
+            self.load(recordings_path)
+
+    def load(self, recordings_path: Path) -> None:
+        """Load recorded responses from a JSONL file"""
+        path = Path(recordings_path)
+        if not path.exists():
+            logger.warning(f"Replay recordings not found: {path}")
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.recordings[entry["prompt_hash"]] = entry["text"]
+        logger.info(f"Loaded {len(self.recordings)} replay recordings from {path}")
+
+    def add_recording(self, prompt: str, text: str) -> None:
+        self.recordings[prompt_hash(prompt)] = text
+
+    def _draw(self) -> tuple:
+        """Draw latency and failure decisions from the seeded RNG"""
+        with self._lock:
+            jitter = self._rng.uniform(-1, 1) * self.latency_jitter_ms
+            roll = self._rng.random()
+        delay = max(0.0, self.latency_ms + jitter) / 1000.0
+        return delay, roll
+
+    def _respond(self, prompt: str, roll: float) -> LLMResponse:
+        if roll < self.quota_error_rate:
+            raise Exception(
+                "429 Resource has been exhausted (e.g. check quota). Please retry in 1.0s"
+            )
+        if roll < self.quota_error_rate + self.error_rate:
+            raise Exception("500 Injected replay backend error")
+
+        text = self.recordings.get(prompt_hash(prompt), self.default_response)
+        if text is None:
+            raise KeyError(f"No recorded response for prompt hash {prompt_hash(prompt)[:12]}")
+        prompt_tokens = len(prompt) // 4 + 1
+        output_tokens = len(text) // 4 + 1
+        return LLMResponse(text, {
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": prompt_tokens + output_tokens,
+        })
+
+    def generate(self,
+                 prompt: str,
+                 model: str,
+                 temperature: float,
+                 response_schema: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        delay, roll = self._draw()
+        cancellable_sleep(delay)
+        return self._respond(prompt, roll)
+
+    async def agenerate(self,
+                        prompt: str,
+                        model: str,
+                        temperature: float,
+                        response_schema: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        delay, roll = self._draw()
+        await cancellable_asleep(delay)
+        return self._respond(prompt, roll)
+
+
+class RecordingBackend(LLMBackend):
+    """Wraps another backend and appends every response to a replay file"""
+
+    def __init__(self, inner: LLMBackend, recordings_path: Path):
+        self.inner = inner
+        self.name = f"recording:{inner.name}"
+        self.recordings_path = Path(recordings_path)
+        self.recordings_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _record(self, prompt: str, model: str, text: str) -> None:
+        entry = {"prompt_hash": prompt_hash(prompt), "model": model, "text": text}
+        with self._lock:
+            with open(self.recordings_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def generate(self,
+                 prompt: str,
+                 model: str,
+                 temperature: float,
+                 response_schema: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        response = self.inner.generate(prompt, model, temperature, response_schema)
+        self._record(prompt, model, response.text)
+        return response
+
+    async def agenerate(self,
+                        prompt: str,
+                        model: str,
+                        temperature: float,
+                        response_schema: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        response = await self.inner.agenerate(prompt, model, temperature, response_schema)
+        self._record(prompt, model, response.text)
+        return response
+
+    def stream(self,
+               prompt: str,
+               model: str,
+               temperature: float,
+               response_schema: Optional[Dict[str, Any]] = None) -> Iterator[LLMResponse]:
+        chunks = []
+        for chunk in self.inner.stream(prompt, model, temperature, response_schema):
+            chunks.append(chunk.text)
+            yield chunk
+        self._record(prompt, model, "".join(chunks))
+
+
+_default_backend: Optional[LLMBackend] = None
+_default_backend_lock = threading.Lock()
+
+
+def create_backend(name: Optional[str] = None) -> LLMBackend:
+    """
+    Build a backend from Config
+
+    Args:
+        name: 'gemini' or 'replay' (default Config.LLM_BACKEND)
+
+    Returns:
+        Backend instance, wrapped in a RecordingBackend if LLM_RECORD_PATH is set
+    """
+    name = (name or Config.LLM_BACKEND).lower()
+    backend: LLMBackend
+    if name == "gemini":
+        backend = GeminiBackend()
+    elif name == "replay":
+        backend = ReplayBackend(
+            recordings_path=Config.REPLAY_RECORDINGS_PATH,
+            latency_ms=Config.REPLAY_LATENCY_MS,
+            latency_jitter_ms=Config.REPLAY_LATENCY_JITTER_MS,
+            error_rate=Config.REPLAY_ERROR_RATE,
+            quota_error_rate=Config.REPLAY_QUOTA_ERROR_RATE,
+            default_response=Config.REPLAY_DEFAULT_RESPONSE or None,
+            seed=Config.REPLAY_SEED
+        )
+    else:
+        raise ValueError(f"Unknown LLM backend: {name}")
+
+    if Config.LLM_RECORD_PATH and name != "replay":
+        backend = RecordingBackend(backend, Path(Config.LLM_RECORD_PATH))
+    logger.info(f"Using LLM backend: {backend.name}")
+    return backend
+
+
+def get_llm_backend() -> LLMBackend:
+    """Get the process-wide backend selected by Config.LLM_BACKEND"""
+    global _default_backend
+    with _default_backend_lock:
+        if _default_backend is None:
+            _default_backend = create_backend()
+        return _default_backend
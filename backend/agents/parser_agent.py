@@ -1,9 +1,9 @@
 """
 Parser Agent - Converts raw input to structured problem
 """
-import json
-from typing import Dict, Any
+from typing import Dict, Any, List
 from agents.base_agent import BaseAgent
+from utils.rate_limiter import QuotaExceededError
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -11,42 +11,10 @@ logger = setup_logger(__name__)
 
 class ParserAgent(BaseAgent):
     """Parser Agent - Structures raw math problems"""
-    
-    def __init__(self):
-        super().__init__(
-            name="ParserAgent",
-            role="Cleans input and structures math problems"
-        )
-    
-    def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Parse raw input into structured problem format
-        
-        Args:
-            input_data: {
-                "raw_text": str,
-                "input_type": "text|image|audio"
-            }
-            
-        Returns:
-            {
-                "problem_text": str,
-                "topic": str,
-                "variables": List[str],
-                "constraints": List[str],
-                "equations": List[str],
-                "needs_clarification": bool,
-                "confidence": float,
-                "reasoning": str
-            }
-        """
-        try:
-            raw_text = input_data.get("raw_text", "")
-            input_type = input_data.get("input_type", "text")
-            
-            logger.info(f"Parsing input: {raw_text[:100]}...")
-            
-            system_prompt = """You are a Parser Agent for a JEE-level math mentor system.
+
+    TEMPERATURE = 0.3
+
+    SYSTEM_PROMPT = """You are a Parser Agent for a JEE-level math mentor system.
 Your job is to analyze raw mathematical problem text and structure it into a standard format.
 
 IMPORTANT RULES:
@@ -78,58 +46,132 @@ STRICT OUTPUT FORMAT (JSON only):
 
 Only work with JEE-level topics: algebra, calculus (basic), probability, linear algebra.
 """
-            
-            user_prompt = f"""Parse this mathematical problem:
+
+    RESPONSE_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "problem_text": {"type": "string"},
+            "topic": {"type": "string"},
+            "variables": {"type": "array", "items": {"type": "string"}},
+            "constraints": {"type": "array", "items": {"type": "string"}},
+            "equations": {"type": "array", "items": {"type": "string"}},
+            "needs_clarification": {"type": "boolean"},
+            "confidence": {"type": "number"},
+            "reasoning": {"type": "string"}
+        },
+        "required": ["problem_text", "topic", "needs_clarification", "confidence"]
+    }
+
+    def __init__(self):
+        super().__init__(
+            name="ParserAgent",
+            role="Cleans input and structures math problems"
+        )
+
+    def _build_messages(self, input_data: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Build the chat messages for a parse request"""
+        raw_text = input_data.get("raw_text", "")
+        input_type = input_data.get("input_type", "text")
+
+        logger.info(f"Parsing input: {raw_text[:100]}...")
+
+        user_prompt = f"""Parse this mathematical problem:
 
 Raw Input: {raw_text}
 Input Type: {input_type}
 
 Return ONLY the JSON output, no additional text."""
-            
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
-            
-            response = self._call_llm(messages, temperature=0.3)
-            
-            # Extract JSON from response
-            try:
-                # Try to find JSON in response
-                start_idx = response.find('{')
-                end_idx = response.rfind('}') + 1
-                if start_idx >= 0 and end_idx > start_idx:
-                    json_str = response[start_idx:end_idx]
-                    parsed_output = json.loads(json_str)
-                else:
-                    parsed_output = json.loads(response)
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON response: {e}")
-                logger.debug(f"Response was: {response}")
-                # Return a default structure
-                parsed_output = {
-                    "problem_text": raw_text,
-                    "topic": "unknown",
-                    "variables": [],
-                    "constraints": [],
-                    "equations": [],
-                    "needs_clarification": True,
-                    "confidence": 0.3,
-                    "reasoning": "Failed to parse problem structure"
-                }
-            
-            self.log_execution(input_data, parsed_output)
-            return parsed_output
-            
-        except Exception as e:
-            logger.error(f"Error in ParserAgent: {e}")
-            return {
-                "problem_text": input_data.get("raw_text", ""),
+
+        return [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _parse_response(self, response: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract the structured problem from the LLM response"""
+        raw_text = input_data.get("raw_text", "")
+
+        # Extract JSON from response (repairing common defects)
+        parsed_output = self._parse_json(response)
+        if parsed_output is None:
+            logger.error("Failed to parse JSON response")
+            logger.debug(f"Response was: {response}")
+            # Return a default structure
+            parsed_output = {
+                "problem_text": raw_text,
                 "topic": "unknown",
                 "variables": [],
                 "constraints": [],
                 "equations": [],
                 "needs_clarification": True,
-                "confidence": 0.0,
-                "reasoning": f"Error: {str(e)}"
+                "confidence": 0.3,
+                "reasoning": "Failed to parse problem structure"
             }
+
+        return parsed_output
+
+    def _error_output(self, input_data: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        """Fallback output when parsing fails entirely"""
+        logger.error(f"Error in ParserAgent: {error}")
+        return {
+            "problem_text": input_data.get("raw_text", ""),
+            "topic": "unknown",
+            "variables": [],
+            "constraints": [],
+            "equations": [],
+            "needs_clarification": True,
+            "confidence": 0.0,
+            "reasoning": f"Error: {str(error)}"
+        }
+
+    def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Parse raw input into structured problem format
+
+        Args:
+            input_data: {
+                "raw_text": str,
+                "input_type": "text|image|audio"
+            }
+
+        Returns:
+            {
+                "problem_text": str,
+                "topic": str,
+                "variables": List[str],
+                "constraints": List[str],
+                "equations": List[str],
+                "needs_clarification": bool,
+                "confidence": float,
+                "reasoning": str
+            }
+        """
+        try:
+            messages = self._build_messages(input_data)
+            response = self._call_llm_json(messages, temperature=self.TEMPERATURE)
+            parsed_output = self._parse_response(response, input_data)
+
+            self.log_execution(input_data, parsed_output)
+            return parsed_output
+
+        except QuotaExceededError:
+            # Let the orchestrator stop the pipeline instead of burning more calls
+            raise
+        except Exception as e:
+            return self._error_output(input_data, e)
+
+    async def aexecute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Async variant of `execute` built on `_acall_llm`"""
+        try:
+            messages = self._build_messages(input_data)
+            response = await self._acall_llm_json(messages, temperature=self.TEMPERATURE)
+            parsed_output = self._parse_response(response, input_data)
+
+            self.log_execution(input_data, parsed_output)
+            return parsed_output
+
+        except QuotaExceededError:
+            # Let the orchestrator stop the pipeline instead of burning more calls
+            raise
+        except Exception as e:
+            return self._error_output(input_data, e)
@@ -0,0 +1,199 @@
+"""
+Reviewer Agent - Verifies a solution and explains it in one LLM call
+Used by the fused pipeline mode in place of VerifierAgent + ExplainerAgent
+"""
+from typing import Dict, Any, List
+from agents.base_agent import BaseAgent
+from agents.verifier_agent import VerifierAgent
+from agents.explainer_agent import ExplainerAgent
+from utils.rate_limiter import QuotaExceededError
+from utils.logger import setup_logger
+from utils.config import Config
+
+logger = setup_logger(__name__)
+
+
+class ReviewerAgent(BaseAgent):
+    """Reviewer Agent - Combined verification and explanation"""
+
+    TEMPERATURE = 0.3
+
+    SYSTEM_PROMPT = """You are the Reviewer Agent for JEE-level mathematics.
+In ONE response you must (A) strictly verify a proposed solution and
+(B) write a clear, student-friendly explanation of it.
+
+VERIFICATION - check:
+1. Mathematical correctness (substitution verification)
+2. Domain validity: √x needs x ≥ 0, log(x) needs x > 0, denominators ≠ 0, tan(x) undefined at π/2 + nπ
+3. Constraint satisfaction (from problem statement)
+4. Common mistakes: sign errors, inequality reversals, domain violations, wrong formulas
+5. Logical consistency of steps
+Set requires_hitl to true if confidence < 0.8, critical issues or domain violations
+are found, or the answer cannot be verified.
+
+EXPLANATION - explain WHY each step is taken, highlight key concepts, point out
+common mistakes, give tips and intuition, use simple encouraging language.
+
+STRICT OUTPUT FORMAT (JSON only):
+{
+  "verification": {
+    "is_correct": true,
+    "confidence": 0.95,
+    "issues_found": [],
+    "requires_hitl": false,
+    "verification_details": "detailed explanation of verification"
+  },
+  "explanation": {
+    "explanation": "detailed step-by-step explanation in friendly language",
+    "key_concepts": ["concept1", "concept2"],
+    "common_mistakes": ["mistake1 to avoid"],
+    "tips": ["helpful tip 1"]
+  }
+}
+"""
+
+    RESPONSE_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "verification": VerifierAgent.RESPONSE_SCHEMA,
+            "explanation": ExplainerAgent.RESPONSE_SCHEMA
+        },
+        "required": ["verification", "explanation"]
+    }
+
+    def __init__(self):
+        super().__init__(
+            name="ReviewerAgent",
+            role="Verifies solutions and explains them to students"
+        )
+        self.confidence_threshold = Config.VERIFIER_CONFIDENCE_THRESHOLD
+
+    def _build_messages(self, input_data: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Build the chat messages for a combined verify + explain request"""
+        parsed_problem = input_data.get("parsed_problem", {})
+        solution = input_data.get("solution", {})
+
+        problem_text = parsed_problem.get("problem_text", "")
+        final_answer = solution.get("final_answer", "")
+        steps = self.context_budget.steps(solution.get("steps", []))
+
+        logger.info(f"Reviewing solution: {final_answer[:100]}...")
+
+        user_prompt = f"""Verify and explain this solution:
+
+Problem: {problem_text}
+Topic: {parsed_problem.get('topic', '')}
+Constraints: {parsed_problem.get('constraints', [])}
+
+Solution Steps:
+{chr(10).join(steps)}
+
+Final Answer: {final_answer}
+
+Return ONLY the JSON output."""
+
+        return [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _parse_response(self, response: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Split the combined response into verifier and explainer outputs"""
+        topic = input_data.get("parsed_problem", {}).get("topic", "")
+
+        # Extract JSON from response (repairing common defects)
+        combined = self._parse_json(response)
+        if combined is None:
+            logger.error("Failed to parse JSON response")
+            logger.debug(f"Response was: {response}")
+            combined = {}
+
+        verification = combined.get("verification")
+        if isinstance(verification, dict):
+            # Ensure requires_hitl is set based on confidence threshold
+            if verification.get('confidence', 0.5) < self.confidence_threshold:
+                verification['requires_hitl'] = True
+        else:
+            verification = {
+                "is_correct": False,
+                "confidence": 0.3,
+                "issues_found": ["Failed to parse verification results"],
+                "requires_hitl": True,
+                "verification_details": response[:500]
+            }
+
+        explanation = combined.get("explanation")
+        if not isinstance(explanation, dict):
+            explanation = {
+                "explanation": response[:1000],
+                "key_concepts": [topic],
+                "common_mistakes": [],
+                "tips": []
+            }
+
+        return {"verification": verification, "explanation": explanation}
+
+    def _error_output(self, input_data: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        """Fallback output when the review fails entirely"""
+        logger.error(f"Error in ReviewerAgent: {error}")
+        return {
+            "verification": {
+                "is_correct": False,
+                "confidence": 0.0,
+                "issues_found": [f"Error in verification: {str(error)}"],
+                "requires_hitl": True,
+                "verification_details": f"Error: {str(error)}"
+            },
+            "explanation": {
+                "explanation": f"Error generating explanation: {str(error)}",
+                "key_concepts": [],
+                "common_mistakes": [],
+                "tips": []
+            }
+        }
+
+    def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Verify a solution and generate its explanation
+
+        Args:
+            input_data: {
+                "parsed_problem": Dict,
+                "solution": Dict from SolverAgent
+            }
+
+        Returns:
+            {
+                "verification": Dict in VerifierAgent format,
+                "explanation": Dict in ExplainerAgent format
+            }
+        """
+        try:
+            messages = self._build_messages(input_data)
+            response = self._call_llm_json(messages, temperature=self.TEMPERATURE)
+            output = self._parse_response(response, input_data)
+
+            self.log_execution(input_data, output)
+            return output
+
+        except QuotaExceededError:
+            # Let the orchestrator stop the pipeline instead of burning more calls
+            raise
+        except Exception as e:
+            return self._error_output(input_data, e)
+
+    async def aexecute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Async variant of `execute` built on `_acall_llm`"""
+        try:
+            messages = self._build_messages(input_data)
+            response = await self._acall_llm_json(messages, temperature=self.TEMPERATURE)
+            output = self._parse_response(response, input_data)
+
+            self.log_execution(input_data, output)
+            return output
+
+        except QuotaExceededError:
+            # Let the orchestrator stop the pipeline instead of burning more calls
+            raise
+        except Exception as e:
+            return self._error_output(input_data, e)
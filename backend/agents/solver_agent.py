@@ -1,11 +1,15 @@
 """
 Solver Agent - Solves mathematical problems using ReAct-style reasoning
 """
-import json
+import asyncio
 from typing import Dict, Any, List
 from agents.base_agent import BaseAgent
+from utils.rate_limiter import QuotaExceededError
+from utils.config import Config
+from utils.deadline import time_left
 from utils.logger import setup_logger
-import sympy as sp
+from utils.sympy_sandbox import run_sympy_code
+from utils.timing import timed
 
 logger = setup_logger(__name__)
 
@@ -13,90 +17,16 @@ logger = setup_logger(__name__)
 class SolverAgent(BaseAgent):
     """Solver Agent - Solves math problems with step-by-step reasoning"""
     
-    def __init__(self):
-        super().__init__(
-            name="SolverAgent",
-            role="Solves mathematical problems using ReAct reasoning"
-        )
-    
-    def _execute_sympy_tool(self, code: str) -> str:
-        """Execute SymPy code safely"""
-        try:
-            # Create a restricted namespace
-            namespace = {
-                'sp': sp,
-                'Symbol': sp.Symbol,
-                'symbols': sp.symbols,
-                'solve': sp.solve,
-                'simplify': sp.simplify,
-                'expand': sp.expand,
-                'factor': sp.factor,
-                'diff': sp.diff,
-                'integrate': sp.integrate,
-                'limit': sp.limit,
-                'sqrt': sp.sqrt,
-                'log': sp.log,
-                'exp': sp.exp,
-                'sin': sp.sin,
-                'cos': sp.cos,
-                'tan': sp.tan,
-                'pi': sp.pi,
-                'oo': sp.oo,
-                'Matrix': sp.Matrix,
-                'det': lambda m: m.det(),
-            }
-            
-            # Execute code
-            exec(code, namespace)
-            result = namespace.get('result', 'No result variable defined')
-            return str(result)
-        except Exception as e:
-            return f"Error executing code: {str(e)}"
+    TEMPERATURE = 0.3
     
-    def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Solve mathematical problem with ReAct-style reasoning
-        
-        Args:
-            input_data: {
-                "parsed_problem": Dict from ParserAgent,
-                "strategy": Dict from IntentRouterAgent,
-                "rag_context": List[Dict] from RAG
-            }
-            
-        Returns:
-            {
-                "steps": List[str],
-                "final_answer": str,
-                "reasoning": str,
-                "confidence": float,
-                "tool_calls": List[Dict]
-            }
-        """
-        try:
-            parsed_problem = input_data.get("parsed_problem", {})
-            strategy = input_data.get("strategy", {})
-            rag_context = input_data.get("rag_context", [])
-            
-            problem_text = parsed_problem.get("problem_text", "")
-            topic = parsed_problem.get("topic", "")
-            
-            logger.info(f"Solving problem: {problem_text[:100]}...")
-            
-            # Format RAG context
-            context_str = "\n\n".join([
-                f"Reference from {doc['source']}:\n{doc['content'][:500]}"
-                for doc in rag_context[:2]
-            ])
-            
-            system_prompt = f"""You are a Solver Agent for JEE-level mathematics.
+    SYSTEM_PROMPT_TEMPLATE = """You are a Solver Agent for JEE-level mathematics.
 You solve problems using ReAct-style reasoning: Thought -> Action -> Observation -> repeat.
 
 Topic: {topic}
-Strategy: {strategy.get('approach', 'step-by-step solving')}
+Strategy: {approach}
 
 Reference Knowledge:
-{context_str}
+{context}
 
 You must:
 1. Think through the problem step-by-step
@@ -118,8 +48,57 @@ STRICT OUTPUT FORMAT (JSON only):
   "sympy_code": "optional Python/SymPy code used"
 }}
 """
-            
-            user_prompt = f"""Solve this problem:
+    
+    RESPONSE_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "steps": {"type": "array", "items": {"type": "string"}},
+            "final_answer": {"type": "string"},
+            "reasoning": {"type": "string"},
+            "confidence": {"type": "number"},
+            "sympy_code": {"type": "string"}
+        },
+        "required": ["steps", "final_answer", "confidence"]
+    }
+    
+    def __init__(self):
+        super().__init__(
+            name="SolverAgent",
+            role="Solves mathematical problems using ReAct reasoning"
+        )
+    
+    def _execute_sympy_tool(self, code: str) -> str:
+        """Execute SymPy code in a sandbox process with a time limit"""
+        try:
+            with timed("sympy_exec"):
+                return run_sympy_code(code, time_left(Config.SYMPY_EXEC_TIMEOUT_SECONDS or None))
+        except Exception as e:
+            return f"Error executing code: {str(e)}"
+    
+    def _build_messages(self, input_data: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Build the chat messages for a solve request"""
+        parsed_problem = input_data.get("parsed_problem", {})
+        strategy = input_data.get("strategy", {})
+        rag_context = input_data.get("rag_context", [])
+
+        problem_text = parsed_problem.get("problem_text", "")
+        topic = parsed_problem.get("topic", "")
+
+        logger.info(f"Solving problem: {problem_text[:100]}...")
+
+        # Format RAG context (best-scoring chunks within the token budget)
+        context_str = "\n\n".join([
+            f"Reference from {doc['source']}:\n{doc['content']}"
+            for doc in self.context_budget.rag_context(rag_context)
+        ])
+
+        system_prompt = self.SYSTEM_PROMPT_TEMPLATE.format(
+            topic=topic,
+            approach=strategy.get('approach', 'step-by-step solving'),
+            context=context_str
+        )
+
+        user_prompt = f"""Solve this problem:
 
 Problem: {problem_text}
 Variables: {parsed_problem.get('variables', [])}
@@ -127,47 +106,90 @@ Constraints: {parsed_problem.get('constraints', [])}
 Equations: {parsed_problem.get('equations', [])}
 
 Provide step-by-step solution. Return ONLY the JSON output."""
+
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _parse_response(self, response: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract the solution from the LLM response and run any SymPy code"""
+        # Extract JSON from response (repairing common defects)
+        output = self._parse_json(response)
+        if output is not None:
+            # If SymPy code is provided, execute it
+            if 'sympy_code' in output and output['sympy_code']:
+                sympy_result = self._execute_sympy_tool(output['sympy_code'])
+                output['sympy_result'] = sympy_result
+        else:
+            logger.error("Failed to parse JSON response")
+            logger.debug(f"Response was: {response}")
+            output = {
+                "steps": ["Failed to parse solution steps"],
+                "final_answer": "Error in solving",
+                "reasoning": response[:500],
+                "confidence": 0.3
+            }
+
+        return output
+
+    def _error_output(self, input_data: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        """Fallback solution when solving fails entirely"""
+        logger.error(f"Error in SolverAgent: {error}")
+        return {
+            "steps": [],
+            "final_answer": "Error occurred during solving",
+            "reasoning": f"Error: {str(error)}",
+            "confidence": 0.0
+        }
+
+    def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Solve mathematical problem with ReAct-style reasoning
+        
+        Args:
+            input_data: {
+                "parsed_problem": Dict from ParserAgent,
+                "strategy": Dict from IntentRouterAgent,
+                "rag_context": List[Dict] from RAG
+            }
             
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
-            
-            response = self._call_llm(messages, temperature=0.3)
-            
-            # Extract JSON from response
-            try:
-                start_idx = response.find('{')
-                end_idx = response.rfind('}') + 1
-                if start_idx >= 0 and end_idx > start_idx:
-                    json_str = response[start_idx:end_idx]
-                    output = json.loads(json_str)
-                else:
-                    output = json.loads(response)
-                
-                # If SymPy code is provided, execute it
-                if 'sympy_code' in output and output['sympy_code']:
-                    sympy_result = self._execute_sympy_tool(output['sympy_code'])
-                    output['sympy_result'] = sympy_result
-                    
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON response: {e}")
-                logger.debug(f"Response was: {response}")
-                output = {
-                    "steps": ["Failed to parse solution steps"],
-                    "final_answer": "Error in solving",
-                    "reasoning": response[:500],
-                    "confidence": 0.3
-                }
+        Returns:
+            {
+                "steps": List[str],
+                "final_answer": str,
+                "reasoning": str,
+                "confidence": float,
+                "tool_calls": List[Dict]
+            }
+        """
+        try:
+            messages = self._build_messages(input_data)
+            response = self._call_llm_json(messages, temperature=self.TEMPERATURE)
+            output = self._parse_response(response, input_data)
             
             self.log_execution(input_data, output)
             return output
             
+        except QuotaExceededError:
+            # Let the orchestrator stop the pipeline instead of burning more calls
+            raise
         except Exception as e:
-            logger.error(f"Error in SolverAgent: {e}")
-            return {
-                "steps": [],
-                "final_answer": "Error occurred during solving",
-                "reasoning": f"Error: {str(e)}",
-                "confidence": 0.0
-            }
+            return self._error_output(input_data, e)
+
+    async def aexecute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Async variant of `execute` built on `_acall_llm`"""
+        try:
+            messages = self._build_messages(input_data)
+            response = await self._acall_llm_json(messages, temperature=self.TEMPERATURE)
+            # SymPy execution is CPU-bound, keep it off the event loop
+            output = await asyncio.to_thread(self._parse_response, response, input_data)
+
+            self.log_execution(input_data, output)
+            return output
+
+        except QuotaExceededError:
+            # Let the orchestrator stop the pipeline instead of burning more calls
+            raise
+        except Exception as e:
+            return self._error_output(input_data, e)
@@ -245,32 +245,53 @@ def initialize_session_state():
         st.session_state.extracted_text = ""
 
 
+@st.cache_resource(show_spinner=False)
+def get_orchestrator() -> MathMentorOrchestrator:
+    """
+    Orchestrator shared by all sessions of this process
+    
+    Agents, embeddings, the FAISS index and the OCR/ASR models are loaded
+    once; each session's API key is passed with its requests instead.
+    """
+    # The UI always runs on Gemini 2.5 Flash
+    Config.GEMINI_MODEL = "models/gemini-2.5-flash"
+    
+    # Keys come with each request, not from the environment
+    Config.validate(require_api_key=False)
+    
+    orchestrator = MathMentorOrchestrator()
+    # Models load in parallel in the background; text solves can start
+    # before OCR and Whisper are ready
+    orchestrator.warm_up()
+    return orchestrator
+
+
+def render_readiness(readiness: dict):
+    """Per-component warm-up status in the sidebar"""
+    icons = {"pending": "⏳", "loading": "⏳", "ready": "✅", "failed": "⚠️"}
+    labels = {
+        "embeddings": "Embeddings",
+        "vector_store": "Knowledge base",
+        "ocr": "OCR (images)",
+        "asr": "Whisper (audio)",
+        "sympy": "SymPy",
+    }
+    for name, status in readiness.items():
+        detail = f" ({status['seconds']}s)" if status["seconds"] is not None else ""
+        st.caption(f"{icons[status['status']]} {labels.get(name, name)}: {status['status']}{detail}")
+
+
 def initialize_system():
     """Initialize the math mentor system with user's API key"""
     try:
         with st.spinner("Initializing AI Math Mentor with your API key..."):
-            # Override Config with user's API key
-            if st.session_state.user_api_key:
-                os.environ['GEMINI_API_KEY'] = st.session_state.user_api_key
-                Config.GEMINI_API_KEY = st.session_state.user_api_key
-                
-                # Set model based on provider
-                if st.session_state.api_provider == "gemini":
-                    Config.GEMINI_MODEL = "models/gemini-2.5-flash"
-                    st.info(f"🤖 Using Google Gemini: {Config.GEMINI_MODEL}")
-                elif st.session_state.api_provider == "openai":
-                    # For OpenAI integration (future implementation)
-                    st.warning("⚠️ OpenAI support coming soon! Using Gemini for now.")
-                    Config.GEMINI_MODEL = "models/gemini-2.5-flash"
+            orchestrator = get_orchestrator()
             
-            # Validate config
-            Config.validate()
-            
-            # Create orchestrator
-            orchestrator = MathMentorOrchestrator()
-            
-            # Initialize RAG
-            orchestrator.initialize_rag()
+            if st.session_state.api_provider == "gemini":
+                st.info(f"🤖 Using Google Gemini: {Config.GEMINI_MODEL}")
+            elif st.session_state.api_provider == "openai":
+                # For OpenAI integration (future implementation)
+                st.warning("⚠️ OpenAI support coming soon! Using Gemini for now.")
             
             st.session_state.orchestrator = orchestrator
             st.session_state.initialized = True
@@ -302,6 +323,75 @@ def display_confidence(confidence: float) -> str:
         return f'<span class="confidence-low">{confidence:.2%}</span>'
 
 
+def make_live_renderer():
+    """
+    Create placeholders for partial results and a callback that fills them
+    
+    Returns:
+        Callback for the events of MathMentorOrchestrator.solve_problem_stream
+    """
+    problem_placeholder = st.empty()
+    sources_placeholder = st.empty()
+    strategy_placeholder = st.empty()
+    steps_placeholder = st.empty()
+    answer_placeholder = st.empty()
+    verification_placeholder = st.empty()
+    explanation_placeholder = st.empty()
+    
+    def render_partial(field, value):
+        if field == "parsed_problem":
+            problem_placeholder.markdown(
+                f"**🔍 Problem** ({value.get('topic', 'unknown')}): {value.get('problem_text', '')}"
+            )
+        elif field == "rag_sources" and value:
+            sources_placeholder.caption(
+                "📚 Sources: " + ", ".join(source["source"] for source in value)
+            )
+        elif field == "strategy" and value:
+            strategy_placeholder.caption(
+                f"🧭 Strategy: {value.get('strategy', '')} - {value.get('approach', '')}"
+            )
+        elif field == "solution":
+            steps_placeholder.markdown(
+                "**Step-by-step solution:**\n\n" +
+                "\n".join(f"{i}. {step}" for i, step in enumerate(value.get("steps", []), 1))
+            )
+            answer_placeholder.markdown(f"**Final Answer:** `{value.get('final_answer', 'N/A')}`")
+        elif field == "verification":
+            if value.get("is_correct"):
+                verification_placeholder.success("✅ Solution verified as correct")
+            else:
+                verification_placeholder.warning("⚠️ Verification found issues")
+        elif field == "explanation" and value:
+            explanation_placeholder.markdown(f"**📖 Explanation**\n\n{value.get('explanation', '')}")
+    
+    def render(event):
+        if event.get("type") == "partial":
+            render_partial(event["field"], event["value"])
+            return
+        
+        stage = event.get("stage")
+        field = event.get("field")
+        value = event.get("value")
+        
+        if stage == "Solver Agent" and field == "steps" and isinstance(value, list):
+            steps_placeholder.markdown(
+                "**Step-by-step solution:**\n\n" +
+                "\n".join(f"{i}. {step}" for i, step in enumerate(value, 1))
+            )
+        elif stage == "Solver Agent" and field == "final_answer":
+            answer_placeholder.markdown(f"**Final Answer:** `{value}`")
+        elif stage == "Explainer Agent" and field == "explanation":
+            explanation_placeholder.markdown(f"**📖 Explanation**\n\n{value}")
+        elif stage == "Reviewer Agent" and field == "explanation" and isinstance(value, dict):
+            # Fused pipeline mode nests the explainer output
+            explanation_placeholder.markdown(
+                f"**📖 Explanation**\n\n{value.get('explanation', '')}"
+            )
+    
+    return render
+
+
 def main():
     """Main application"""
     st.title("🧮 AI Math Mentor")
@@ -355,6 +445,7 @@ def main():
                 initialize_system()
         else:
             st.success("✅ System Ready")
+            render_readiness(st.session_state.orchestrator.readiness())
             
             if st.button("🔄 Reinitialize RAG"):
                 with st.spinner("Reinitializing RAG..."):
@@ -516,14 +607,25 @@ def main():
         
         # Solve button
         if problem_text and st.button("🚀 Solve Problem", type="primary"):
+            live_view = st.empty()
             with st.spinner("Solving problem... This may take a moment."):
-                result = st.session_state.orchestrator.solve_problem(
-                    problem_text, 
-                    input_type or "text"
-                )
+                with live_view.container():
+                    render_live_event = make_live_renderer()
+                    # Partial results are shown as each stage finishes
+                    for event in st.session_state.orchestrator.solve_problem_stream(
+                        problem_text,
+                        input_type or "text",
+                        api_key=st.session_state.user_api_key
+                    ):
+                        if event["type"] == "result":
+                            result = event["result"]
+                        else:
+                            render_live_event(event)
                 
                 st.session_state.current_result = result
                 st.session_state.interaction_id = result.get("interaction_id")
+            # The full result below replaces the partial view
+            live_view.empty()
         
         # Display results
         if st.session_state.current_result:
@@ -553,7 +655,23 @@ def main():
                 
             elif result.get("status") == "error":
                 st.error(f"❌ Error: {result.get('message')}")
-                
+
+            elif result.get("status") in ("timeout", "cancelled"):
+                st.warning(result.get("message", ""))
+                st.caption(f"Finished stages: {', '.join(result.get('completed_stages', [])) or 'none'}")
+
+                # Best partial result: whatever stages finished in time
+                solution = result.get("solution")
+                if solution:
+                    st.subheader("📋 Solution (unverified)" if result.get("verification") is None
+                                 else "📋 Solution")
+                    for i, step in enumerate(solution.get("steps", []), 1):
+                        st.markdown(f"{i}. {step}")
+                    st.markdown(f"**Final Answer:** `{solution.get('final_answer', 'N/A')}`")
+                elif result.get("parsed_problem"):
+                    st.subheader("🔍 Parsed Problem")
+                    st.json(result["parsed_problem"])
+
             elif result.get("status") == "success":
                 st.success("✅ Problem solved!")
                 
@@ -604,7 +722,15 @@ def main():
                     # Explanation
                     st.markdown("---")
                     st.subheader("📖 Explanation")
-                    explanation = result.get("explanation", {})
+                    if result.get("explanation_deferred"):
+                        # Explanations are generated on request (adaptive pipeline)
+                        if st.button("📖 Show Explanation"):
+                            with st.spinner("Generating explanation..."):
+                                if st.session_state.orchestrator.explain_solution(
+                                    result, api_key=st.session_state.user_api_key
+                                ) is None:
+                                    st.error("Could not generate the explanation")
+                    explanation = result.get("explanation") or {}
                     st.markdown(explanation.get("explanation", ""))
                     
                     if explanation.get("key_concepts"):
@@ -641,6 +767,30 @@ def main():
                 with st.expander(f"Stage {i}: {step.get('stage', 'Unknown')}", 
                                expanded=(step.get('status') == 'error')):
                     st.json(step)
+
+            usage = st.session_state.current_result.get("usage")
+            if usage:
+                st.subheader("🔢 LLM Usage")
+                total = usage["total"]
+                col1, col2, col3 = st.columns(3)
+                col1.metric("LLM Calls", total["calls"])
+                col2.metric("Tokens (prompt / output)",
+                            f"{total['prompt_tokens']} / {total['output_tokens']}")
+                col3.metric("LLM Time", f"{total['total_latency_ms'] / 1000:.1f}s")
+                st.json(usage["by_agent"])
+
+            timing = st.session_state.current_result.get("stage_timing")
+            if timing:
+                st.subheader("⏱️ Stage Timing")
+                col1, col2 = st.columns(2)
+                col1.metric("Pipeline Time", f"{timing['total_ms'] / 1000:.1f}s")
+                col2.metric("Stage Parallelism", f"{timing['parallelism']:.2f}x")
+                st.caption("Critical path: " + " → ".join(timing["critical_path"]))
+                st.json(timing["stages"])
+
+            if st.session_state.orchestrator:
+                with st.expander("📈 Latency Histograms (this process)"):
+                    st.json(st.session_state.orchestrator.get_latency_summary())
         else:
             st.info("Solve a problem to see the execution trace")
     
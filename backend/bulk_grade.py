@@ -0,0 +1,355 @@
+"""
+Offline bulk grading for AI Math Mentor
+Re-solves stored problems through a durable job queue (utils/job_queue.py)
+with a pool of worker processes, each reusing one preloaded orchestrator.
+An interrupted run resumes where it stopped; jobs of a crashed worker are
+picked up again once their lease expires.
+
+Run:
+    python bulk_grade.py enqueue [--file problems.txt] [--batch NAME]
+    python bulk_grade.py run [--workers N]
+    python bulk_grade.py status
+    python bulk_grade.py export results.jsonl [--status failed]
+"""
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import time
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils.config import Config
+from utils.job_queue import DONE, FAILED, Job, JobQueue
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Longest a worker sleeps before checking the queue again
+_IDLE_POLL_SECONDS = 1.0
+
+
+def _problem_key(problem_text: str) -> str:
+    """Dedupe key of a problem: whitespace- and case-insensitive text hash"""
+    normalized = " ".join(problem_text.split()).lower()
+    return hashlib.md5(normalized.encode()).hexdigest()
+
+
+def collect_problems(problems_file: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """
+    Problems to grade, one per distinct problem text
+
+    Args:
+        problems_file: Text file with one problem per line; defaults to the
+            stored interactions (memory/interactions.jsonl)
+
+    Returns:
+        Job payloads: {"problem_text", "previous_answer", "interaction_id"}
+    """
+    problems: Dict[str, Dict[str, Any]] = {}
+    if problems_file is not None:
+        for line in problems_file.read_text(encoding="utf-8").splitlines():
+            if line.strip():
+                problems[_problem_key(line)] = {
+                    "problem_text": line.strip(),
+                    "previous_answer": None,
+                    "interaction_id": None
+                }
+        return list(problems.values())
+
+    from memory.memory_system import MemorySystem
+
+    # Later interactions (including earlier re-grades) overwrite older ones
+    for interaction in MemorySystem().get_recent_interactions(n=sys.maxsize):
+        problem_text = (interaction.get("raw_input") or "").strip()
+        if not problem_text:
+            continue
+        problems[_problem_key(problem_text)] = {
+            "problem_text": problem_text,
+            "previous_answer": (interaction.get("solution") or {}).get("final_answer"),
+            "interaction_id": interaction.get("interaction_id")
+        }
+    return list(problems.values())
+
+
+def enqueue(queue: JobQueue, payloads: List[Dict[str, Any]], batch: str) -> int:
+    """
+    Queue payloads for one grading batch
+
+    A problem is queued once per batch, so enqueueing again (e.g. after a
+    crash) only adds what is missing; a new batch grades everything again.
+
+    Returns:
+        Number of jobs added
+    """
+    return queue.enqueue_many(
+        (payload, f"{batch}:{_problem_key(payload['problem_text'])}") for payload in payloads
+    )
+
+
+def _backoff(attempts: int) -> float:
+    """Exponential backoff with jitter for the given attempt number"""
+    delay = min(Config.JOB_RETRY_MAX_SECONDS, Config.JOB_RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.75, 1.0)
+
+
+def _quota_delay(attempts: int) -> float:
+    """Backoff after a quota rejection: at least until the limiter unblocks"""
+    from utils.rate_limiter import get_rate_limiter
+
+    limiter = get_rate_limiter()
+    blocked_for = max(
+        (stats["blocked_for"] for stats in limiter.stats().values()), default=0.0
+    ) if limiter is not None else 0.0
+    return max(_backoff(attempts), blocked_for)
+
+
+def _grade(job: Job, result: Dict[str, Any], worker_id: str, seconds: float) -> Dict[str, Any]:
+    """Grade summary stored as the job's result"""
+    from utils.sympy_check import answers_match
+
+    final_answer = (result.get("solution") or {}).get("final_answer")
+    previous_answer = job.payload.get("previous_answer")
+    verification = result.get("verification") or {}
+    return {
+        "status": result.get("status"),
+        "interaction_id": result.get("interaction_id"),
+        "final_answer": final_answer,
+        "previous_answer": previous_answer,
+        "matches_previous": (
+            answers_match(final_answer, previous_answer)
+            if final_answer and previous_answer else None
+        ),
+        "is_correct": verification.get("is_correct"),
+        "confidence": verification.get("confidence"),
+        "requires_hitl": result.get("requires_hitl", False),
+        "seconds": round(seconds, 2),
+        "worker": worker_id
+    }
+
+
+def _solver_error(result: Dict[str, Any]) -> Optional[str]:
+    """The solver's error if it fell back instead of solving (SolverAgent._error_output)"""
+    solution = result.get("solution") or {}
+    reasoning = solution.get("reasoning") or ""
+    if not solution.get("steps") and reasoning.startswith("Error:"):
+        return reasoning
+    return None
+
+
+def _process(queue: JobQueue, orchestrator, job: Job, worker_id: str) -> Optional[float]:
+    """
+    Solve one claimed job and record the outcome
+
+    Returns:
+        Seconds the worker should pause (quota exhausted), else None
+    """
+    started = time.monotonic()
+    result = orchestrator.solve_problem(
+        job.payload["problem_text"], "text", timeout=Config.JOB_TIMEOUT_SECONDS or None
+    )
+    status = result.get("status")
+    if status == "success" and _solver_error(result):
+        # A fallback answer is not a grade; try again later
+        status, result = "error", {"message": _solver_error(result)}
+
+    if status == "success":
+        queue.complete(job, worker_id, _grade(job, result, worker_id, time.monotonic() - started))
+        return None
+
+    if status == "quota_exceeded":
+        # Not the job's fault: give the attempt back and let the quota refill
+        delay = _quota_delay(job.attempts)
+        queue.retry(job, worker_id, delay, "quota exceeded", count_attempt=False)
+        logger.warning(f"[{worker_id}] Quota exceeded; pausing {delay:.0f}s")
+        return delay
+
+    error = result.get("message") or status or "unknown error"
+    delay = _backoff(job.attempts)
+    new_status = queue.retry(job, worker_id, delay, error)
+    if new_status == FAILED:
+        logger.error(f"[{worker_id}] Job {job.id} failed after {job.attempts} attempts: {error}")
+    else:
+        logger.warning(f"[{worker_id}] Job {job.id} attempt {job.attempts} {status}; retrying in {delay:.0f}s")
+    return None
+
+
+def _split_quota(workers: int) -> None:
+    """Give this process 1/`workers` of the configured Gemini quota"""
+    for name in ("GEMINI_RPM", "GEMINI_RPD", "GEMINI_TPM"):
+        limit = getattr(Config, name)
+        if limit > 0:
+            setattr(Config, name, max(1, limit // workers))
+
+
+def _worker_main(queue_path: str, workers: int) -> None:
+    """Worker process: claim and solve jobs until the queue is drained"""
+    from utils.orchestrator import MathMentorOrchestrator
+    from utils.pipeline_policy import PipelinePolicy
+
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    # Rate limiters are per process, so the workers share the quota between them
+    _split_quota(workers)
+    # Re-grading must solve again rather than replay stored LLM responses
+    # (the disk tier is shared with earlier runs and the other workers)
+    Config.LLM_CACHE_ENABLED = False
+
+    queue = JobQueue(queue_path)
+    orchestrator = MathMentorOrchestrator(adaptive=True)
+    # ... or serve stored results
+    orchestrator.result_cache = None
+    orchestrator.semantic_cache = None
+    # Every grade gets an LLM verdict (is_correct); explanations are not needed
+    orchestrator.policy = PipelinePolicy(skip_verify_min_confidence=math.inf, defer_explanation=True)
+    # Text only: OCR and Whisper are never needed
+    if not orchestrator.warm_up(["embeddings", "vector_store", "sympy"]).wait(["vector_store"]):
+        raise RuntimeError("Knowledge base failed to load")
+    logger.info(f"[{worker_id}] Worker ready")
+
+    try:
+        while True:
+            job = queue.claim(worker_id)
+            if job is None:
+                wait = queue.next_available_in()
+                if wait is None:
+                    break
+                time.sleep(min(max(wait, 0.1), _IDLE_POLL_SECONDS))
+                continue
+            try:
+                pause = _process(queue, orchestrator, job, worker_id)
+            except KeyboardInterrupt:
+                queue.retry(job, worker_id, 0, "interrupted", count_attempt=False)
+                raise
+            if pause:
+                time.sleep(pause)
+    except KeyboardInterrupt:
+        pass
+    logger.info(f"[{worker_id}] Worker stopped")
+
+
+def _log_progress(queue: JobQueue, started: float, done_at_start: int) -> Dict[str, Any]:
+    progress = queue.progress()
+    finished = progress[DONE] + progress[FAILED]
+    elapsed_minutes = (time.monotonic() - started) / 60
+    rate = (progress[DONE] - done_at_start) / elapsed_minutes if elapsed_minutes > 0 else 0.0
+    remaining = progress["pending"] + progress["running"]
+    eta = f"{remaining / rate:.0f} min" if rate > 0 else "unknown"
+    logger.info(
+        f"Progress: {finished}/{progress['total']} finished "
+        f"({progress[DONE]} done, {progress[FAILED]} failed, {progress['running']} running, "
+        f"{progress['retrying']} retrying) | {rate:.1f} jobs/min | ETA {eta}"
+    )
+    return progress
+
+
+def run(queue: JobQueue, workers: int, progress_interval: float = 30.0) -> Dict[str, Any]:
+    """
+    Process the queue with `workers` processes until no job is left
+
+    A worker that dies is replaced while jobs remain; Ctrl+C stops the
+    workers, which put their current job back.
+
+    Returns:
+        Final queue progress
+    """
+    workers = max(1, workers)
+    context = multiprocessing.get_context("spawn")
+    args = (str(queue.path), workers)
+    processes = [context.Process(target=_worker_main, args=args) for _ in range(workers)]
+    for process in processes:
+        process.start()
+
+    started = time.monotonic()
+    done_at_start = queue.progress()[DONE]
+    try:
+        while any(process.is_alive() for process in processes):
+            deadline = time.monotonic() + progress_interval
+            while time.monotonic() < deadline and any(p.is_alive() for p in processes):
+                time.sleep(0.5)
+            _log_progress(queue, started, done_at_start)
+            for i, process in enumerate(processes):
+                if process.exitcode not in (None, 0) and queue.next_available_in() is not None:
+                    logger.warning(f"Worker {process.pid} exited with {process.exitcode}; restarting")
+                    processes[i] = context.Process(target=_worker_main, args=args)
+                    processes[i].start()
+    except KeyboardInterrupt:
+        logger.info("Interrupted; waiting for workers to put their jobs back")
+    finally:
+        for process in processes:
+            process.join()
+    return _log_progress(queue, started, done_at_start)
+
+
+def export(queue: JobQueue, output: Path, status: str = DONE) -> int:
+    """Write jobs with `status` as JSON lines; returns how many"""
+    rows = queue.results(status)
+    with open(output, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps({
+                "job_id": row["id"],
+                **row["payload"],
+                "attempts": row["attempts"],
+                "error": row["error"],
+                "grade": row["result"]
+            }) + "\n")
+    return len(rows)
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="AI Math Mentor bulk grading")
+    parser.add_argument("--queue", type=Path, default=Config.JOB_QUEUE_PATH,
+                        help="Job queue database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = commands.add_parser("enqueue", help="Queue problems for grading")
+    enqueue_parser.add_argument("--file", type=Path,
+                                help="One problem per line (default: stored interactions)")
+    enqueue_parser.add_argument("--batch", default=date.today().isoformat(),
+                                help="Batch name; a problem is queued once per batch")
+
+    run_parser = commands.add_parser("run", help="Process the queue")
+    run_parser.add_argument("--workers", type=int, default=Config.JOB_WORKERS)
+    run_parser.add_argument("--progress-interval", type=float, default=30.0,
+                            help="Seconds between progress reports")
+
+    commands.add_parser("status", help="Show queue progress")
+    commands.add_parser("requeue-failed", help="Retry failed jobs")
+
+    export_parser = commands.add_parser("export", help="Write results as JSON lines")
+    export_parser.add_argument("output", type=Path)
+    export_parser.add_argument("--status", choices=[DONE, FAILED], default=DONE)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = _parse_args(argv)
+    queue = JobQueue(args.queue)
+
+    if args.command == "enqueue":
+        payloads = collect_problems(args.file)
+        added = enqueue(queue, payloads, args.batch)
+        print(f"Queued {added} of {len(payloads)} problems (batch {args.batch})")
+    elif args.command == "run":
+        Config.validate()
+        progress = run(queue, args.workers, args.progress_interval)
+        print(json.dumps(progress, indent=2))
+    elif args.command == "status":
+        print(json.dumps(queue.progress(), indent=2))
+    elif args.command == "requeue-failed":
+        print(f"Requeued {queue.requeue_failed()} failed jobs")
+    elif args.command == "export":
+        count = export(queue, args.output, args.status)
+        print(f"Wrote {count} {args.status} jobs to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
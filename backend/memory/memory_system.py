@@ -3,6 +3,7 @@ Memory System for Self-Learning
 Stores interactions and enables pattern reuse
 """
 import json
+import threading
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Optional, Any
@@ -10,6 +11,7 @@ import hashlib
 
 from utils.logger import setup_logger
 from utils.config import Config
+from utils.timing import timed
 
 logger = setup_logger(__name__)
 
@@ -22,6 +24,12 @@ class MemorySystem:
         self.memory_dir.mkdir(exist_ok=True)
         self.interactions_file = self.memory_dir / "interactions.jsonl"
         self.corrections_file = self.memory_dir / "corrections.json"
+        self.feedback_file = self.memory_dir / "feedback.jsonl"
+        # Concurrent solves append interactions from several threads
+        self._write_lock = threading.Lock()
+        # Latest feedback per interaction, reloaded when feedback.jsonl changes
+        self._feedback_index: Dict[str, Dict[str, Any]] = {}
+        self._feedback_mtime: Optional[float] = None
         self._load_corrections()
     
     def _load_corrections(self):
@@ -80,8 +88,9 @@ class MemorySystem:
             interaction['interaction_id'] = interaction_id
             
             # Append to interactions file (JSONL format)
-            with open(self.interactions_file, 'a') as f:
-                f.write(json.dumps(interaction) + '\n')
+            line = json.dumps(interaction) + '\n'
+            with self._write_lock, open(self.interactions_file, 'a') as f:
+                f.write(line)
             
             logger.info(f"Stored interaction: {interaction_id}")
             return interaction_id
@@ -146,7 +155,7 @@ class MemorySystem:
             problem_keywords = set(problem_text.lower().split())
             
             similar = []
-            with open(self.interactions_file, 'r') as f:
+            with timed("memory_scan"), open(self.interactions_file, 'r') as f:
                 for line in f:
                     interaction = json.loads(line.strip())
                     past_problem = interaction.get('parsed_problem', {})
@@ -215,7 +224,8 @@ class MemorySystem:
             )
             
             corrected_text = text
-            for original, corrected in corrections_dict.items():
+            # Copy: a correction may be stored by another request meanwhile
+            for original, corrected in list(corrections_dict.items()):
                 if original in corrected_text:
                     corrected_text = corrected_text.replace(original, corrected)
                     logger.info(f"Applied correction: {original} -> {corrected}")
@@ -248,11 +258,41 @@ class MemorySystem:
                 "feedback": feedback
             }
             
-            feedback_file = self.memory_dir / "feedback.jsonl"
-            with open(feedback_file, 'a') as f:
+            with self._write_lock, open(self.feedback_file, 'a') as f:
                 f.write(json.dumps(feedback_entry) + '\n')
             
             logger.info(f"Stored feedback for interaction: {interaction_id}")
             
         except Exception as e:
             logger.error(f"Failed to store feedback: {e}")
+    
+    def get_feedback(self, interaction_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Latest user feedback for an interaction
+        
+        Args:
+            interaction_id: ID of the interaction
+            
+        Returns:
+            The feedback dict ({"approved", "correct_answer", ...}), or None
+        """
+        try:
+            if not self.feedback_file.exists():
+                return None
+            
+            mtime = self.feedback_file.stat().st_mtime
+            with self._write_lock:
+                if mtime != self._feedback_mtime:
+                    index = {}
+                    with open(self.feedback_file, 'r') as f:
+                        for line in f:
+                            if line.strip():
+                                entry = json.loads(line)
+                                index[entry.get("interaction_id")] = entry.get("feedback", {})
+                    self._feedback_index = index
+                    self._feedback_mtime = mtime
+                return self._feedback_index.get(interaction_id)
+            
+        except Exception as e:
+            logger.error(f"Failed to read feedback: {e}")
+            return None
@@ -3,8 +3,12 @@ RAG (Retrieval-Augmented Generation) Pipeline
 Handles knowledge base management, chunking, embedding, and retrieval
 """
 import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional, Tuple
 import json
 
 from langchain_community.embeddings import HuggingFaceEmbeddings
@@ -19,10 +23,64 @@ except ImportError:
 
 from utils.logger import setup_logger
 from utils.config import Config
+from utils.timing import timed
 
 logger = setup_logger(__name__)
 
 
+class QueryEmbeddingBatcher:
+    """
+    Coalesces query embeddings requested concurrently from several threads
+    into one batched `embed_documents` call
+
+    The first caller waits `window_ms` for others to join, then embeds the
+    whole batch (unique texts only) and hands each caller its vector.
+    """
+    
+    def __init__(self, embeddings, window_ms: int = 20, max_batch: int = 32):
+        self.embeddings = embeddings
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        self._pending: List[Tuple[str, Future]] = []
+        self._leader_waiting = False
+        self._lock = threading.Lock()
+    
+    def embed(self, text: str) -> List[float]:
+        """Embed one query, batched with concurrent callers"""
+        future: Future = Future()
+        with self._lock:
+            self._pending.append((text, future))
+            leader = not self._leader_waiting
+            full = len(self._pending) >= self.max_batch
+            if leader:
+                self._leader_waiting = True
+        
+        if leader:
+            deadline = time.monotonic() + self.window_ms / 1000.0
+            while time.monotonic() < deadline and not full:
+                time.sleep(0.002)
+                with self._lock:
+                    full = len(self._pending) >= self.max_batch
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._leader_waiting = False
+            self._embed_batch(batch)
+        
+        return future.result()
+    
+    def _embed_batch(self, batch: List[Tuple[str, Future]]) -> None:
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = dict(zip(texts, self.embeddings.embed_documents(texts)))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        logger.debug(f"Embedded {len(texts)} queries in one batch ({len(batch)} requests)")
+        for text, future in batch:
+            future.set_result(vectors[text])
+
+
 class RAGPipeline:
     """RAG Pipeline for knowledge retrieval"""
     
@@ -36,18 +94,28 @@ class RAGPipeline:
             length_function=len,
         )
         
+        # Query embedding batching, enabled while batch solves are running
+        self._batcher: Optional[QueryEmbeddingBatcher] = None
+        self._batching_users = 0
+        self._batching_lock = threading.Lock()
+        
+        # Concurrent first requests load the model and index once
+        self._embeddings_lock = threading.Lock()
+        self._store_lock = threading.RLock()
+        
     def _initialize_embeddings(self):
         """Initialize embedding model"""
-        if self.embeddings is None:
-            try:
-                logger.info("Initializing embedding model...")
-                self.embeddings = HuggingFaceEmbeddings(
-                    model_name="sentence-transformers/all-MiniLM-L6-v2"
-                )
-                logger.info("Embedding model initialized successfully")
-            except Exception as e:
-                logger.error(f"Failed to initialize embeddings: {e}")
-                raise
+        with self._embeddings_lock:
+            if self.embeddings is None:
+                try:
+                    logger.info("Initializing embedding model...")
+                    self.embeddings = HuggingFaceEmbeddings(
+                        model_name="sentence-transformers/all-MiniLM-L6-v2"
+                    )
+                    logger.info("Embedding model initialized successfully")
+                except Exception as e:
+                    logger.error(f"Failed to initialize embeddings: {e}")
+                    raise
     
     def load_knowledge_base(self) -> List[Document]:
         """Load all knowledge base documents"""
@@ -81,8 +149,18 @@ class RAGPipeline:
         logger.info(f"Loaded {len(documents)} documents from knowledge base")
         return documents
     
+    def ensure_vector_store(self):
+        """Create or load the vector store unless another request already did"""
+        with self._store_lock:
+            if self.vector_store is None:
+                self.create_vector_store()
+    
     def create_vector_store(self, force_recreate: bool = False):
         """Create or load vector store"""
+        with self._store_lock:
+            self._create_vector_store(force_recreate)
+    
+    def _create_vector_store(self, force_recreate: bool):
         vector_store_path = Config.VECTOR_STORE_DIR / "faiss_index"
         
         # Try to load existing vector store
@@ -122,6 +200,51 @@ class RAGPipeline:
         self.vector_store.save_local(str(vector_store_path))
         logger.info(f"Vector store saved to {vector_store_path}")
     
+    @contextmanager
+    def batched_embeddings(self) -> Iterator[None]:
+        """
+        Batch the query embeddings of concurrent `retrieve` calls while active
+
+        Nested and concurrent uses are counted; batching stops when the last
+        one exits. Outside of it each query is embedded on its own, without
+        the batching window delay.
+        """
+        with self._batching_lock:
+            if self._batching_users == 0:
+                self._batcher = QueryEmbeddingBatcher(
+                    self.embeddings,
+                    window_ms=Config.RAG_EMBED_BATCH_WINDOW_MS,
+                    max_batch=Config.RAG_EMBED_BATCH_MAX
+                )
+            self._batching_users += 1
+        try:
+            yield
+        finally:
+            with self._batching_lock:
+                self._batching_users -= 1
+                if self._batching_users == 0:
+                    self._batcher = None
+    
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed text with the knowledge base's embedding model
+        
+        Batched with concurrent calls inside `batched_embeddings`.
+        """
+        self._initialize_embeddings()
+        batcher = self._batcher
+        batched = batcher is not None and batcher.embeddings is not None
+        with timed("embedding", batched=batched):
+            if batched:
+                return batcher.embed(text)
+            return self.embeddings.embed_query(text)
+    
+    def _search(self, query: str, k: int) -> List[Tuple[Document, float]]:
+        """Embed the query, then search the FAISS index (timed separately)"""
+        embedding = self.embed_query(query)
+        with timed("faiss_search", k=k):
+            return self.vector_store.similarity_search_with_score_by_vector(embedding, k=k)
+    
     def retrieve(self, query: str, k: Optional[int] = None) -> List[Dict]:
         """
         Retrieve relevant documents for a query
@@ -131,11 +254,12 @@ class RAGPipeline:
             k: Number of documents to retrieve (default from config)
             
         Returns:
-            List of dicts with content and metadata
+            List of dicts with content, metadata and score (FAISS L2
+            distance, lower is more similar)
         """
         if self.vector_store is None:
             logger.warning("Vector store not initialized. Creating...")
-            self.create_vector_store()
+        self.ensure_vector_store()
         
         if self.vector_store is None:
             logger.error("Failed to create vector store")
@@ -145,14 +269,15 @@ class RAGPipeline:
         
         try:
             logger.info(f"Retrieving top-{k} documents for query: {query[:100]}...")
-            docs = self.vector_store.similarity_search(query, k=k)
+            docs_and_scores = self._search(query, k)
             
             results = []
-            for doc in docs:
+            for doc, score in docs_and_scores:
                 results.append({
                     "content": doc.page_content,
                     "source": doc.metadata.get("source", "unknown"),
-                    "metadata": doc.metadata
+                    "metadata": doc.metadata,
+                    "score": float(score)
                 })
             
             logger.info(f"Retrieved {len(results)} documents")
@@ -173,8 +298,7 @@ class RAGPipeline:
         Returns:
             List of dicts with content, metadata, and scores
         """
-        if self.vector_store is None:
-            self.create_vector_store()
+        self.ensure_vector_store()
         
         if self.vector_store is None:
             return []
@@ -182,7 +306,7 @@ class RAGPipeline:
         k = k or Config.RAG_TOP_K
         
         try:
-            docs_and_scores = self.vector_store.similarity_search_with_score(query, k=k)
+            docs_and_scores = self._search(query, k)
             
             results = []
             for doc, score in docs_and_scores:
@@ -0,0 +1,454 @@
+"""
+Headless HTTP service for AI Math Mentor
+JSON endpoints around one shared, preloaded MathMentorOrchestrator, so solving
+can scale behind a load balancer separately from the Streamlit UI
+
+Run: python server.py [--host HOST] [--port PORT] [--workers N]
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+from contextlib import closing, contextmanager
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils.config import Config
+from utils.logger import setup_logger
+from utils.orchestrator import MathMentorOrchestrator
+
+logger = setup_logger(__name__)
+
+# HTTP status per solve result status; other statuses are 200
+RESULT_STATUS_CODES = {
+    "quota_exceeded": HTTPStatus.TOO_MANY_REQUESTS,
+    "error": HTTPStatus.INTERNAL_SERVER_ERROR,
+}
+
+
+class BadRequestError(ValueError):
+    """Raised for a malformed request body"""
+
+
+class NotFoundError(LookupError):
+    """Raised when a request refers to an unknown interaction"""
+
+
+class MissingApiKeyError(Exception):
+    """Raised when a request needs an API key and neither it nor the server has one"""
+
+
+class QueueFullError(Exception):
+    """Raised when a request cannot get a worker slot"""
+
+
+class WorkerPool:
+    """
+    Bounded worker slots shared by the request threads
+
+    At most `workers` requests compute at once. Up to `max_queue` more wait
+    for a slot, each for at most `queue_timeout` seconds; the rest are
+    rejected right away so a load balancer can retry elsewhere.
+    """
+
+    def __init__(self, workers: int, max_queue: int, queue_timeout: float):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """
+        Hold a worker slot for the duration of the block
+
+        Raises:
+            QueueFullError: If the queue is full or no slot frees up in time
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self.queued >= self.max_queue:
+                    self.rejected += 1
+                    raise QueueFullError(f"All {self.workers} workers busy and the queue is full")
+                self.queued += 1
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+            with self._lock:
+                self.queued -= 1
+                if not acquired:
+                    self.rejected += 1
+            if not acquired:
+                raise QueueFullError(f"No worker became free within {self.queue_timeout:g}s")
+
+        with self._lock:
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "active": self.active,
+                "queued": self.queued,
+                "max_queue": self.max_queue,
+                "completed": self.completed,
+                "rejected": self.rejected
+            }
+
+
+def _field(body: Dict[str, Any], name: str, kind: type = str, required: bool = True) -> Any:
+    """Typed field of a request body"""
+    value = body.get(name)
+    if value is None:
+        if required:
+            raise BadRequestError(f"Missing field: {name}")
+        return None
+    if kind is float and isinstance(value, int) and not isinstance(value, bool):
+        value = float(value)
+    if not isinstance(value, kind):
+        raise BadRequestError(f"Field {name} must be {kind.__name__}")
+    return value
+
+
+class MathMentorService:
+    """Endpoint logic on top of one shared orchestrator"""
+
+    def __init__(self, orchestrator: MathMentorOrchestrator, pool: WorkerPool):
+        self.orchestrator = orchestrator
+        self.pool = pool
+
+    def process_input(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        OCR / ASR / text cleanup
+
+        Body:
+            {"input_type": "text", "text": str} or
+            {"input_type": "image" | "audio", "data": base64 str, "filename": str}
+        """
+        input_type = _field(body, "input_type")
+        if input_type == "text":
+            return self.orchestrator.process_input(_field(body, "text"), "text")
+        if input_type not in ("image", "audio"):
+            raise BadRequestError(f"Unknown input_type: {input_type}")
+
+        try:
+            data = base64.b64decode(_field(body, "data"), validate=True)
+        except ValueError:
+            raise BadRequestError("Field data must be base64")
+        if input_type == "image":
+            return self.orchestrator.process_input(io.BytesIO(data), "image")
+
+        # Whisper reads audio from a file
+        suffix = Path(_field(body, "filename", required=False) or "audio.wav").suffix or ".wav"
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+            f.write(data)
+        try:
+            return self.orchestrator.process_input(f.name, "audio")
+        finally:
+            os.unlink(f.name)
+
+    @staticmethod
+    def _check_api_key(api_key: Optional[str]) -> None:
+        if not api_key and Config.LLM_BACKEND == "gemini" and not Config.GEMINI_API_KEY:
+            raise MissingApiKeyError("A Gemini API key is required (X-Api-Key header)")
+
+    def _solve_args(self, body: Dict[str, Any], api_key: Optional[str]) -> Dict[str, Any]:
+        self._check_api_key(api_key)
+        return {
+            "raw_text": _field(body, "problem_text"),
+            "input_type": _field(body, "input_type", required=False) or "text",
+            "user_edited": _field(body, "user_edited", bool, required=False) or False,
+            "timeout": _field(body, "timeout", float, required=False),
+            "api_key": api_key
+        }
+
+    def solve(self, body: Dict[str, Any], api_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Body:
+            {"problem_text": str, "input_type"?: str, "user_edited"?: bool,
+             "timeout"?: seconds}
+
+        Args:
+            api_key: Caller's Gemini API key (default Config.GEMINI_API_KEY)
+        """
+        return self.orchestrator.solve_problem(**self._solve_args(body, api_key))
+
+    def solve_stream(self, body: Dict[str, Any], api_key: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Body and key as for `solve`; yields the `solve_problem_stream` events"""
+        return self.orchestrator.solve_problem_stream(**self._solve_args(body, api_key))
+
+    def explain(self, body: Dict[str, Any], api_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Explanation of a stored solve (generated now if it was deferred)
+
+        Body:
+            {"interaction_id": str}
+        """
+        self._check_api_key(api_key)
+        interaction_id = _field(body, "interaction_id")
+        interaction = self.orchestrator.memory_system.get_interaction(interaction_id)
+        if interaction is None:
+            raise NotFoundError(f"Unknown interaction: {interaction_id}")
+
+        explanation = self.orchestrator.explain_solution({
+            "status": "success",
+            "interaction_id": interaction_id,
+            "parsed_problem": interaction.get("parsed_problem"),
+            "solution": interaction.get("solution"),
+            "verification": interaction.get("verification"),
+            "explanation": interaction.get("explanation")
+        }, api_key=api_key)
+        if explanation is None:
+            return {"status": "error", "message": "Explanation could not be generated"}
+        return {"status": "success", "interaction_id": interaction_id, "explanation": explanation}
+
+    def feedback(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Body:
+            {"interaction_id": str, "feedback": {"approved"?: bool, ...}}
+        """
+        self.orchestrator.submit_feedback(
+            _field(body, "interaction_id"), _field(body, "feedback", dict)
+        )
+        return {"status": "success"}
+
+    def correction(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Body:
+            {"original": str, "corrected": str, "correction_type": "ocr" | "asr"}
+        """
+        correction_type = _field(body, "correction_type")
+        if correction_type not in ("ocr", "asr"):
+            raise BadRequestError(f"Unknown correction_type: {correction_type}")
+        self.orchestrator.store_correction(
+            _field(body, "original"), _field(body, "corrected"), correction_type
+        )
+        return {"status": "success"}
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "status": "ok",
+            "pipeline_mode": self.orchestrator.pipeline_mode,
+            "workers": self.pool.stats(),
+            "components": self.orchestrator.readiness()
+        }
+
+
+def _json_default(value: Any) -> Any:
+    """Serialize numpy scalars/arrays from OCR and ASR results"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def _dumps(payload: Any) -> bytes:
+    return json.dumps(payload, default=_json_default, ensure_ascii=False).encode("utf-8")
+
+
+class MathMentorRequestHandler(BaseHTTPRequestHandler):
+    """Routes JSON requests to the server's MathMentorService"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "MathMentor/1.0"
+
+    POST_ROUTES = {
+        "/process-input": "process_input",
+        "/solve": "solve",
+        "/explain": "explain",
+        "/feedback": "feedback",
+        "/correction": "correction",
+    }
+
+    # Routes that make LLM calls with the caller's API key
+    API_KEY_ROUTES = {"/solve", "/solve-stream", "/explain"}
+
+    @property
+    def service(self) -> MathMentorService:
+        return self.server.service  # type: ignore[attr-defined]
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+    def _send_json(self,
+                   payload: Any,
+                   status: int = HTTPStatus.OK,
+                   headers: Optional[Dict[str, str]] = None) -> None:
+        body = _dumps(payload)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self._send_json({"status": "error", "message": message}, status, headers)
+
+    def _api_key(self) -> Optional[str]:
+        """Caller's API key from the X-Api-Key or `Authorization: Bearer` header"""
+        api_key = self.headers.get("X-Api-Key")
+        if not api_key:
+            scheme, _, credentials = (self.headers.get("Authorization") or "").partition(" ")
+            api_key = credentials if scheme.lower() == "bearer" else None
+        return (api_key or "").strip() or None
+
+    def _read_body(self) -> Dict[str, Any]:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0 or length > Config.SERVER_MAX_BODY_MB * 1024 * 1024:
+            # The unread body would be parsed as the next request
+            self.close_connection = True
+            raise BadRequestError("Request body too large" if length > 0 else "Invalid Content-Length")
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            raise BadRequestError("Request body must be JSON")
+        if not isinstance(body, dict):
+            raise BadRequestError("Request body must be a JSON object")
+        return body
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._send_json(self.service.health())
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, f"Unknown endpoint: {self.path}")
+
+    def do_POST(self) -> None:
+        if self.path != "/solve-stream" and self.path not in self.POST_ROUTES:
+            # The unread body would be parsed as the next request
+            self.close_connection = True
+            self._send_error(HTTPStatus.NOT_FOUND, f"Unknown endpoint: {self.path}")
+            return
+        try:
+            body = self._read_body()
+            key_args = {"api_key": self._api_key()} if self.path in self.API_KEY_ROUTES else {}
+            with self.service.pool.slot():
+                if self.path == "/solve-stream":
+                    self._stream(self.service.solve_stream(body, **key_args))
+                    return
+                result = getattr(self.service, self.POST_ROUTES[self.path])(body, **key_args)
+        except BadRequestError as e:
+            self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+        except MissingApiKeyError as e:
+            self._send_error(HTTPStatus.UNAUTHORIZED, str(e))
+            return
+        except NotFoundError as e:
+            self._send_error(HTTPStatus.NOT_FOUND, str(e))
+            return
+        except QueueFullError as e:
+            self._send_error(HTTPStatus.SERVICE_UNAVAILABLE, str(e), {"Retry-After": "1"})
+            return
+        except Exception as e:
+            logger.error(f"Error handling {self.path}: {e}")
+            self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, str(e))
+            return
+        self._send_json(result, RESULT_STATUS_CODES.get(result.get("status"), HTTPStatus.OK))
+
+    def _stream(self, events: Iterator[Dict[str, Any]]) -> None:
+        """Send events as newline-delimited JSON, one chunk per event"""
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        # Closing the generator (also when the client disconnects) cancels the solve
+        with closing(events):
+            try:
+                for event in events:
+                    line = _dumps(event) + b"\n"
+                    self.wfile.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                logger.info("Client disconnected from solve stream; cancelling the solve")
+                self.close_connection = True
+
+
+def create_server(orchestrator: MathMentorOrchestrator,
+                  host: Optional[str] = None,
+                  port: Optional[int] = None,
+                  workers: Optional[int] = None,
+                  max_queue: Optional[int] = None) -> ThreadingHTTPServer:
+    """
+    Build the HTTP server (not started)
+
+    Args:
+        orchestrator: Shared orchestrator; its RAG pipeline should be initialized
+        host: Bind address (default Config.SERVER_HOST)
+        port: Port (default Config.SERVER_PORT, 0 picks a free port)
+        workers: Requests computing at once (default Config.SERVER_WORKERS)
+        max_queue: Requests waiting for a worker (default Config.SERVER_MAX_QUEUE)
+
+    Returns:
+        Server with a `service` attribute; call `serve_forever()` to run it
+    """
+    server = ThreadingHTTPServer(
+        (host or Config.SERVER_HOST, Config.SERVER_PORT if port is None else port),
+        MathMentorRequestHandler
+    )
+    server.daemon_threads = True
+    server.service = MathMentorService(  # type: ignore[attr-defined]
+        orchestrator,
+        WorkerPool(
+            workers or Config.SERVER_WORKERS,
+            Config.SERVER_MAX_QUEUE if max_queue is None else max_queue,
+            Config.SERVER_QUEUE_TIMEOUT_SECONDS
+        )
+    )
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI Math Mentor HTTP service")
+    parser.add_argument("--host", default=Config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=Config.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=Config.SERVER_WORKERS)
+    parser.add_argument("--max-queue", type=int, default=Config.SERVER_MAX_QUEUE)
+    args = parser.parse_args()
+
+    # Requests may bring their own key (X-Api-Key), so a server key is optional
+    Config.validate(require_api_key=False)
+    orchestrator = MathMentorOrchestrator()
+    # Load everything in parallel; take traffic once text solves can run,
+    # while OCR and Whisper finish loading
+    warmup = orchestrator.warm_up()
+    if not warmup.wait(["embeddings", "vector_store"]):
+        raise RuntimeError(f"Knowledge base failed to load: {warmup.status()}")
+
+    server = create_server(orchestrator, args.host, args.port, args.workers, args.max_queue)
+    host, port = server.server_address[:2]
+    logger.info(f"Serving on http://{host}:{port} with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
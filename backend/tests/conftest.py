@@ -0,0 +1,8 @@
+"""
+Shared test setup: modules are imported the way the app imports them
+(`from utils.config import Config`), relative to backend/
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
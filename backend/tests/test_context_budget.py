@@ -0,0 +1,47 @@
+"""Tests for utils/context_budget.py"""
+from utils.context_budget import (
+    ContextBudget, compress_steps, estimate_tokens, select_rag_context
+)
+
+
+def _doc(word, score, size=400):
+    return {"content": f"{word} " * size, "source": word, "score": score}
+
+
+def test_rag_context_ranks_by_score_and_fits_budget():
+    docs = [_doc("beta", 2.0), _doc("alpha", 1.0), _doc("gamma", 3.0)]
+    selected = select_rag_context(docs, budget_tokens=300, chunk_max_tokens=200)
+    assert [d["source"] for d in selected] == ["alpha", "beta"]
+    assert sum(estimate_tokens(d["content"]) for d in selected) <= 300 + len(selected)
+
+
+def test_rag_context_skips_duplicates():
+    docs = [_doc("alpha", 1.0, 20), _doc("alpha", 2.0, 20)]
+    assert len(select_rag_context(docs, budget_tokens=400, chunk_max_tokens=200)) == 1
+
+
+def test_rag_context_zero_disables_limits():
+    docs = [_doc("alpha", 1.0), _doc("beta", 2.0)]
+    selected = select_rag_context(docs, budget_tokens=0, chunk_max_tokens=0)
+    assert [d["content"] for d in selected] == [d["content"].strip() for d in docs]
+
+
+def test_compress_steps_fits_budget_and_keeps_last_step():
+    steps = [f"step {i} " + "x" * 400 for i in range(10)] + ["answer is 42"]
+    compressed = compress_steps(steps, budget_tokens=300)
+    assert compressed[-1] == "answer is 42"
+    assert sum(estimate_tokens(s) for s in compressed) <= 300
+
+
+def test_compress_steps_zero_disables_compression():
+    steps = ["x" * 4000, "answer is 42"]
+    assert compress_steps(steps, budget_tokens=0) == steps
+
+
+def test_default_budget_is_unlimited():
+    budget = ContextBudget()
+    docs = [_doc("alpha", 1.0)]
+    steps = ["x" * 4000]
+    # Only the per-chunk cap (Config.RAG_CHUNK_MAX_TOKENS) applies
+    assert [d["source"] for d in budget.rag_context(docs)] == ["alpha"]
+    assert budget.steps(steps) == steps
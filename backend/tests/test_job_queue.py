@@ -0,0 +1,76 @@
+"""Tests for utils/job_queue.py"""
+import time
+
+import pytest
+
+from utils.job_queue import DONE, FAILED, PENDING, RUNNING, JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(tmp_path / "jobs.db", lease_seconds=60, max_attempts=2)
+
+
+def test_enqueue_dedupes_by_key(queue):
+    assert queue.enqueue({"n": 1}, dedupe_key="a")
+    assert not queue.enqueue({"n": 2}, dedupe_key="a")
+    assert queue.enqueue_many([({"n": 3}, "b"), ({"n": 4}, "a"), ({"n": 5}, None)]) == 2
+    assert queue.progress()["total"] == 3
+
+
+def test_claim_leases_jobs_oldest_first(queue):
+    queue.enqueue_many([({"n": 1}, None), ({"n": 2}, None)])
+    first = queue.claim("w1")
+    second = queue.claim("w2")
+    assert (first.payload, first.attempts) == ({"n": 1}, 1)
+    assert second.payload == {"n": 2}
+    assert queue.claim("w3") is None
+    assert queue.progress()[RUNNING] == 2
+
+
+def test_complete_stores_result(queue):
+    queue.enqueue({"n": 1})
+    job = queue.claim("w1")
+    assert queue.complete(job, "w1", {"ok": True})
+    assert queue.next_available_in() is None
+    assert queue.results(DONE)[0]["result"] == {"ok": True}
+
+
+def test_expired_lease_is_claimed_again(queue):
+    queue.enqueue({"n": 1})
+    job = queue.claim("w1")
+    assert queue.claim("w2") is None
+    queue._execute("UPDATE jobs SET lease_expires = ? WHERE id = ?", (time.time() - 1, job.id))
+
+    reclaimed = queue.claim("w2")
+    assert reclaimed.id == job.id
+    assert reclaimed.attempts == 2
+    # The first worker lost its lease, so its late result is dropped
+    assert not queue.complete(job, "w1", {"by": "w1"})
+    assert queue.complete(reclaimed, "w2", {"by": "w2"})
+    assert queue.results(DONE)[0]["result"] == {"by": "w2"}
+
+
+def test_retry_waits_then_fails_after_max_attempts(queue):
+    queue.enqueue({"n": 1})
+    job = queue.claim("w1")
+    assert queue.retry(job, "w1", delay=30, error="boom") == PENDING
+    assert queue.claim("w1") is None
+    assert 0 < queue.next_available_in() <= 30
+    assert queue.progress()["retrying"] == 1
+
+    queue._execute("UPDATE jobs SET available_at = ? WHERE id = ?", (time.time() - 1, job.id))
+    job = queue.claim("w1")
+    assert queue.retry(job, "w1", delay=0, error="boom again") == FAILED
+    assert queue.results(FAILED)[0]["error"] == "boom again"
+
+    assert queue.requeue_failed() == 1
+    assert queue.claim("w1").attempts == 1
+
+
+def test_retry_without_counting_gives_the_attempt_back(queue):
+    queue.enqueue({"n": 1})
+    for _ in range(3):
+        job = queue.claim("w1")
+        assert job.attempts == 1
+        assert queue.retry(job, "w1", delay=0, error="quota", count_attempt=False) == PENDING
@@ -0,0 +1,37 @@
+"""Tests for utils/json_repair.py and the streamed-field parser"""
+import pytest
+
+from utils.json_repair import parse_json_response
+from utils.json_stream import IncrementalJSONParser
+
+
+@pytest.mark.parametrize("latex", [r"\frac{1}{2}", r"2 \times 3", r"\theta", r"\beta", r"a \neq b", r"\text{m}"])
+def test_latex_with_valid_json_escape_round_trips(latex):
+    raw = '{"final_answer": "x = ' + latex + '"}'
+    assert parse_json_response(raw) == {"final_answer": "x = " + latex}
+
+
+def test_latex_with_invalid_json_escape_is_repaired():
+    assert parse_json_response(r'{"answer": "\sqrt{2} \cdot \pi"}') == {"answer": r"\sqrt{2} \cdot \pi"}
+
+
+def test_escaped_latex_and_real_control_characters_are_kept():
+    raw = r'{"a": "\\frac{1}{2}", "b": "line one\nline two", "c": "col\tcol"}'
+    assert parse_json_response(raw) == {"a": r"\frac{1}{2}", "b": "line one\nline two", "c": "col\tcol"}
+
+
+def test_fences_prose_and_trailing_commas():
+    raw = 'Here you go:\n```json\n{"steps": ["a", "b",], "confidence": 0.9,}\n```'
+    assert parse_json_response(raw) == {"steps": ["a", "b"], "confidence": 0.9}
+
+
+def test_unrepairable_response():
+    assert parse_json_response("no json here") is None
+
+
+def test_streamed_fields_keep_latex():
+    parser = IncrementalJSONParser()
+    completed = []
+    for chunk in ['{"steps": ["\\fr', 'ac{1}{2}"], "final_', 'answer": "2 \\times 3"}']:
+        completed += parser.feed(chunk)
+    assert completed == [("steps", [r"\frac{1}{2}"]), ("final_answer", r"2 \times 3")]
@@ -0,0 +1,115 @@
+"""Tests for utils/llm_cache.py and BaseAgent's use of it"""
+import pytest
+
+from agents.llm_backends import LLMBackend, LLMResponse
+from agents.parser_agent import ParserAgent
+from utils.config import Config
+from utils.llm_cache import DiskCache, MemoryLRUCache, TieredResponseCache, make_cache_key
+
+SCHEMA = {"type": "object", "properties": {"a": {"type": "integer"}}}
+
+
+def test_cache_key_covers_model_prompt_temperature_and_schema():
+    key = make_cache_key("m", "prompt", 0.2)
+    assert key == make_cache_key("m", "prompt", 0.20000001)
+    assert len({
+        key,
+        make_cache_key("other", "prompt", 0.2),
+        make_cache_key("m", "prompt!", 0.2),
+        make_cache_key("m", "prompt", 0.7),
+        make_cache_key("m", "prompt", 0.2, SCHEMA),
+    }) == 5
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = MemoryLRUCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("1", None, "3")
+
+
+def test_disk_tier_round_trips_and_expires(tmp_path, monkeypatch):
+    cache = DiskCache(tmp_path, ttl_seconds=60)
+    cache.set("ab12", "value")
+    cache.set("ab12", "newer")
+    assert cache.get("ab12") == "newer"
+    assert not list(tmp_path.glob("*/*.tmp"))
+
+    now = __import__("time").time()
+    monkeypatch.setattr("utils.llm_cache.time.time", lambda: now + 120)
+    assert cache.get("ab12") is None
+
+
+def test_tiered_cache_promotes_disk_hits(tmp_path):
+    disk = DiskCache(tmp_path)
+    disk.set("cd34", "value")
+    cache = TieredResponseCache(MemoryLRUCache(), disk)
+    assert cache.get("cd34") == "value"
+    assert cache.memory.get("cd34") == "value"
+    assert cache.get("missing") is None
+
+
+class _Backend(LLMBackend):
+    """Answers with `text`; the primary model can be made to fail with a 429"""
+
+    name = "fake"
+
+    def __init__(self, text):
+        self.text = text
+        self.fail_primary = False
+        self.calls = []
+
+    def generate(self, prompt, model, temperature, response_schema=None):
+        self.calls.append(model)
+        if self.fail_primary and model == Config.GEMINI_MODEL:
+            raise RuntimeError("429 quota exceeded")
+        return LLMResponse(self.text)
+
+    async def agenerate(self, prompt, model, temperature, response_schema=None):
+        return self.generate(prompt, model, temperature, response_schema)
+
+    def stream(self, prompt, model, temperature, response_schema=None):
+        yield self.generate(prompt, model, temperature, response_schema)
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setattr(Config, "GEMINI_FALLBACK_MODELS", ["fallback-model"])
+    monkeypatch.setattr(Config, "LLM_HEDGE_ENABLED", False)
+    agent = ParserAgent()
+    agent.rate_limiter = None
+    agent.set_response_cache(MemoryLRUCache())
+    return agent
+
+
+MESSAGES = [{"role": "user", "content": "Solve 2x = 4"}]
+
+
+def test_failover_response_is_served_from_cache(agent):
+    backend = _Backend("x = 2")
+    backend.fail_primary = True
+    agent.set_backend(backend)
+    assert agent._call_llm(MESSAGES, 0.1) == "x = 2"
+    assert backend.calls[-1] == "fallback-model"
+
+    calls = len(backend.calls)
+    assert agent._call_llm(MESSAGES, 0.1) == "x = 2"
+    assert len(backend.calls) == calls
+
+
+def test_unparseable_json_mode_response_is_not_cached(agent):
+    backend = _Backend("not json")
+    agent.set_backend(backend)
+    agent._call_llm(MESSAGES, 0.1, response_schema=SCHEMA)
+    agent._call_llm(MESSAGES, 0.1, response_schema=SCHEMA)
+    assert len(backend.calls) == 2
+
+    backend.text = '{"a": 1}'
+    agent._call_llm(MESSAGES, 0.1, response_schema=SCHEMA)
+    agent._call_llm(MESSAGES, 0.1, response_schema=SCHEMA)
+    assert len(backend.calls) == 3
+    # Free text is cached separately from JSON mode
+    agent._call_llm(MESSAGES, 0.1)
+    assert len(backend.calls) == 4
@@ -0,0 +1,55 @@
+"""Tests for utils/rate_limiter.py"""
+import time
+
+import pytest
+
+from utils.rate_limiter import QuotaExceededError, QuotaLimits, RateLimiter
+
+
+def test_burst_up_to_capacity_is_admitted_immediately():
+    limiter = RateLimiter(QuotaLimits(requests_per_minute=3), max_wait_seconds=0)
+    for _ in range(3):
+        limiter.acquire("key", "model")
+    with pytest.raises(QuotaExceededError) as excinfo:
+        limiter.acquire("key", "model")
+    assert 0 < excinfo.value.retry_after <= 20
+
+
+def test_acquire_waits_for_refill_within_max_wait():
+    # 600 RPM refills one request every 0.1s
+    limiter = RateLimiter(QuotaLimits(requests_per_minute=600), max_wait_seconds=1)
+    for _ in range(600):
+        limiter.acquire("key", "model")
+    started = time.monotonic()
+    limiter.acquire("key", "model")
+    assert 0.05 <= time.monotonic() - started < 1
+
+
+def test_quotas_are_per_key_and_model():
+    limiter = RateLimiter(QuotaLimits(requests_per_minute=1), max_wait_seconds=0)
+    limiter.acquire("key-a", "model")
+    limiter.acquire("key-b", "model")
+    limiter.acquire("key-a", "other-model")
+    with pytest.raises(QuotaExceededError):
+        limiter.acquire("key-a", "model")
+
+
+def test_token_limit_counts_estimated_tokens():
+    limiter = RateLimiter(QuotaLimits(tokens_per_minute=1000), max_wait_seconds=0)
+    limiter.acquire("key", "model", tokens=900)
+    with pytest.raises(QuotaExceededError):
+        limiter.acquire("key", "model", tokens=200)
+
+
+def test_zero_disables_a_limit():
+    limiter = RateLimiter(QuotaLimits(), max_wait_seconds=0)
+    for _ in range(1000):
+        limiter.acquire("key", "model", tokens=10_000)
+
+
+def test_penalty_blocks_until_retry_after():
+    limiter = RateLimiter(QuotaLimits(requests_per_minute=100), max_wait_seconds=0)
+    limiter.penalize("key", "model", retry_after=30)
+    with pytest.raises(QuotaExceededError):
+        limiter.acquire("key", "model")
+    limiter.acquire("other-key", "model")
@@ -0,0 +1,73 @@
+"""Tests for utils/result_cache.py"""
+from utils.llm_cache import MemoryLRUCache
+from utils.result_cache import ResultCache, normalize_problem, rename_result_variables
+
+
+def _result(**fields):
+    return {
+        "status": "success",
+        "interaction_id": "i1",
+        "parsed_problem": {"problem_text": "cached", "equations": []},
+        "strategy": {},
+        "verification": {},
+        "explanation": None,
+        "rag_sources": [],
+        **fields
+    }
+
+
+def test_normalize_problem_ignores_names_case_and_spacing():
+    assert normalize_problem("Solve y² − 4 = 0") == ("solve §0^2-4=0", ["y"])
+    assert normalize_problem("solve x**2 - 4 = 0.") == ("solve §0^2-4=0", ["x"])
+
+
+def test_normalize_problem_keeps_variable_case():
+    assert normalize_problem("Find det(A)") == ("find det(§0)", ["A"])
+    assert normalize_problem("A train covers d km") == ("a train covers §0 km", ["d"])
+
+
+def test_rename_keeps_articles_and_renames_math():
+    result = {
+        "explanation": {"explanation": "This is a simple linear equation: a = 4"},
+        "solution": {"final_answer": "a = 4", "steps": ["2a = 8"]}
+    }
+    assert rename_result_variables(result, ["a"], ["b"]) == {
+        "explanation": {"explanation": "This is a simple linear equation: b = 4"},
+        "solution": {"final_answer": "b = 4", "steps": ["2b = 8"]}
+    }
+
+
+def test_rename_is_case_sensitive():
+    result = {"solution": {"final_answer": "det(A) = -2", "steps": ["For a 2x2 matrix, det(A) = ad - bc"]}}
+    assert rename_result_variables(result, ["A"], ["B"]) == {
+        "solution": {"final_answer": "det(B) = -2", "steps": ["For a 2x2 matrix, det(B) = ad - bc"]}
+    }
+
+
+def test_rename_swaps_names():
+    result = {"solution": {"final_answer": "x = 2, y = 3"}}
+    assert rename_result_variables(result, ["x", "y"], ["y", "x"]) == {"solution": {"final_answer": "y = 2, x = 3"}}
+
+
+def test_ambiguous_rename_is_a_miss():
+    assert rename_result_variables({"solution": {"steps": ["getting a 6"]}}, ["a"], ["b"]) is None
+    assert rename_result_variables({"solution": {"final_answer": "x = 1"}}, ["x"], ["y", "z"]) is None
+
+
+def test_result_cache_serves_renamed_result():
+    cache = ResultCache("v1", MemoryLRUCache())
+    solution = {"final_answer": "x = 2", "steps": ["2x = 4", "x = 2"]}
+    assert cache.put("Solve 2x = 4", _result(solution=solution))
+
+    served = cache.get("solve 2y=4")
+    assert served["solution"] == {"final_answer": "y = 2", "steps": ["2y = 4", "y = 2"]}
+    assert served["parsed_problem"]["problem_text"] == "solve 2y=4"
+    assert cache.get("Solve 2x = 5") is None
+
+
+def test_result_cache_miss_when_prose_is_ambiguous():
+    cache = ResultCache("v1", MemoryLRUCache())
+    solution = {"final_answer": "a = 3", "steps": ["Adding 3 to both sides gives a 6"]}
+    cache.put("Solve a - 3 = 0", _result(solution=solution))
+    assert cache.get("Solve b - 3 = 0") is None
+    assert cache.get("Solve a - 3 = 0")["solution"] == solution
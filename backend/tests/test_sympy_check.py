@@ -0,0 +1,41 @@
+"""Tests for utils/sympy_check.py"""
+import pytest
+
+from utils.config import Config
+from utils.sympy_check import answers_match
+
+
+@pytest.mark.parametrize("answer_a, answer_b", [
+    ("x = 2 or x = 3", "x = 3, x = 2"),
+    ("x = 1/2", "x = 0.5"),
+    ("x = √(2)", "x = 2^(1/2)"),
+    ("x = 2", "X = 2"),
+])
+def test_same_values_match(answer_a, answer_b):
+    assert answers_match(answer_a, answer_b) is True
+
+
+@pytest.mark.parametrize("answer_a, answer_b", [
+    ("x = 2", "x = 3"),
+    ("x = 2", "x = 2 or x = 3"),
+])
+def test_different_values_do_not_match(answer_a, answer_b):
+    assert answers_match(answer_a, answer_b) is False
+
+
+@pytest.mark.parametrize("answer_a, answer_b", [
+    ("x = 2", "two apples"),
+    ("The answer is 4", "4"),
+    ("", "x = 2"),
+])
+def test_non_algebra_is_undecided(answer_a, answer_b):
+    assert answers_match(answer_a, answer_b) is None
+
+
+def test_identical_prose_matches():
+    assert answers_match("The answer is 4", "the answer is 4") is True
+
+
+def test_slow_check_times_out_as_undecided(monkeypatch):
+    monkeypatch.setattr(Config, "SYMPY_CHECK_TIMEOUT_SECONDS", 0.5)
+    assert answers_match("factorial(10**7)", "5") is None
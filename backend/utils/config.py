@@ -15,8 +15,94 @@ class Config:
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
     # Default to gemini-2.0-flash (latest fast model) with models/ prefix
     GEMINI_MODEL = os.getenv("GEMINI_MODEL", "models/gemini-2.0-flash")
+    # Ordered models to fail over / hedge to after GEMINI_MODEL (comma-separated)
+    GEMINI_FALLBACK_MODELS = [
+        m.strip() for m in os.getenv("GEMINI_FALLBACK_MODELS", "").split(",") if m.strip()
+    ]
+    # Hedging: if the primary model has not answered after its recent latency
+    # percentile, send a duplicate request to the next model and take the first
+    # valid response
+    LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+    LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+    LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+    LLM_HEDGE_DEFAULT_DELAY_MS = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_MS", "10000"))
+    LLM_HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+    LLM_HEDGE_MAX_WORKERS = int(os.getenv("LLM_HEDGE_MAX_WORKERS", "16"))
     EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-004")
     
+    # LLM backend: "gemini" or "replay" (offline, recorded responses)
+    LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+    # When set, every Gemini response is appended here for later replay
+    LLM_RECORD_PATH = os.getenv("LLM_RECORD_PATH", "")
+    REPLAY_RECORDINGS_PATH = Path(os.getenv("REPLAY_RECORDINGS_PATH", "./memory/llm_recordings.jsonl"))
+    REPLAY_LATENCY_MS = float(os.getenv("REPLAY_LATENCY_MS", "0"))
+    REPLAY_LATENCY_JITTER_MS = float(os.getenv("REPLAY_LATENCY_JITTER_MS", "0"))
+    REPLAY_ERROR_RATE = float(os.getenv("REPLAY_ERROR_RATE", "0"))
+    REPLAY_QUOTA_ERROR_RATE = float(os.getenv("REPLAY_QUOTA_ERROR_RATE", "0"))
+    REPLAY_DEFAULT_RESPONSE = os.getenv("REPLAY_DEFAULT_RESPONSE", "")
+    REPLAY_SEED = int(os.getenv("REPLAY_SEED", "0"))
+    
+    # Structured output: request JSON MIME output with a per-agent schema, and
+    # re-ask once with a repair prompt when local repair fails
+    LLM_JSON_MODE = os.getenv("LLM_JSON_MODE", "true").lower() == "true"
+    LLM_JSON_REASK = os.getenv("LLM_JSON_REASK", "true").lower() == "true"
+    
+    # Speculative solve: for typed text, start the solver on the raw text while
+    # the parser runs and keep it if the parsed problem matches closely enough
+    SPECULATIVE_SOLVE = os.getenv("SPECULATIVE_SOLVE", "false").lower() == "true"
+    SPECULATIVE_MATCH_THRESHOLD = float(os.getenv("SPECULATIVE_MATCH_THRESHOLD", "0.9"))
+    
+    # Worker threads shared by concurrent pipeline stages and speculative solves
+    ORCHESTRATOR_MAX_WORKERS = int(os.getenv("ORCHESTRATOR_MAX_WORKERS", "8"))
+    
+    # Batch solving (solve_many): problems solved at once
+    BATCH_SOLVE_CONCURRENCY = int(os.getenv("BATCH_SOLVE_CONCURRENCY", "4"))
+    
+    # Components the app and server load in parallel background threads at
+    # startup (embeddings, vector_store, ocr, asr, sympy); others load on first use
+    WARMUP_COMPONENTS = [
+        c.strip() for c in os.getenv(
+            "WARMUP_COMPONENTS", "embeddings,vector_store,ocr,asr,sympy"
+        ).split(",") if c.strip()
+    ]
+    
+    # Headless HTTP service (server.py): solves computing at once, requests
+    # allowed to wait for a worker and for how long, and request body limit
+    SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+    SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "4"))
+    SERVER_MAX_QUEUE = int(os.getenv("SERVER_MAX_QUEUE", "32"))
+    SERVER_QUEUE_TIMEOUT_SECONDS = float(os.getenv("SERVER_QUEUE_TIMEOUT_SECONDS", "30"))
+    SERVER_MAX_BODY_MB = float(os.getenv("SERVER_MAX_BODY_MB", "25"))
+    
+    # Bulk grading job queue (bulk_grade.py): SQLite file, worker processes,
+    # per-job solve deadline, lease after which a stuck job is claimed again,
+    # and retry backoff (doubling from the base, capped)
+    JOB_QUEUE_PATH = Path(os.getenv("JOB_QUEUE_PATH", "./memory/jobs.db"))
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+    JOB_TIMEOUT_SECONDS = float(os.getenv("JOB_TIMEOUT_SECONDS", "180"))
+    JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+    JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "30"))
+    JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "1800"))
+    
+    # Pipeline mode: "standard" (5 LLM calls) or "fused" (parse+route, solve, verify+explain)
+    PIPELINE_MODE = os.getenv("PIPELINE_MODE", "standard")
+    
+    # Adaptive pipeline: skip routing for topics with one obvious strategy,
+    # skip the LLM verifier when the solver's SymPy result confirms its answer,
+    # and generate explanations only when requested
+    ADAPTIVE_PIPELINE = os.getenv("ADAPTIVE_PIPELINE", "false").lower() == "true"
+    POLICY_SKIP_ROUTE_TOPICS = [
+        t.strip() for t in os.getenv(
+            "POLICY_SKIP_ROUTE_TOPICS", "algebra,calculus,probability,linear_algebra"
+        ).split(",") if t.strip()
+    ]
+    POLICY_SKIP_ROUTE_MIN_CONFIDENCE = float(os.getenv("POLICY_SKIP_ROUTE_MIN_CONFIDENCE", "0.85"))
+    POLICY_SKIP_VERIFY_MIN_CONFIDENCE = float(os.getenv("POLICY_SKIP_VERIFY_MIN_CONFIDENCE", "0.8"))
+    POLICY_SYMPY_VERIFIED_CONFIDENCE = float(os.getenv("POLICY_SYMPY_VERIFIED_CONFIDENCE", "0.9"))
+    POLICY_DEFER_EXPLANATION = os.getenv("POLICY_DEFER_EXPLANATION", "false").lower() == "true"
+    
     # Confidence Thresholds
     OCR_CONFIDENCE_THRESHOLD = float(os.getenv("OCR_CONFIDENCE_THRESHOLD", "0.7"))
     ASR_CONFIDENCE_THRESHOLD = float(os.getenv("ASR_CONFIDENCE_THRESHOLD", "0.7"))
@@ -29,12 +115,57 @@ class Config:
     RAG_TOP_K = int(os.getenv("RAG_TOP_K", "3"))
     CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "500"))
     CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "50"))
+    # Concurrent retrievals during batch solves share one embedding call
+    RAG_EMBED_BATCH_WINDOW_MS = int(os.getenv("RAG_EMBED_BATCH_WINDOW_MS", "20"))
+    RAG_EMBED_BATCH_MAX = int(os.getenv("RAG_EMBED_BATCH_MAX", "32"))
+    
+    # Prompt context budgets (estimated tokens, ~4 characters per token, 0 disables a limit)
+    SOLVER_RAG_TOKENS = int(os.getenv("SOLVER_RAG_TOKENS", "400"))
+    RAG_CHUNK_MAX_TOKENS = int(os.getenv("RAG_CHUNK_MAX_TOKENS", "200"))
+    VERIFIER_STEPS_TOKENS = int(os.getenv("VERIFIER_STEPS_TOKENS", "800"))
+    EXPLAINER_STEPS_TOKENS = int(os.getenv("EXPLAINER_STEPS_TOKENS", "800"))
+    
+    # LLM Response Cache
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "256"))
+    LLM_CACHE_MAX_DISK_MB = float(os.getenv("LLM_CACHE_MAX_DISK_MB", "100"))
+    LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+    
+    # Whole-pipeline result cache (keyed on normalized problem text)
+    RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "512"))
+    RESULT_CACHE_MAX_DISK_MB = float(os.getenv("RESULT_CACHE_MAX_DISK_MB", "50"))
+    RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", "604800"))
+    # Semantic tier: reuse verified solutions of near-duplicate parsed problems
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    # Stricter cosine similarity when neither problem has equations to compare
+    SEMANTIC_CACHE_NO_EQUATION_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_NO_EQUATION_THRESHOLD", "0.97"))
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
+    
+    # Rate Limiting (per API key and model, 0 disables a limit)
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "false").lower() == "true"
+    GEMINI_RPM = int(os.getenv("GEMINI_RPM", "10"))
+    GEMINI_RPD = int(os.getenv("GEMINI_RPD", "250"))
+    GEMINI_TPM = int(os.getenv("GEMINI_TPM", "250000"))
+    RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "30"))
+    
+    # Request deadlines (0 disables a limit)
+    REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "0"))
+    LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "60"))
+    SYMPY_EXEC_TIMEOUT_SECONDS = float(os.getenv("SYMPY_EXEC_TIMEOUT_SECONDS", "10"))
+    SYMPY_CHECK_TIMEOUT_SECONDS = float(os.getenv("SYMPY_CHECK_TIMEOUT_SECONDS", "2"))
     
     # Directories
     MEMORY_DIR = Path(os.getenv("MEMORY_DIR", "./memory"))
     VECTOR_STORE_DIR = Path(os.getenv("VECTOR_STORE_DIR", "./vector_store"))
     KNOWLEDGE_BASE_DIR = Path("./knowledge_base")
     LOG_DIR = Path(os.getenv("LOG_DIR", "./logs"))
+    # Per-stage latency histograms (p50/p95/p99) dumped here on request
+    LATENCY_HISTOGRAMS_PATH = Path(os.getenv("LATENCY_HISTOGRAMS_PATH", "./logs/latency_histograms.json"))
+    LLM_CACHE_DIR = Path(os.getenv("LLM_CACHE_DIR", "./cache/llm"))
+    RESULT_CACHE_DIR = Path(os.getenv("RESULT_CACHE_DIR", "./cache/results"))
+    SEMANTIC_CACHE_DIR = Path(os.getenv("SEMANTIC_CACHE_DIR", "./cache/semantic"))
     
     # Logging
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
@@ -43,9 +174,14 @@ class Config:
     SUPPORTED_TOPICS = ["algebra", "calculus", "probability", "linear_algebra"]
     
     @classmethod
-    def validate(cls):
-        """Validate configuration"""
-        if not cls.GEMINI_API_KEY:
+    def validate(cls, require_api_key: bool = True):
+        """
+        Validate configuration
+        
+        Args:
+            require_api_key: False when every request brings its own key
+        """
+        if require_api_key and cls.LLM_BACKEND == "gemini" and not cls.GEMINI_API_KEY:
             raise ValueError("GEMINI_API_KEY is required. Please set it in .env file")
         
         # Create necessary directories
@@ -0,0 +1,201 @@
+"""
+Context Budget - Keeps agent prompt context within a token budget
+Selects and trims RAG chunks by retrieval score and compresses long step lists
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from utils.config import Config
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Chunks sharing at least this fraction of their words are treated as duplicates
+DUPLICATE_OVERLAP = 0.8
+
+# A chunk trimmed below this many tokens to fit the budget is dropped instead
+MIN_CHUNK_TOKENS = 40
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token), same as BaseAgent"""
+    return len(text) // 4 + 1
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Trim text to roughly max_tokens, cutting at a line or sentence boundary
+
+    Args:
+        text: Text to trim
+        max_tokens: Token budget
+
+    Returns:
+        The text unchanged if it fits, otherwise a trimmed prefix ending in "..."
+    """
+    max_chars = max(0, max_tokens * 4)
+    if len(text) <= max_chars:
+        return text
+
+    cut = text[:max_chars]
+    # Prefer a natural boundary in the second half of the allowance
+    boundary = max(cut.rfind("\n"), cut.rfind(". "))
+    if boundary >= max_chars // 2:
+        cut = cut[:boundary + 1]
+    return cut.rstrip() + " ..."
+
+
+def _words(text: str) -> set:
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def _is_duplicate(content: str, selected: List[str]) -> bool:
+    """Whether content mostly repeats (or is contained in) an already selected chunk"""
+    words = _words(content)
+    if not words:
+        return True
+    for other in selected:
+        if content in other:
+            return True
+        other_words = _words(other)
+        shared = len(words & other_words)
+        if shared / min(len(words), len(other_words) or 1) >= DUPLICATE_OVERLAP:
+            return True
+    return False
+
+
+def select_rag_context(docs: List[Dict],
+                       budget_tokens: int,
+                       chunk_max_tokens: Optional[int] = None) -> List[Dict]:
+    """
+    Pick the best RAG chunks that fit a token budget
+
+    Chunks are ranked by their "score" (FAISS L2 distance, lower is better;
+    chunks without a score keep their retrieval order), near-duplicates of an
+    already selected chunk are skipped, and each chunk is trimmed to
+    chunk_max_tokens. The last chunk is trimmed to the remaining budget.
+    A budget or cap of 0 (or less) disables that limit.
+
+    Args:
+        docs: Retrieved documents with "content", "source" and optional "score"
+        budget_tokens: Total budget for the selected chunk contents
+        chunk_max_tokens: Cap per chunk (default Config.RAG_CHUNK_MAX_TOKENS)
+
+    Returns:
+        Selected documents (copies) with trimmed "content"
+    """
+    if chunk_max_tokens is None:
+        chunk_max_tokens = Config.RAG_CHUNK_MAX_TOKENS
+    if chunk_max_tokens <= 0:
+        chunk_max_tokens = float("inf")
+    ranked = sorted(
+        enumerate(docs),
+        key=lambda item: (item[1].get("score", float("inf")), item[0])
+    )
+
+    selected: List[Dict] = []
+    remaining = budget_tokens if budget_tokens > 0 else float("inf")
+    for _, doc in ranked:
+        content = doc.get("content", "").strip()
+        if _is_duplicate(content, [d["content"] for d in selected]):
+            continue
+
+        allowance = min(chunk_max_tokens, remaining)
+        if allowance < MIN_CHUNK_TOKENS:
+            break
+        if allowance != float("inf"):
+            content = trim_to_tokens(content, allowance)
+        selected.append({**doc, "content": content})
+        remaining -= estimate_tokens(content)
+
+    if len(selected) < len(docs):
+        logger.debug(f"Context budget kept {len(selected)}/{len(docs)} RAG chunks")
+    return selected
+
+
+def compress_steps(steps: List[str], budget_tokens: int) -> List[str]:
+    """
+    Compress a solution's step list to fit a token budget
+
+    Long steps are trimmed first (the final step is kept whole when possible);
+    if that is not enough, middle steps are replaced by an omission marker
+    while the opening and closing steps are kept. A budget of 0 (or less)
+    disables compression.
+
+    Args:
+        steps: Solution steps
+        budget_tokens: Budget for all steps together
+
+    Returns:
+        The steps unchanged if they fit, otherwise a compressed list
+    """
+    steps = [str(s) for s in steps]
+    if budget_tokens <= 0 or not steps:
+        return steps
+    if sum(estimate_tokens(s) for s in steps) <= budget_tokens:
+        return steps
+
+    # Trim every step to an even share of the budget, leaving the last step
+    # (usually the result) intact if it fits in half the budget
+    last = steps[-1]
+    if estimate_tokens(last) > budget_tokens // 2:
+        last = trim_to_tokens(last, budget_tokens // 2)
+    share = max(MIN_CHUNK_TOKENS, (budget_tokens - estimate_tokens(last)) // max(1, len(steps) - 1))
+    compressed = [trim_to_tokens(s, share) for s in steps[:-1]] + [last]
+    if sum(estimate_tokens(s) for s in compressed) <= budget_tokens:
+        return compressed
+
+    # Still too long: keep the opening and closing steps, elide the middle
+    head: List[str] = []
+    tail: List[str] = [compressed[-1]]
+    used = estimate_tokens(compressed[-1]) + 10  # room for the omission marker
+    front, back = 0, len(compressed) - 2
+    while front <= back:
+        step = compressed[front] if len(head) <= len(tail) else compressed[back]
+        if used + estimate_tokens(step) > budget_tokens:
+            break
+        used += estimate_tokens(step)
+        if len(head) <= len(tail):
+            head.append(step)
+            front += 1
+        else:
+            tail.insert(0, step)
+            back -= 1
+
+    omitted = back - front + 1
+    if omitted > 0:
+        head.append(f"... ({omitted} intermediate steps omitted) ...")
+    return head + tail
+
+
+@dataclass
+class ContextBudget:
+    """Per-agent prompt context budget, in estimated tokens (0 = unlimited)"""
+    rag_tokens: int = 0
+    steps_tokens: int = 0
+
+    def rag_context(self, docs: List[Dict]) -> List[Dict]:
+        return select_rag_context(docs, self.rag_tokens)
+
+    def steps(self, steps: List[str]) -> List[str]:
+        return compress_steps(steps, self.steps_tokens)
+
+
+def get_context_budget(agent_name: str) -> ContextBudget:
+    """
+    Budget for an agent from Config
+
+    Args:
+        agent_name: Agent name, e.g. "SolverAgent"
+
+    Returns:
+        ContextBudget for that agent
+    """
+    budgets = {
+        "SolverAgent": ContextBudget(rag_tokens=Config.SOLVER_RAG_TOKENS),
+        "VerifierAgent": ContextBudget(steps_tokens=Config.VERIFIER_STEPS_TOKENS),
+        "ExplainerAgent": ContextBudget(steps_tokens=Config.EXPLAINER_STEPS_TOKENS),
+        "ReviewerAgent": ContextBudget(steps_tokens=Config.VERIFIER_STEPS_TOKENS),
+    }
+    return budgets.get(agent_name, ContextBudget())
@@ -0,0 +1,208 @@
+"""
+Request Deadlines - Per-request time budgets and cooperative cancellation
+The orchestrator puts a CancellationToken in a context variable; stages, LLM
+calls, rate-limit waits and tool runs check it and cap their waits by it.
+"""
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Iterator, Optional
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class RequestCancelledError(BaseException):
+    """
+    Raised inside a request once it has been cancelled
+
+    Like asyncio.CancelledError it derives from BaseException, so the agents'
+    generic error handlers do not turn a cancelled request into a fallback
+    answer; the orchestrator catches it and returns a partial result.
+    """
+
+    status = "cancelled"
+
+
+class DeadlineExceededError(RequestCancelledError):
+    """Raised inside a request once its deadline has passed"""
+
+    status = "timeout"
+
+
+class CancellationToken:
+    """Deadline and cancel flag shared by everything one request runs"""
+
+    def __init__(self,
+                 timeout: Optional[float] = None,
+                 parent: Optional["CancellationToken"] = None):
+        """
+        Args:
+            timeout: Seconds from now until the deadline (None or <= 0: no deadline)
+            parent: Token whose cancellation and deadline also apply to this one
+        """
+        self.deadline = time.monotonic() + timeout if timeout and timeout > 0 else None
+        self.parent = parent
+        if parent is not None and parent.deadline is not None:
+            self.deadline = parent.deadline if self.deadline is None else min(self.deadline, parent.deadline)
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """Cancel the request; waits in progress wake up and raise"""
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the request was cancelled explicitly (not by its deadline)"""
+        return self._event.is_set() or (self.parent is not None and self.parent.cancelled)
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left until the deadline, or None without one"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cap(self, seconds: float) -> float:
+        """`seconds`, shortened to the time left"""
+        remaining = self.remaining()
+        return seconds if remaining is None else min(seconds, remaining)
+
+    def check(self) -> None:
+        """
+        Raises:
+            RequestCancelledError: If the request was cancelled
+            DeadlineExceededError: If its deadline has passed
+        """
+        if self.cancelled:
+            reason = self.reason or (self.parent.reason if self.parent is not None else None)
+            raise RequestCancelledError(reason or "Request cancelled")
+        if self.expired:
+            raise DeadlineExceededError("Request deadline exceeded")
+
+    def sleep(self, seconds: float) -> None:
+        """
+        Wait `seconds`, waking early on cancellation
+
+        A wait that would outlast the deadline fails right away rather than
+        sleeping until the deadline first.
+        """
+        self.check()
+        remaining = self.remaining()
+        if remaining is not None and seconds > remaining:
+            raise DeadlineExceededError(
+                f"Request deadline exceeded: a {seconds:.1f}s wait does not fit in the "
+                f"{remaining:.1f}s left"
+            )
+        ends = time.monotonic() + seconds
+        while True:
+            left = ends - time.monotonic()
+            if left <= 0:
+                return
+            # Poll the parent too; its cancel does not set this token's event
+            self._event.wait(min(left, 0.1))
+            self.check()
+
+    async def asleep(self, seconds: float) -> None:
+        """Async variant of `sleep`"""
+        self.check()
+        remaining = self.remaining()
+        if remaining is not None and seconds > remaining:
+            raise DeadlineExceededError(
+                f"Request deadline exceeded: a {seconds:.1f}s wait does not fit in the "
+                f"{remaining:.1f}s left"
+            )
+        ends = time.monotonic() + seconds
+        while True:
+            left = ends - time.monotonic()
+            if left <= 0:
+                return
+            await asyncio.sleep(min(left, 0.1))
+            self.check()
+
+
+_current_token: ContextVar[Optional[CancellationToken]] = ContextVar("cancellation_token", default=None)
+
+
+def current_token() -> Optional[CancellationToken]:
+    """Token of the request running in this context, if any"""
+    return _current_token.get()
+
+
+@contextmanager
+def request_scope(token: CancellationToken) -> Iterator[CancellationToken]:
+    """Make `token` the current token for this context (and contexts copied from it)"""
+    reset_token = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset_token)
+
+
+def check_cancelled() -> None:
+    """Raise if the current request was cancelled or ran out of time"""
+    token = _current_token.get()
+    if token is not None:
+        token.check()
+
+
+def time_left(default: Optional[float] = None) -> Optional[float]:
+    """
+    Time budget for a blocking step
+
+    Args:
+        default: The step's own limit in seconds (None: unlimited)
+
+    Returns:
+        `default` capped by the current request's remaining time; None if
+        neither is bounded
+    """
+    token = _current_token.get()
+    remaining = token.remaining() if token is not None else None
+    if remaining is None:
+        return default
+    return remaining if default is None else min(default, remaining)
+
+
+def cancellable_sleep(seconds: float) -> None:
+    """`time.sleep` that respects the current request's token"""
+    token = _current_token.get()
+    if token is None:
+        time.sleep(seconds)
+    else:
+        token.sleep(seconds)
+
+
+async def cancellable_asleep(seconds: float) -> None:
+    """`asyncio.sleep` that respects the current request's token"""
+    token = _current_token.get()
+    if token is None:
+        await asyncio.sleep(seconds)
+    else:
+        await token.asleep(seconds)
+
+
+async def with_deadline(awaitable: Awaitable[Any]) -> Any:
+    """
+    Await `awaitable`, cancelling it when the current request's deadline passes
+
+    Raises:
+        DeadlineExceededError: If the deadline passes first
+    """
+    timeout = time_left()
+    if timeout is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout=max(timeout, 0.001))
+    except asyncio.TimeoutError:
+        check_cancelled()
+        raise DeadlineExceededError("Request deadline exceeded")
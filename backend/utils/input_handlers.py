@@ -5,6 +5,7 @@ Handles Image (OCR), Audio (ASR), and Text input
 import io
 import os
 import ssl
+import threading
 import numpy as np
 from PIL import Image
 from typing import Dict, Tuple, Optional
@@ -31,18 +32,25 @@ class ImageInputHandler:
     def __init__(self):
         self.confidence_threshold = Config.OCR_CONFIDENCE_THRESHOLD
         self.reader = None  # type: ignore
+        # Concurrent first requests load the model once
+        self._init_lock = threading.Lock()
         
     def _initialize_ocr(self):
         """Lazy initialization of OCR model"""
-        if self.reader is None:
-            try:
-                import easyocr
-                logger.info("Initializing EasyOCR...")
-                self.reader = easyocr.Reader(['en'], gpu=False)
-                logger.info("EasyOCR initialized successfully")
-            except Exception as e:
-                logger.error(f"Failed to initialize EasyOCR: {e}")
-                raise
+        with self._init_lock:
+            if self.reader is None:
+                try:
+                    import easyocr
+                    logger.info("Initializing EasyOCR...")
+                    self.reader = easyocr.Reader(['en'], gpu=False)
+                    logger.info("EasyOCR initialized successfully")
+                except Exception as e:
+                    logger.error(f"Failed to initialize EasyOCR: {e}")
+                    raise
+    
+    def preload(self):
+        """Load the OCR model now instead of on the first image"""
+        self._initialize_ocr()
     
     def process_image(self, image_input) -> Dict:
         """
@@ -125,18 +133,25 @@ class AudioInputHandler:
     def __init__(self):
         self.confidence_threshold = Config.ASR_CONFIDENCE_THRESHOLD
         self.model = None  # type: ignore
+        # Concurrent first requests load the model once
+        self._init_lock = threading.Lock()
         
     def _initialize_whisper(self):
         """Lazy initialization of Whisper model"""
-        if self.model is None:
-            try:
-                import whisper
-                logger.info(f"Loading Whisper model: {Config.WHISPER_MODEL}")
-                self.model = whisper.load_model(Config.WHISPER_MODEL)
-                logger.info("Whisper model loaded successfully")
-            except Exception as e:
-                logger.error(f"Failed to load Whisper model: {e}")
-                raise
+        with self._init_lock:
+            if self.model is None:
+                try:
+                    import whisper
+                    logger.info(f"Loading Whisper model: {Config.WHISPER_MODEL}")
+                    self.model = whisper.load_model(Config.WHISPER_MODEL)
+                    logger.info("Whisper model loaded successfully")
+                except Exception as e:
+                    logger.error(f"Failed to load Whisper model: {e}")
+                    raise
+    
+    def preload(self):
+        """Load the Whisper model now instead of on the first recording"""
+        self._initialize_whisper()
     
     def _convert_math_phrases(self, text: str) -> str:
         """Convert spoken math phrases to mathematical notation"""
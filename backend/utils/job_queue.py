@@ -0,0 +1,272 @@
+"""
+Job Queue - Durable SQLite-backed queue for offline bulk work (e.g. nightly
+re-grading of stored problems), shared by worker processes
+
+Delivery is at-least-once: a claimed job is leased to one worker and only
+leaves the queue when that worker completes it, so jobs of a crashed or
+killed worker are claimed again once their lease expires.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from utils.config import Config
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dedupe_key TEXT UNIQUE,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_expires REAL,
+    worker TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, available_at);
+"""
+
+
+@dataclass
+class Job:
+    """A claimed job"""
+    id: int
+    payload: Dict[str, Any]
+    attempts: int
+
+
+class JobQueue:
+    """
+    SQLite job queue safe to share between processes
+
+    Each process (and thread) opens its own connection; claims run in an
+    IMMEDIATE transaction so two workers never lease the same job.
+    """
+
+    def __init__(self,
+                 path: Optional[Union[str, Path]] = None,
+                 lease_seconds: Optional[float] = None,
+                 max_attempts: Optional[int] = None):
+        """
+        Args:
+            path: Database file (default Config.JOB_QUEUE_PATH)
+            lease_seconds: How long a claim lasts before the job can be
+                claimed again (default Config.JOB_LEASE_SECONDS)
+            max_attempts: Attempts before a job is marked failed (default
+                Config.JOB_MAX_ATTEMPTS)
+        """
+        self.path = Path(path or Config.JOB_QUEUE_PATH)
+        self.lease_seconds = lease_seconds or Config.JOB_LEASE_SECONDS
+        self.max_attempts = max_attempts or Config.JOB_MAX_ATTEMPTS
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread and process (connections must not cross a fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _execute(self, sql: str, params: Tuple = ()) -> int:
+        """Run one write statement (autocommit); returns the number of rows changed"""
+        return self._connection().execute(sql, params).rowcount
+
+    def enqueue(self, payload: Dict[str, Any], dedupe_key: Optional[str] = None) -> bool:
+        """
+        Add a job
+
+        Args:
+            payload: JSON-serializable job data
+            dedupe_key: Jobs with a key already in the queue are not added again
+
+        Returns:
+            True if the job was added
+        """
+        return self.enqueue_many([(payload, dedupe_key)]) == 1
+
+    def enqueue_many(self, jobs: Iterable[Tuple[Dict[str, Any], Optional[str]]]) -> int:
+        """
+        Add jobs in one transaction
+
+        Args:
+            jobs: (payload, dedupe_key) pairs
+
+        Returns:
+            Number of jobs added (duplicates are skipped)
+        """
+        now = time.time()
+        rows = [(key, json.dumps(payload), PENDING, now, now, now) for payload, key in jobs]
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (dedupe_key, payload, status, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            added = conn.total_changes - before
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        logger.info(f"Enqueued {added} jobs ({len(rows) - added} already queued)")
+        return added
+
+    def claim(self, worker_id: str) -> Optional[Job]:
+        """
+        Lease the next available job
+
+        Pending jobs whose retry time has come and running jobs whose lease
+        expired are both available, oldest first.
+
+        Args:
+            worker_id: Name of the claiming worker
+
+        Returns:
+            The job, or None if nothing is available right now
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, payload, attempts, status FROM jobs "
+                "WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_expires <= ?) "
+                "ORDER BY id LIMIT 1",
+                (PENDING, now, RUNNING, now)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_expires = ?, "
+                    "worker = ?, updated_at = ? WHERE id = ?",
+                    (RUNNING, now + self.lease_seconds, worker_id, now, row[0])
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        if row[3] == RUNNING:
+            logger.warning(f"Job {row[0]} lease expired; claimed again by {worker_id}")
+        return Job(id=row[0], payload=json.loads(row[1]), attempts=row[2] + 1)
+
+    def complete(self, job: Job, worker_id: str, result: Dict[str, Any]) -> bool:
+        """
+        Mark a job done with its result
+
+        Returns:
+            False if the lease had passed to another worker (the result is dropped)
+        """
+        changed = self._execute(
+            "UPDATE jobs SET status = ?, result = ?, error = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE id = ? AND status = ? AND worker = ?",
+            (DONE, json.dumps(result), time.time(), job.id, RUNNING, worker_id)
+        )
+        if not changed:
+            logger.warning(f"Job {job.id} is no longer leased to {worker_id}; result dropped")
+        return bool(changed)
+
+    def retry(self,
+              job: Job,
+              worker_id: str,
+              delay: float,
+              error: str,
+              count_attempt: bool = True) -> str:
+        """
+        Put a job back after a failed attempt, or fail it for good
+
+        Args:
+            job: The claimed job
+            worker_id: Worker holding the lease
+            delay: Seconds before the job becomes available again
+            error: Reason for the failure
+            count_attempt: False when the job itself did not fail (quota
+                exhausted, worker shutting down); the attempt is given back
+
+        Returns:
+            The job's new status (PENDING or FAILED)
+        """
+        attempts = job.attempts if count_attempt else job.attempts - 1
+        status = FAILED if attempts >= self.max_attempts else PENDING
+        now = time.time()
+        self._execute(
+            "UPDATE jobs SET status = ?, attempts = ?, available_at = ?, error = ?, "
+            "lease_expires = NULL, updated_at = ? WHERE id = ? AND status = ? AND worker = ?",
+            (status, attempts, now + delay, error, now, job.id, RUNNING, worker_id)
+        )
+        return status
+
+    def next_available_in(self) -> Optional[float]:
+        """Seconds until a job can be claimed (0 if one can now), None if none are left"""
+        row = self._connection().execute(
+            "SELECT MIN(CASE WHEN status = ? THEN available_at ELSE lease_expires END) "
+            "FROM jobs WHERE status IN (?, ?)",
+            (PENDING, PENDING, RUNNING)
+        ).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def requeue_failed(self) -> int:
+        """Give failed jobs a fresh set of attempts; returns how many"""
+        return self._execute(
+            "UPDATE jobs SET status = ?, attempts = 0, available_at = ?, updated_at = ? WHERE status = ?",
+            (PENDING, time.time(), time.time(), FAILED)
+        )
+
+    def progress(self) -> Dict[str, Any]:
+        """
+        Returns:
+            {"total", "pending", "running", "done", "failed", "retrying"}
+            ("retrying": pending jobs that already had an attempt)
+        """
+        conn = self._connection()
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for status, count in conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            counts[status] = count
+        retrying = conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = ? AND attempts > 0", (PENDING,)
+        ).fetchone()[0]
+        return {"total": sum(counts.values()), **counts, "retrying": retrying}
+
+    def results(self, status: str = DONE) -> List[Dict[str, Any]]:
+        """Payload, result and error of every job with `status`, in queue order"""
+        rows = self._connection().execute(
+            "SELECT id, payload, result, error, attempts FROM jobs WHERE status = ? ORDER BY id",
+            (status,)
+        )
+        return [
+            {
+                "id": job_id,
+                "payload": json.loads(payload),
+                "result": json.loads(result) if result else None,
+                "error": error,
+                "attempts": attempts
+            }
+            for job_id, payload, result, error, attempts in rows
+        ]
@@ -0,0 +1,129 @@
+"""
+JSON Repair - Local fixes for almost-valid JSON returned by LLMs
+Handles markdown fences, surrounding prose, trailing commas and unescaped
+LaTeX backslashes
+"""
+import json
+import re
+from typing import Any, Optional
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_FENCE_RE = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r",(\s*[}\]])")
+
+# A backslash that does not start a valid JSON escape (e.g. "\sqrt", "\cdot",
+# "\underline"), or that is itself an odd trailing backslash
+_INVALID_ESCAPE_RE = re.compile(r'(?<!\\)((?:\\\\)*)\\(?!["\\/bfnrt]|u[0-9a-fA-F]{4})')
+
+# LaTeX commands whose first letter forms a *valid* JSON escape (\frac -> form
+# feed + "rac"); these parse without error but corrupt the text
+_LATEX_COMMANDS = (
+    "frac", "tfrac", "dfrac", "forall", "flat",
+    "neq", "ne", "nabla", "not", "nu", "ni", "newline",
+    "theta", "tan", "tanh", "times", "text", "textbf", "tau", "to", "top", "triangle", "tilde",
+    "beta", "binom", "bar", "boldsymbol", "big", "bigg", "bmod", "bot",
+    "right", "rightarrow", "rho", "rangle", "rfloor", "rceil", "rm",
+)
+_LATEX_ESCAPE_RE = re.compile(
+    r'(?<!\\)((?:\\\\)*)\\(?=(?:' + "|".join(_LATEX_COMMANDS) + r')\b)'
+)
+# The same commands after decoding ("\x0crac"); two-letter ones such as \ni
+# are left out, as a newline followed by "i" is usually just text
+_DECODED_LATEX_RE = re.compile("|".join(
+    re.escape(json.loads(f'"\\{command[0]}"') + command[1:]) + r"\b"
+    for command in _LATEX_COMMANDS if command[0] in "bfnrt" and len(command) > 2
+))
+
+
+def _has_decoded_latex(value: Any) -> bool:
+    if isinstance(value, str):
+        return _DECODED_LATEX_RE.search(value) is not None
+    if isinstance(value, dict):
+        return any(_has_decoded_latex(v) for v in value.values())
+    if isinstance(value, list):
+        return any(_has_decoded_latex(v) for v in value)
+    return False
+
+
+def loads_latex(text: str, strict: bool = True) -> Any:
+    """
+    `json.loads` that keeps unescaped LaTeX commands intact
+
+    A command such as \frac or \times is valid JSON (form feed + "rac", tab
+    + "imes"); if the decoded text contains one, the raw text is decoded
+    again with those backslashes escaped.
+
+    Raises:
+        ValueError: If the text is not valid JSON
+    """
+    value = json.loads(text, strict=strict)
+    if _has_decoded_latex(value):
+        try:
+            return json.loads(_LATEX_ESCAPE_RE.sub(r"\1\\\\", text), strict=strict)
+        except ValueError:
+            pass
+    return value
+
+
+def _loads(text: str) -> Optional[Any]:
+    try:
+        return loads_latex(text)
+    except ValueError:
+        return None
+
+
+def extract_json_text(text: str) -> str:
+    """
+    Strip markdown fences and surrounding prose from a JSON response
+
+    Args:
+        text: Raw LLM response
+
+    Returns:
+        The substring from the first '{' to the last '}' (or the input)
+    """
+    fenced = _FENCE_RE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    start_idx = text.find('{')
+    end_idx = text.rfind('}') + 1
+    if start_idx >= 0 and end_idx > start_idx:
+        return text[start_idx:end_idx]
+    return text.strip()
+
+
+def parse_json_response(text: str) -> Optional[Any]:
+    """
+    Parse an LLM JSON response, repairing common defects if needed
+
+    Args:
+        text: Raw LLM response
+
+    Returns:
+        The decoded value, or None if it could not be repaired
+    """
+    candidate = extract_json_text(text)
+    value = _loads(candidate)
+    if value is not None:
+        return value
+
+    # Backslashes are fixed in the same pass so a LaTeX command next to a
+    # trailing comma does not decode as a control character
+    candidate = _TRAILING_COMMA_RE.sub(r"\1", candidate)
+    candidate = _LATEX_ESCAPE_RE.sub(r"\1\\\\", candidate)
+    candidate = _INVALID_ESCAPE_RE.sub(r"\1\\\\", candidate)
+    value = _loads(candidate)
+    if value is not None:
+        logger.info("Repaired JSON response (trailing commas / backslashes)")
+        return value
+
+    # Raw newlines/tabs inside strings are rejected by strict mode
+    try:
+        value = loads_latex(candidate, strict=False)
+        logger.info("Repaired JSON response (control characters)")
+        return value
+    except (json.JSONDecodeError, ValueError):
+        return None
@@ -0,0 +1,119 @@
+"""
+Incremental JSON parsing for streamed LLM output
+Emits top-level fields of the first JSON object as soon as each one is complete
+"""
+import json
+from typing import Any, List, Optional, Tuple
+
+from utils.json_repair import loads_latex
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class IncrementalJSONParser:
+    """
+    Incremental parser for a single streamed JSON object
+
+    Text before the first '{' (prose, markdown fences) is ignored. Each call
+    to `feed` returns the (key, value) pairs whose values finished in that
+    chunk, so callers can render e.g. `steps` before `final_answer` arrives.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._phase = "key"  # key -> colon -> value (only tracked at depth 1)
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self.fields: dict = {}
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Consume a chunk of streamed text
+
+        Args:
+            chunk: Next piece of model output
+
+        Returns:
+            List of (key, value) pairs completed by this chunk
+        """
+        completed: List[Tuple[str, Any]] = []
+        if self.done:
+            return completed
+
+        self.buffer += chunk
+        while self._pos < len(self.buffer) and not self.done:
+            i = self._pos
+            ch = self.buffer[i]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._phase == "key" and self._key_start is not None:
+                        self._key = self._decode(self.buffer[self._key_start:i + 1])
+                        self._key_start = None
+                        self._phase = "colon"
+                continue
+
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._phase = "key"
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._phase == "key":
+                    self._key_start = i
+            elif ch == ":" and self._depth == 1 and self._phase == "colon":
+                self._phase = "value"
+                self._value_start = i + 1
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(i, completed)
+                    self.done = True
+            elif ch == "," and self._depth == 1:
+                self._emit(i, completed)
+                self._phase = "key"
+
+        return completed
+
+    def _emit(self, end: int, completed: List[Tuple[str, Any]]) -> None:
+        """Decode the value that ends at `end` and record it"""
+        if self._key is None or self._value_start is None:
+            return
+        raw_value = self.buffer[self._value_start:end].strip()
+        key = self._key
+        self._key = None
+        self._value_start = None
+        if not raw_value:
+            return
+        try:
+            value = loads_latex(raw_value)
+        except ValueError:
+            # Leave malformed values to the final full-response parse
+            logger.debug(f"Could not decode streamed field '{key}'")
+            return
+        self.fields[key] = value
+        completed.append((key, value))
+
+    @staticmethod
+    def _decode(raw: str) -> Optional[str]:
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            return raw.strip('"')
@@ -0,0 +1,55 @@
+"""
+Latency Stats - Rolling latency windows and percentiles per key
+"""
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from utils.config import Config
+
+
+class LatencyStats:
+    """Thread-safe rolling window of recent latencies per key (e.g. model)"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key: str, latency_ms: float) -> None:
+        """Add a latency sample"""
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(latency_ms)
+
+    def count(self, key: str) -> int:
+        with self._lock:
+            return len(self._samples.get(key, ()))
+
+    def percentile(self, key: str, q: float) -> Optional[float]:
+        """
+        Nearest-rank percentile of the recent samples
+
+        Args:
+            key: Key the samples were observed under
+            q: Percentile in [0, 100]
+
+        Returns:
+            Latency in milliseconds, or None without samples
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples:
+            return None
+        rank = max(0, min(len(samples) - 1, int(round(q / 100.0 * len(samples))) - 1))
+        return samples[rank]
+
+
+_model_latency = LatencyStats(window=Config.LLM_HEDGE_WINDOW)
+
+
+def get_model_latency_stats() -> LatencyStats:
+    """Process-wide latency windows of successful LLM calls per model"""
+    return _model_latency
@@ -0,0 +1,308 @@
+"""
+LLM Response Cache
+Content-addressed cache for LLM responses with an in-process LRU tier
+and an on-disk tier with size- and TTL-based eviction
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+from utils.logger import setup_logger
+from utils.config import Config
+
+logger = setup_logger(__name__)
+
+
+def make_cache_key(model_name: str,
+                   prompt: str,
+                   temperature: float,
+                   response_schema: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Build a content-addressed cache key for an LLM call
+
+    Args:
+        model_name: Name of the model that generates the response
+        prompt: Flattened prompt string
+        temperature: Sampling temperature
+        response_schema: Schema of JSON-mode output, None for free text
+
+    Returns:
+        SHA-256 hex digest identifying the call
+    """
+    payload = json.dumps(
+        [model_name, prompt, round(float(temperature), 4), response_schema],
+        ensure_ascii=False,
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(ABC):
+    """Interface for pluggable LLM response caches"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None on a miss"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key: str, value: str) -> None:
+        """Store a response under key"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove all cached responses"""
+        raise NotImplementedError
+
+    def _record(self, hit: bool) -> None:
+        """Update hit/miss counters"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for this cache"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+
+class MemoryLRUCache(ResponseCache):
+    """In-process LRU tier"""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: Optional[float] = None):
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        value = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, cached = entry
+                if self.ttl_seconds and time.time() - created > self.ttl_seconds:
+                    del self._entries[key]
+                else:
+                    value = cached
+                    self._entries.move_to_end(key)
+        self._record(value is not None)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["entries"] = len(self._entries)
+        return stats
+
+
+class DiskCache(ResponseCache):
+    """On-disk tier with TTL expiry and total-size eviction"""
+
+    def __init__(self,
+                 cache_dir: Path,
+                 max_bytes: int = 100 * 1024 * 1024,
+                 ttl_seconds: Optional[float] = 86400):
+        super().__init__()
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._total_bytes = sum(
+            p.stat().st_size for p in self.cache_dir.glob("*/*.json")
+        )
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _is_expired(self, created: float) -> bool:
+        return bool(self.ttl_seconds) and time.time() - created > self.ttl_seconds  # type: ignore[operator]
+
+    def _remove(self, path: Path) -> None:
+        """Delete a cache file and update the size accounting"""
+        try:
+            size = path.stat().st_size
+            path.unlink()
+            self._total_bytes -= size
+        except FileNotFoundError:
+            pass
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        value = None
+        with self._lock:
+            if path.exists():
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        entry = json.load(f)
+                    if self._is_expired(entry.get("created", 0)):
+                        self._remove(path)
+                    else:
+                        value = entry.get("value")
+                        # Touch the file so eviction is least-recently-used
+                        os.utime(path, None)
+                except Exception as e:
+                    logger.warning(f"Failed to read cache entry {key[:12]}: {e}")
+                    self._remove(path)
+        self._record(value is not None)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        path = self._path(key)
+        data = json.dumps({"created": time.time(), "value": value}, ensure_ascii=False)
+        tmp_path = None
+        with self._lock:
+            try:
+                path.parent.mkdir(exist_ok=True)
+                self._remove(path)
+                # A unique temp file per write: other processes (e.g. bulk
+                # grading workers) may be writing the same key
+                with tempfile.NamedTemporaryFile(
+                    'w', encoding='utf-8', dir=path.parent, suffix=".tmp", delete=False
+                ) as f:
+                    tmp_path = f.name
+                    f.write(data)
+                os.replace(tmp_path, path)
+                self._total_bytes += path.stat().st_size
+            except Exception as e:
+                logger.warning(f"Failed to write cache entry {key[:12]}: {e}")
+                if tmp_path is not None and os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                return
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Drop expired entries, then least recently used until under max_bytes"""
+        files = []
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        files.sort()
+
+        if self.ttl_seconds:
+            cutoff = time.time() - self.ttl_seconds
+            for mtime, path in files:
+                if mtime < cutoff:
+                    self._remove(path)
+
+        for _, path in files:
+            if self._total_bytes <= self.max_bytes:
+                break
+            if path.exists():
+                self._remove(path)
+
+        logger.info(f"LLM disk cache evicted down to {self._total_bytes} bytes")
+
+    def clear(self) -> None:
+        with self._lock:
+            for path in self.cache_dir.glob("*/*.json"):
+                self._remove(path)
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["bytes"] = self._total_bytes
+        return stats
+
+
+class TieredResponseCache(ResponseCache):
+    """Memory LRU in front of an optional disk tier; disk hits are promoted"""
+
+    def __init__(self, memory: MemoryLRUCache, disk: Optional[DiskCache] = None):
+        super().__init__()
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        self._record(value is not None)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["memory"] = self.memory.stats()
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+        return stats
+
+
+_default_cache: Optional[ResponseCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Get the process-wide response cache built from Config
+
+    Returns:
+        Shared cache instance, or None if caching is disabled
+    """
+    global _default_cache
+    if not Config.LLM_CACHE_ENABLED:
+        return None
+
+    with _default_cache_lock:
+        if _default_cache is None:
+            disk = None
+            if Config.LLM_CACHE_MAX_DISK_MB > 0:
+                try:
+                    disk = DiskCache(
+                        Config.LLM_CACHE_DIR,
+                        max_bytes=int(Config.LLM_CACHE_MAX_DISK_MB * 1024 * 1024),
+                        ttl_seconds=Config.LLM_CACHE_TTL_SECONDS or None
+                    )
+                except Exception as e:
+                    logger.warning(f"Disk cache unavailable, using memory only: {e}")
+            memory = MemoryLRUCache(
+                Config.LLM_CACHE_MAX_ENTRIES,
+                ttl_seconds=Config.LLM_CACHE_TTL_SECONDS or None
+            )
+            _default_cache = TieredResponseCache(memory, disk)
+            logger.info("LLM response cache initialized")
+        return _default_cache
@@ -1,27 +1,117 @@
 """
 Main Orchestrator - Coordinates all agents and system components
 """
+import asyncio
+import contextvars
+import difflib
+import queue
+import re
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, Iterator, List, Optional
 
+from agents.base_agent import BaseAgent
 from agents.parser_agent import ParserAgent
 from agents.intent_router_agent import IntentRouterAgent
 from agents.solver_agent import SolverAgent
 from agents.verifier_agent import VerifierAgent
 from agents.explainer_agent import ExplainerAgent
+from agents.analyzer_agent import AnalyzerAgent
+from agents.reviewer_agent import ReviewerAgent
 from rag.rag_pipeline import RAGPipeline
 from memory.memory_system import MemorySystem
 from utils.input_handlers import ImageInputHandler, AudioInputHandler, TextInputHandler
 from utils.logger import setup_logger
 from utils.config import Config
+from utils.deadline import (
+    CancellationToken, DeadlineExceededError, RequestCancelledError, current_token, request_scope
+)
+from utils.pipeline_policy import PipelinePolicy, PolicyDecision
+from utils.rate_limiter import QuotaExceededError
+from utils.request_context import current_request, request_context
+from utils.result_cache import (
+    CACHED_FIELDS,
+    ResultCache,
+    SemanticResultCache,
+    get_result_store,
+    pipeline_version,
+)
+from utils.stage_graph import Stage, StageContext, StageGraph
+from utils import sympy_sandbox
+from utils.timing import get_latency_recorder, timed
+from utils.warmup import WarmUp
+from utils.usage_tracker import get_usage_tracker, summarize_calls
 
 logger = setup_logger(__name__)
 
+# Strategy the speculative solver runs with (routing has not happened yet)
+SPECULATIVE_STRATEGY = {
+    "strategy": "step_by_step_derivation",
+    "tools": ["sympy"],
+    "approach": "step-by-step solving",
+    "confidence": 0.5
+}
+
+# Keyword topic guess for speculative solves, checked against the parser's topic
+_TOPIC_KEYWORDS = [
+    ("probability", r"probab|dice|die\b|coin|card|random|expected value|odds"),
+    ("linear_algebra", r"matri|determinant|eigen|vector|rank\b|inverse of"),
+    ("calculus", r"deriv|integra|limit|d/dx|differentia|maxim|minim|\\int|lim\b"),
+]
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Shared worker pool for pipeline stages and speculative solves"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=Config.ORCHESTRATOR_MAX_WORKERS,
+                thread_name_prefix="orchestrator"
+            )
+        return _executor
+
+
+def _guess_topic(text: str) -> str:
+    lowered = text.lower()
+    for topic, pattern in _TOPIC_KEYWORDS:
+        if re.search(pattern, lowered):
+            return topic
+    return "algebra"
+
+
+def _normalize_problem_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
 
 class MathMentorOrchestrator:
     """Main orchestrator for AI Math Mentor system"""
     
-    def __init__(self):
+    def __init__(self,
+                 pipeline_mode: Optional[str] = None,
+                 speculative: Optional[bool] = None,
+                 adaptive: Optional[bool] = None):
+        """
+        Args:
+            pipeline_mode: 'standard' (five LLM calls) or 'fused' (parse+route
+                and verify+explain combined); defaults to Config.PIPELINE_MODE
+            speculative: Start the solver on typed text in parallel with
+                parsing; defaults to Config.SPECULATIVE_SOLVE
+            adaptive: Let the pipeline policy skip routing and verification
+                and defer the explanation; defaults to Config.ADAPTIVE_PIPELINE
+        """
+        self.pipeline_mode = (pipeline_mode or Config.PIPELINE_MODE).lower()
+        if self.pipeline_mode not in ("standard", "fused"):
+            raise ValueError(f"Unknown pipeline mode: {self.pipeline_mode}")
+        self.speculative = Config.SPECULATIVE_SOLVE if speculative is None else speculative
+        self.adaptive = Config.ADAPTIVE_PIPELINE if adaptive is None else adaptive
+        self.policy = PipelinePolicy() if self.adaptive else None
+        
         # Initialize agents
         self.parser_agent = ParserAgent()
         self.intent_router_agent = IntentRouterAgent()
@@ -29,6 +119,10 @@ class MathMentorOrchestrator:
         self.verifier_agent = VerifierAgent()
         self.explainer_agent = ExplainerAgent()
         
+        # Combined agents used by the fused pipeline mode
+        self.analyzer_agent = AnalyzerAgent()
+        self.reviewer_agent = ReviewerAgent()
+        
         # Initialize RAG and Memory
         self.rag_pipeline = RAGPipeline()
         self.memory_system = MemorySystem()
@@ -38,10 +132,62 @@ class MathMentorOrchestrator:
         self.audio_handler = AudioInputHandler()
         self.text_handler = TextInputHandler()
         
-        # Execution trace for UI
-        self.execution_trace = []
+        # Whole-pipeline result caches: exact (normalized text) and semantic
+        # (near-duplicate parsed problems); None when disabled
+        self.pipeline_version = self._pipeline_version()
+        self.result_cache = self._build_result_cache()
+        self.semantic_cache = self._build_semantic_cache()
+        
+        # LLM usage is aggregated per orchestrator session
+        self.session_id = uuid.uuid4().hex[:12]
+        self.usage_tracker = get_usage_tracker()
+        self.latency_recorder = get_latency_recorder()
         
-        logger.info("MathMentorOrchestrator initialized")
+        # Background model loading, started by warm_up()
+        self.warmup: Optional[WarmUp] = None
+        
+        logger.info(
+            f"MathMentorOrchestrator initialized ({self.pipeline_mode} pipeline"
+            f"{', adaptive' if self.adaptive else ''})"
+        )
+    
+    def _pipeline_version(self) -> str:
+        """Version of this pipeline's models, prompts and knowledge base (for cached results)"""
+        agents = [
+            self.parser_agent, self.intent_router_agent, self.solver_agent,
+            self.verifier_agent, self.explainer_agent, self.analyzer_agent,
+            self.reviewer_agent
+        ]
+        return pipeline_version(
+            self.solver_agent._model_candidates(),
+            [agent.prompt_fingerprint() for agent in agents],
+            self.pipeline_mode
+        )
+    
+    def _build_result_cache(self) -> Optional[ResultCache]:
+        store = get_result_store()
+        if store is None:
+            return None
+        return ResultCache(self.pipeline_version, store, self.memory_system)
+    
+    def _build_semantic_cache(self) -> Optional[SemanticResultCache]:
+        if not Config.SEMANTIC_CACHE_ENABLED:
+            return None
+        # Embeds with the same MiniLM model the RAG pipeline loads
+        return SemanticResultCache(
+            self.pipeline_version,
+            self.rag_pipeline.embed_query,
+            Config.SEMANTIC_CACHE_DIR,
+            self.memory_system
+        )
+    
+    @property
+    def execution_trace(self) -> List[Dict[str, Any]]:
+        """Execution trace of the request running in this context (see utils/request_context.py)"""
+        return current_request().execution_trace
+    
+    def _trace(self, entry: Dict[str, Any]) -> None:
+        current_request().trace(entry)
     
     def initialize_rag(self):
         """Initialize RAG pipeline (create vector store)"""
@@ -53,6 +199,42 @@ class MathMentorOrchestrator:
             logger.error(f"Failed to initialize RAG: {e}")
             raise
     
+    def warm_up(self, components: Optional[List[str]] = None) -> WarmUp:
+        """
+        Start loading heavy components in parallel background threads
+        
+        Returns right away. The embedding model, FAISS index, EasyOCR,
+        Whisper and a SymPy sandbox worker load concurrently, so a cold start
+        takes as long as the slowest of them. A text solve only waits for the
+        components it uses (the index), and an image or audio input that
+        arrives while its model is loading waits for that load.
+        
+        Args:
+            components: Names to load (default Config.WARMUP_COMPONENTS)
+        
+        Returns:
+            The warm-up; `status()` reports readiness per component
+        """
+        if self.warmup is not None:
+            return self.warmup
+        loaders = {
+            "embeddings": lambda: self.rag_pipeline.embed_query("warm-up"),
+            "vector_store": self.rag_pipeline.ensure_vector_store,
+            "ocr": self.image_handler.preload,
+            "asr": self.audio_handler.preload,
+            "sympy": sympy_sandbox.warm_up,
+        }
+        names = Config.WARMUP_COMPONENTS if components is None else components
+        unknown = [name for name in names if name not in loaders]
+        if unknown:
+            raise ValueError(f"Unknown warm-up components: {', '.join(unknown)}")
+        self.warmup = WarmUp({name: loaders[name] for name in names}).start()
+        return self.warmup
+    
+    def readiness(self) -> Dict[str, Dict[str, Any]]:
+        """Per-component warm-up status (empty before `warm_up`), see WarmUp.status"""
+        return self.warmup.status() if self.warmup is not None else {}
+    
     def process_input(self, 
                      input_data: Any, 
                      input_type: str) -> Dict[str, Any]:
@@ -64,9 +246,17 @@ class MathMentorOrchestrator:
             input_type: 'image', 'audio', or 'text'
             
         Returns:
-            Processing result with extracted text and metadata
+            Processing result with extracted text and metadata, and its
+            "execution_trace"
         """
-        self.execution_trace.append({
+        with request_context() as request:
+            result = self._process_input(input_data, input_type)
+        result["execution_trace"] = request.execution_trace
+        return result
+    
+    def _process_input(self, input_data: Any, input_type: str) -> Dict[str, Any]:
+        """Body of `process_input`"""
+        self._trace({
             "stage": "Input Processing",
             "status": "started",
             "type": input_type
@@ -91,7 +281,7 @@ class MathMentorOrchestrator:
                 )
                 result['corrected_text'] = processed_text
             
-            self.execution_trace.append({
+            self._trace({
                 "stage": "Input Processing",
                 "status": "completed",
                 "confidence": result.get("confidence", 1.0),
@@ -102,17 +292,676 @@ class MathMentorOrchestrator:
             
         except Exception as e:
             logger.error(f"Error processing input: {e}")
-            self.execution_trace.append({
+            self._trace({
                 "stage": "Input Processing",
                 "status": "error",
                 "error": str(e)
             })
             raise
     
-    def solve_problem(self, 
-                     raw_text: str, 
+    def _run_agent(self,
+                   agent: BaseAgent,
+                   input_data: Dict[str, Any],
+                   stage: str,
+                   on_event: Optional[Callable[[Dict[str, Any]], None]]) -> Dict[str, Any]:
+        """Run an agent, streaming its output fields to on_event when given"""
+        if on_event is None:
+            return agent.execute(input_data)
+        
+        output: Dict[str, Any] = {}
+        for event in agent.execute_stream(input_data):
+            if event["type"] == "field":
+                on_event({**event, "stage": stage})
+            else:
+                output = event["output"]
+        return output
+    
+    def _speculative_problem(self, raw_text: str) -> Dict[str, Any]:
+        """Parser-shaped stand-in built from the raw text"""
+        return {
+            "problem_text": raw_text.strip(),
+            "topic": _guess_topic(raw_text),
+            "variables": [],
+            "constraints": [],
+            "equations": [],
+            "needs_clarification": False,
+            "confidence": 0.5,
+            "reasoning": "Speculative: raw input used before parsing"
+        }
+    
+    def _speculative_solve(self, raw_text: str) -> Dict[str, Any]:
+        """Retrieve context and solve the raw text without waiting for the parser"""
+        parsed_problem = self._speculative_problem(raw_text)
+        rag_context = self.rag_pipeline.retrieve(parsed_problem["problem_text"])
+        solution = self.solver_agent.execute({
+            "parsed_problem": parsed_problem,
+            "strategy": SPECULATIVE_STRATEGY,
+            "rag_context": rag_context
+        })
+        return {
+            "parsed_problem": parsed_problem,
+            "rag_context": rag_context,
+            "solution": solution
+        }
+    
+    async def _aspeculative_solve(self, raw_text: str) -> Dict[str, Any]:
+        """Async variant of `_speculative_solve`"""
+        parsed_problem = self._speculative_problem(raw_text)
+        rag_context = await asyncio.to_thread(
+            self.rag_pipeline.retrieve, parsed_problem["problem_text"]
+        )
+        solution = await self.solver_agent.aexecute({
+            "parsed_problem": parsed_problem,
+            "strategy": SPECULATIVE_STRATEGY,
+            "rag_context": rag_context
+        })
+        return {
+            "parsed_problem": parsed_problem,
+            "rag_context": rag_context,
+            "solution": solution
+        }
+    
+    def _start_speculation(self, raw_text: str, input_type: str) -> Optional[Future]:
+        """Start a speculative solve for typed text when enabled"""
+        if not self.speculative or input_type != "text":
+            return None
+        logger.info("Starting speculative solve in parallel with parsing...")
+        return _get_executor().submit(
+            contextvars.copy_context().run, self._speculative_solve, raw_text
+        )
+    
+    def _speculation_matches(self, raw_text: str, parsed_problem: Dict[str, Any]) -> bool:
+        """Check whether the parser kept the problem close enough to the raw text"""
+        speculative_problem = self._speculative_problem(raw_text)
+        similarity = difflib.SequenceMatcher(
+            None,
+            _normalize_problem_text(speculative_problem["problem_text"]),
+            _normalize_problem_text(parsed_problem.get("problem_text", ""))
+        ).ratio()
+        topic_match = speculative_problem["topic"] == parsed_problem.get("topic")
+        hit = (similarity >= Config.SPECULATIVE_MATCH_THRESHOLD and topic_match
+               and not parsed_problem.get("needs_clarification", False))
+        
+        self._trace({
+            "stage": "Speculative Solve",
+            "status": "hit" if hit else "miss",
+            "similarity": round(similarity, 3),
+            "topic_match": topic_match
+        })
+        logger.info(f"Speculative solve {'kept' if hit else 'discarded'} (similarity {similarity:.2f})")
+        return hit
+    
+    def _emit_solution_fields(self,
+                              solution: Dict[str, Any],
+                              on_event: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+        """Replay a speculative solution to a streaming listener"""
+        if on_event is None:
+            return
+        for field, value in solution.items():
+            on_event({
+                "type": "field",
+                "stage": "Solver Agent",
+                "agent": self.solver_agent.name,
+                "field": field,
+                "value": value
+            })
+    
+    def _emit_partial(self,
+                      field: str,
+                      value: Any,
+                      on_event: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+        """Pass a finished result field to a streaming listener"""
+        if on_event is not None:
+            on_event({"type": "partial", "field": field, "value": value})
+    
+    def _emit_stage_partials(self,
+                             ctx: StageContext,
+                             name: str,
+                             on_event: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+        """Emit the result fields a finished pipeline stage produced"""
+        output = ctx[name]
+        if name == "parse":
+            self._emit_partial("parsed_problem", output["parsed_problem"], on_event)
+            if output["strategy"] is not None:
+                # Fused mode: the analyzer also routed
+                self._emit_partial("strategy", output["strategy"], on_event)
+        elif name == "semantic" and output is not None:
+            for field in CACHED_FIELDS:
+                if field != "parsed_problem":
+                    self._emit_partial(field, output[field], on_event)
+        elif name == "rag" and output is not None:
+            self._emit_partial("rag_sources", self._rag_sources(output), on_event)
+        elif name == "route" and output is not None:
+            self._emit_partial("strategy", output, on_event)
+        elif name == "solve" and output is not None:
+            if ctx["speculation"] is not None:
+                self._emit_partial("strategy", self._strategy(ctx), on_event)
+            self._emit_partial("solution", output, on_event)
+        elif name == "verify" and output is not None:
+            self._emit_partial("verification", output, on_event)
+        elif name == "explain" and ctx["semantic"] is None:
+            # None when the policy deferred it
+            self._emit_partial("explanation", output, on_event)
+        elif name == "review" and output is not None:
+            self._emit_partial("verification", output["verification"], on_event)
+            self._emit_partial("explanation", output["explanation"], on_event)
+    
+    def _pipeline_graph(self) -> StageGraph:
+        """
+        Declarative stage graph of the solve pipeline
+        
+        Memory lookup, RAG retrieval and intent routing only depend on the
+        parser output, so they run concurrently; the solver waits for RAG and
+        routing, and verification/explanation follow the solver. A semantic
+        cache hit right after parsing skips every later stage.
+        """
+        not_cached = lambda ctx: ctx["semantic"] is None
+        should_route = lambda ctx: ctx["semantic"] is None and ctx["speculation"] is None
+        stages = [
+            Stage("parse", self._stage_parse, afn=self._astage_parse),
+            Stage("semantic", self._stage_semantic_cache, deps=("parse",),
+                  afn=self._astage_semantic_cache,
+                  when=lambda ctx: self.semantic_cache is not None),
+            Stage("speculation", self._stage_speculation, deps=("parse", "semantic"),
+                  afn=self._astage_speculation,
+                  when=lambda ctx: ctx["speculative_run"] is not None and ctx["semantic"] is None),
+            Stage("memory", self._stage_memory, deps=("parse", "semantic"), when=not_cached),
+            Stage("rag", self._stage_rag, deps=("parse", "semantic", "speculation"),
+                  afn=self._astage_rag, when=not_cached),
+        ]
+        
+        if self.pipeline_mode == "fused":
+            # Routing was done by the analyzer; verify and explain are one call
+            stages += [
+                Stage("solve", self._stage_solve, deps=("parse", "speculation", "rag"),
+                      afn=self._astage_solve, when=not_cached),
+                Stage("review", self._stage_review, deps=("parse", "solve"),
+                      afn=self._astage_review, when=not_cached),
+            ]
+        else:
+            stages += [
+                Stage("route", self._stage_route, deps=("parse", "semantic", "speculation"),
+                      afn=self._astage_route, when=should_route),
+                Stage("solve", self._stage_solve, deps=("parse", "speculation", "rag", "route"),
+                      afn=self._astage_solve, when=not_cached),
+                Stage("verify", self._stage_verify, deps=("parse", "solve"),
+                      afn=self._astage_verify, when=not_cached),
+                Stage("explain", self._stage_explain, deps=("parse", "solve", "verify"),
+                      afn=self._astage_explain, when=not_cached),
+            ]
+        return StageGraph(stages)
+    
+    def _agent_stage(self,
+                     ctx: StageContext,
+                     agent: BaseAgent,
+                     stage: str,
+                     input_data: Dict[str, Any],
+                     summary: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Run an agent as a pipeline stage, tracing its start and completion"""
+        self._trace({"stage": stage, "status": "started"})
+        with timed(stage):
+            output = self._run_agent(agent, input_data, stage, ctx["on_event"])
+        self._trace({
+            "stage": stage,
+            "status": "completed",
+            **(summary(output) if summary else {"output": output})
+        })
+        return output
+    
+    async def _aagent_stage(self,
+                            ctx: StageContext,
+                            agent: BaseAgent,
+                            stage: str,
+                            input_data: Dict[str, Any],
+                            summary: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Async variant of `_agent_stage`"""
+        self._trace({"stage": stage, "status": "started"})
+        with timed(stage):
+            output = await agent.aexecute(input_data)
+        self._trace({
+            "stage": stage,
+            "status": "completed",
+            **(summary(output) if summary else {"output": output})
+        })
+        return output
+    
+    def _apply_policy(self, decision: PolicyDecision) -> PolicyDecision:
+        """Record a pipeline policy decision in the execution trace"""
+        logger.info(f"Policy: {decision.action} {decision.target} ({decision.reason})")
+        self._trace(decision.trace_entry())
+        return decision
+    
+    def _policy_strategy(self, ctx: StageContext) -> Optional[Dict[str, Any]]:
+        """Topic strategy if the policy skips the intent router, else None"""
+        if self.policy is None:
+            return None
+        parsed_problem = self._parsed(ctx)
+        if self._apply_policy(self.policy.route(parsed_problem)).runs:
+            return None
+        return self.policy.topic_strategy(parsed_problem)
+    
+    def _policy_verification(self, ctx: StageContext, target: str) -> Optional[Dict[str, Any]]:
+        """SymPy-confirmed verification if the policy skips the verifier, else None"""
+        if self.policy is None:
+            return None
+        if self._apply_policy(self.policy.verify(ctx["solve"], target)).runs:
+            return None
+        return self.policy.sympy_verification(ctx["solve"])
+    
+    def _explanation_deferred(self, target: str = "Explainer Agent") -> bool:
+        return self.policy is not None and not self._apply_policy(self.policy.explain(target)).runs
+    
+    def _parsed(self, ctx: StageContext) -> Dict[str, Any]:
+        return ctx["parse"]["parsed_problem"]
+    
+    def _strategy(self, ctx: StageContext) -> Dict[str, Any]:
+        if ctx["speculation"] is not None:
+            # Routing is skipped; the kept solve ran with the default strategy
+            return dict(SPECULATIVE_STRATEGY)
+        if self.pipeline_mode == "fused":
+            return ctx["parse"]["strategy"]
+        return ctx["route"]
+    
+    def _note_clarification(self, parsed_problem: Dict[str, Any]) -> None:
+        """Note if clarification is flagged (but continue solving)"""
+        if parsed_problem.get("needs_clarification", False):
+            logger.warning("Problem flagged for clarification, but will attempt to solve anyway")
+            self._trace({
+                "stage": "Clarification Notice",
+                "status": "warning",
+                "message": "Problem may be ambiguous but proceeding with best interpretation"
+            })
+    
+    def _parse_input(self, ctx: StageContext) -> Dict[str, Any]:
+        return {"raw_text": ctx["raw_text"], "input_type": ctx["input_type"]}
+    
+    def _stage_parse(self, ctx: StageContext) -> Dict[str, Any]:
+        """Stage 1: Parse the problem (parse + route in fused mode)"""
+        if self.pipeline_mode == "fused":
+            logger.info("Stage 1: Analyzing problem (parse + route)...")
+            analysis = self._agent_stage(
+                ctx, self.analyzer_agent, "Analyzer Agent", self._parse_input(ctx)
+            )
+        else:
+            logger.info("Stage 1: Parsing problem...")
+            analysis = {
+                "parsed_problem": self._agent_stage(
+                    ctx, self.parser_agent, "Parser Agent", self._parse_input(ctx)
+                ),
+                "strategy": None
+            }
+        self._note_clarification(analysis["parsed_problem"])
+        return analysis
+    
+    async def _astage_parse(self, ctx: StageContext) -> Dict[str, Any]:
+        """Async variant of `_stage_parse`"""
+        if self.pipeline_mode == "fused":
+            logger.info("Stage 1: Analyzing problem (parse + route)...")
+            analysis = await self._aagent_stage(
+                ctx, self.analyzer_agent, "Analyzer Agent", self._parse_input(ctx)
+            )
+        else:
+            logger.info("Stage 1: Parsing problem...")
+            analysis = {
+                "parsed_problem": await self._aagent_stage(
+                    ctx, self.parser_agent, "Parser Agent", self._parse_input(ctx)
+                ),
+                "strategy": None
+            }
+        self._note_clarification(analysis["parsed_problem"])
+        return analysis
+    
+    def _semantic_lookup_done(self, ctx: StageContext, cached: Optional[Dict[str, Any]]) -> None:
+        if cached is None:
+            self._trace({"stage": "Semantic Cache", "status": "miss"})
+            return
+        logger.info(
+            f"Near-duplicate result served from semantic cache "
+            f"(similarity {cached['similarity']:.3f}, interaction {cached['interaction_id']})"
+        )
+        self._trace({
+            "stage": "Semantic Cache",
+            "status": "hit",
+            "similarity": cached["similarity"],
+            "approved": cached["approved"]
+        })
+        if ctx["speculative_run"] is not None:
+            ctx["speculative_run"].cancel()
+        self._emit_solution_fields(cached["solution"] or {}, ctx["on_event"])
+    
+    def _stage_semantic_cache(self, ctx: StageContext) -> Optional[Dict[str, Any]]:
+        """Look for a verified solution of a near-duplicate problem"""
+        with timed("Semantic Cache"):
+            cached = self.semantic_cache.get(self._parsed(ctx))
+        self._semantic_lookup_done(ctx, cached)
+        return cached
+    
+    async def _astage_semantic_cache(self, ctx: StageContext) -> Optional[Dict[str, Any]]:
+        """Async variant of `_stage_semantic_cache`"""
+        with timed("Semantic Cache"):
+            cached = await asyncio.to_thread(self.semantic_cache.get, self._parsed(ctx))
+        # Back on the loop: the speculative task may only be cancelled from here
+        self._semantic_lookup_done(ctx, cached)
+        return cached
+    
+    def _stage_speculation(self, ctx: StageContext) -> Optional[Any]:
+        """Keep the speculative solve only if parsing barely changed the problem"""
+        speculative_run = ctx["speculative_run"]
+        if self._speculation_matches(ctx["raw_text"], self._parsed(ctx)):
+            if isinstance(speculative_run, Future) and speculative_run.cancel():
+                # Still queued in the pool: it has no head start, and waiting
+                # for it from a stage worker could starve the pool
+                logger.info("Speculative solve had not started; solving normally")
+                return None
+            return speculative_run
+        speculative_run.cancel()
+        return None
+    
+    async def _astage_speculation(self, ctx: StageContext) -> Optional[Any]:
+        # Runs on the loop: the speculative task may only be cancelled from there
+        return self._stage_speculation(ctx)
+    
+    def _stage_memory(self, ctx: StageContext) -> List[Dict]:
+        """Stage 2: Check for similar past problems"""
+        logger.info("Stage 2: Checking memory for similar problems...")
+        parsed_problem = self._parsed(ctx)
+        with timed("Memory Retrieval"):
+            similar_problems = self.memory_system.find_similar_problems(
+                parsed_problem.get("problem_text", ""),
+                parsed_problem.get("topic", ""),
+                n=3
+            )
+        self._trace({
+            "stage": "Memory Retrieval",
+            "status": "completed",
+            "similar_found": len(similar_problems)
+        })
+        return similar_problems
+    
+    def _stage_rag(self, ctx: StageContext) -> List[Dict]:
+        """Stage 3: RAG Retrieval"""
+        logger.info("Stage 3: Retrieving relevant knowledge...")
+        self._trace({"stage": "RAG Retrieval", "status": "started"})
+        with timed("RAG Retrieval"):
+            if ctx["speculation"] is not None:
+                # Reuse the context the kept speculative solve retrieved
+                rag_context = ctx["speculation"].result()["rag_context"]
+            else:
+                rag_context = self.rag_pipeline.retrieve(self._parsed(ctx).get("problem_text", ""))
+        self._trace({
+            "stage": "RAG Retrieval",
+            "status": "completed",
+            "documents_retrieved": len(rag_context)
+        })
+        return rag_context
+    
+    async def _astage_rag(self, ctx: StageContext) -> List[Dict]:
+        """Async variant of `_stage_rag`"""
+        logger.info("Stage 3: Retrieving relevant knowledge...")
+        self._trace({"stage": "RAG Retrieval", "status": "started"})
+        with timed("RAG Retrieval"):
+            if ctx["speculation"] is not None:
+                rag_context = (await ctx["speculation"])["rag_context"]
+            else:
+                rag_context = await asyncio.to_thread(
+                    self.rag_pipeline.retrieve, self._parsed(ctx).get("problem_text", "")
+                )
+        self._trace({
+            "stage": "RAG Retrieval",
+            "status": "completed",
+            "documents_retrieved": len(rag_context)
+        })
+        return rag_context
+    
+    def _stage_route(self, ctx: StageContext) -> Dict[str, Any]:
+        """Stage 4: Intent Routing"""
+        strategy = self._policy_strategy(ctx)
+        if strategy is not None:
+            return strategy
+        logger.info("Stage 4: Determining solution strategy...")
+        return self._agent_stage(ctx, self.intent_router_agent, "Intent Router Agent", {
+            "parsed_problem": self._parsed(ctx)
+        })
+    
+    async def _astage_route(self, ctx: StageContext) -> Dict[str, Any]:
+        """Async variant of `_stage_route`"""
+        strategy = self._policy_strategy(ctx)
+        if strategy is not None:
+            return strategy
+        logger.info("Stage 4: Determining solution strategy...")
+        return await self._aagent_stage(ctx, self.intent_router_agent, "Intent Router Agent", {
+            "parsed_problem": self._parsed(ctx)
+        })
+    
+    def _solver_input(self, ctx: StageContext) -> Dict[str, Any]:
+        return {
+            "parsed_problem": self._parsed(ctx),
+            "strategy": self._strategy(ctx),
+            "rag_context": ctx["rag"]
+        }
+    
+    def _trace_solution(self, ctx: StageContext, solution: Dict[str, Any]) -> None:
+        self._trace({
+            "stage": "Solver Agent",
+            "status": "completed",
+            "confidence": solution.get("confidence", 0.0),
+            "speculative": ctx["speculation"] is not None
+        })
+    
+    def _stage_solve(self, ctx: StageContext) -> Dict[str, Any]:
+        """Stage 5: Solve Problem (already done if the speculative solve was kept)"""
+        if ctx["speculation"] is not None:
+            with timed("Solver Agent", speculative=True):
+                solution = ctx["speculation"].result()["solution"]
+            self._emit_solution_fields(solution, ctx["on_event"])
+        else:
+            logger.info("Stage 5: Solving problem...")
+            self._trace({"stage": "Solver Agent", "status": "started"})
+            with timed("Solver Agent"):
+                solution = self._run_agent(
+                    self.solver_agent, self._solver_input(ctx), "Solver Agent", ctx["on_event"]
+                )
+        self._trace_solution(ctx, solution)
+        return solution
+    
+    async def _astage_solve(self, ctx: StageContext) -> Dict[str, Any]:
+        """Async variant of `_stage_solve`"""
+        if ctx["speculation"] is not None:
+            with timed("Solver Agent", speculative=True):
+                solution = (await ctx["speculation"])["solution"]
+        else:
+            logger.info("Stage 5: Solving problem...")
+            self._trace({"stage": "Solver Agent", "status": "started"})
+            with timed("Solver Agent"):
+                solution = await self.solver_agent.aexecute(self._solver_input(ctx))
+        self._trace_solution(ctx, solution)
+        return solution
+    
+    def _review_input(self, ctx: StageContext) -> Dict[str, Any]:
+        return {"parsed_problem": self._parsed(ctx), "solution": ctx["solve"]}
+    
+    def _stage_verify(self, ctx: StageContext) -> Dict[str, Any]:
+        """Stage 6: Verify Solution"""
+        verification = self._policy_verification(ctx, "Verifier Agent")
+        if verification is not None:
+            return verification
+        logger.info("Stage 6: Verifying solution...")
+        return self._agent_stage(ctx, self.verifier_agent, "Verifier Agent", self._review_input(ctx))
+    
+    async def _astage_verify(self, ctx: StageContext) -> Dict[str, Any]:
+        """Async variant of `_stage_verify`"""
+        verification = self._policy_verification(ctx, "Verifier Agent")
+        if verification is not None:
+            return verification
+        logger.info("Stage 6: Verifying solution...")
+        return await self._aagent_stage(
+            ctx, self.verifier_agent, "Verifier Agent", self._review_input(ctx)
+        )
+    
+    def _stage_explain(self, ctx: StageContext) -> Optional[Dict[str, Any]]:
+        """Stage 7: Generate Explanation (None if deferred until requested)"""
+        if self._explanation_deferred():
+            return None
+        logger.info("Stage 7: Generating explanation...")
+        return self._agent_stage(
+            ctx, self.explainer_agent, "Explainer Agent",
+            {**self._review_input(ctx), "verification": ctx["verify"]},
+            summary=lambda output: {}
+        )
+    
+    async def _astage_explain(self, ctx: StageContext) -> Optional[Dict[str, Any]]:
+        """Async variant of `_stage_explain`"""
+        if self._explanation_deferred():
+            return None
+        logger.info("Stage 7: Generating explanation...")
+        return await self._aagent_stage(
+            ctx, self.explainer_agent, "Explainer Agent",
+            {**self._review_input(ctx), "verification": ctx["verify"]},
+            summary=lambda output: {}
+        )
+    
+    def _policy_review(self, ctx: StageContext) -> Optional[Dict[str, Any]]:
+        """
+        Review without the reviewer call, or None if it has to run
+        
+        Verification and explanation share one call, so it is only skipped
+        when the policy would skip the verifier and defer the explanation.
+        """
+        if self.policy is None:
+            return None
+        verify = self.policy.verify(ctx["solve"], "Reviewer Agent")
+        explain = self.policy.explain("Reviewer Agent")
+        if not verify.runs and not explain.runs:
+            self._apply_policy(PolicyDecision(
+                "Reviewer Agent", "skip", f"{verify.reason}; {explain.reason}"
+            ))
+            return {"verification": self.policy.sympy_verification(ctx["solve"]), "explanation": None}
+        self._apply_policy(verify if verify.runs else explain)
+        return None
+    
+    def _stage_review(self, ctx: StageContext) -> Dict[str, Any]:
+        """Stage 6+7 (fused): Verify and Explain in one call"""
+        review = self._policy_review(ctx)
+        if review is not None:
+            return review
+        logger.info("Stage 6: Reviewing solution (verify + explain)...")
+        return self._agent_stage(
+            ctx, self.reviewer_agent, "Reviewer Agent", self._review_input(ctx),
+            summary=lambda review: {"output": review["verification"]}
+        )
+    
+    async def _astage_review(self, ctx: StageContext) -> Dict[str, Any]:
+        """Async variant of `_stage_review`"""
+        review = self._policy_review(ctx)
+        if review is not None:
+            return review
+        logger.info("Stage 6: Reviewing solution (verify + explain)...")
+        return await self._aagent_stage(
+            ctx, self.reviewer_agent, "Reviewer Agent", self._review_input(ctx),
+            summary=lambda review: {"output": review["verification"]}
+        )
+    
+    def _graph_outputs(self, ctx: StageContext) -> Dict[str, Any]:
+        """Arguments of `_finalize_solve` taken from a finished stage graph"""
+        if self.pipeline_mode == "fused":
+            verification = ctx["review"]["verification"]
+            explanation = ctx["review"]["explanation"]
+        else:
+            verification = ctx["verify"]
+            explanation = ctx["explain"]
+        parsed_problem = self._parsed(ctx)
+        return {
+            "raw_text": ctx["raw_text"],
+            "input_type": ctx["input_type"],
+            "timestamp": ctx["timestamp"],
+            "parsed_problem": parsed_problem,
+            "strategy": self._strategy(ctx),
+            "rag_context": ctx["rag"],
+            "similar_problems": ctx["memory"],
+            "solution": ctx["solve"],
+            "verification": verification,
+            "explanation": explanation,
+            "needs_clarification_flag": parsed_problem.get("needs_clarification", False)
+        }
+    
+    def _cached_result(self,
+                       raw_text: str,
+                       on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> Optional[Dict[str, Any]]:
+        """Serve a previous solve of the same (normalized) problem, if cached"""
+        if self.result_cache is None:
+            return None
+        with timed("Result Cache"):
+            cached = self.result_cache.get(raw_text)
+        if cached is None:
+            return None
+        
+        logger.info(f"Result served from cache (interaction {cached['interaction_id']})")
+        self._trace({
+            "stage": "Result Cache",
+            "status": "hit",
+            "approved": cached["approved"]
+        })
+        self._emit_solution_fields(cached["solution"] or {}, on_event)
+        result = self._served_result(cached)
+        for field in CACHED_FIELDS:
+            self._emit_partial(field, result[field], on_event)
+        return result
+    
+    def _served_result(self,
+                       cached: Dict[str, Any],
+                       parsed_problem: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Solve result built from a cache entry"""
+        parsed_problem = parsed_problem or cached["parsed_problem"]
+        return {
+            "status": "success",
+            "interaction_id": cached["interaction_id"],
+            **{field: cached[field] for field in CACHED_FIELDS},
+            "parsed_problem": parsed_problem,
+            "similar_problems": [],
+            "execution_trace": self.execution_trace,
+            "requires_hitl": False,
+            "needs_clarification": parsed_problem.get("needs_clarification", False),
+            "explanation_deferred": cached["explanation"] is None,
+            "cached": True
+        }
+    
+    def _solve_result(self, ctx: StageContext) -> Dict[str, Any]:
+        """Result of a finished stage graph (served or newly solved)"""
+        if ctx["semantic"] is not None:
+            return self._served_result(ctx["semantic"], parsed_problem=self._parsed(ctx))
+        return self._finalize_solve(**self._graph_outputs(ctx))
+    
+    def _store_result(self, raw_text: str, result: Dict[str, Any]) -> None:
+        if self.result_cache is not None and self.result_cache.put(raw_text, result):
+            logger.debug("Stored solve result in result cache")
+        if self.semantic_cache is not None and not result.get("cached"):
+            self.semantic_cache.put(result.get("parsed_problem") or {}, result)
+    
+    def _record_timing(self, result: Dict[str, Any], timing: Dict[str, Any]) -> Dict[str, Any]:
+        """Attach the stage graph timing to the result and trace"""
+        self._trace({
+            "stage": "Stage Scheduler",
+            "status": "completed",
+            "critical_path": timing["critical_path"],
+            "critical_path_ms": timing["critical_path_ms"],
+            "total_ms": timing["total_ms"],
+            "parallelism": timing["parallelism"]
+        })
+        logger.info(
+            f"Pipeline finished in {timing['total_ms']:.0f}ms "
+            f"(critical path: {' -> '.join(timing['critical_path'])})"
+        )
+        result["stage_timing"] = timing
+        return result
+    
+    def solve_problem(self,
+                     raw_text: str,
                      input_type: str,
-                     user_edited: bool = False) -> Dict[str, Any]:
+                     user_edited: bool = False,
+                     on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+                     timeout: Optional[float] = None,
+                     cancel_token: Optional[CancellationToken] = None,
+                     api_key: Optional[str] = None) -> Dict[str, Any]:
         """
         Main problem-solving pipeline
         
@@ -120,217 +969,572 @@ class MathMentorOrchestrator:
             raw_text: Problem text (possibly user-edited)
             input_type: Origin of input
             user_edited: Whether user edited the text
-            
+            on_event: Optional callback; when set, agents stream and each
+                completed output field is passed as
+                {"type": "field", "stage", "agent", "field", "value"}.
+                It is always called on the calling thread.
+            timeout: Deadline in seconds for the whole solve (default
+                Config.REQUEST_TIMEOUT_SECONDS, 0 for none)
+            cancel_token: Token another thread can cancel the solve with
+            api_key: Caller's Gemini API key for this solve's LLM calls and
+                rate limits (default Config.GEMINI_API_KEY)
+        
         Returns:
-            Complete solution with all agent outputs
+            Complete solution with all agent outputs; agent trace entries
+            carry their "llm_calls", "usage" sums them per agent,
+            "stage_timing" holds per-stage spans and the critical path, and
+            "timings" every timed stage and sub-step (see `_attach_timings`).
+            A solve stopped by its deadline or token returns the stages that
+            finished, with status "timeout" or "cancelled" (see `_partial_result`)
         """
-        self.execution_trace = []  # Reset trace
-        timestamp = datetime.now().isoformat()
+        with request_context(api_key), request_scope(self._request_token(timeout, cancel_token)), \
+                self.usage_tracker.track(self.session_id) as llm_calls, \
+                self.latency_recorder.track() as spans:
+            with timed("Solve Pipeline"):
+                result = self._solve_problem(raw_text, input_type, user_edited, on_event)
+        self._attach_timings(result, spans)
+        return self._attach_usage(result, llm_calls)
+    
+    def _solve_problem(self,
+                       raw_text: str,
+                       input_type: str,
+                       user_edited: bool,
+                       on_event: Optional[Callable[[Dict[str, Any]], None]]) -> Dict[str, Any]:
+        """Pipeline body of `solve_problem`"""
+        # Stages run on worker threads; their stream events are queued and
+        # delivered here so UI callbacks stay on the caller's thread
+        events: "queue.SimpleQueue[Dict[str, Any]]" = queue.SimpleQueue()
+        
+        def deliver_events() -> None:
+            while True:
+                try:
+                    event = events.get_nowait()
+                except queue.Empty:
+                    return
+                on_event(event)
+        
+        ctx: StageContext = {
+            "raw_text": raw_text,
+            "input_type": input_type,
+            "timestamp": datetime.now().isoformat(),
+            "on_event": events.put if on_event else None
+        }
         
         try:
-            # Stage 1: Parse Problem
-            logger.info("Stage 1: Parsing problem...")
-            self.execution_trace.append({
-                "stage": "Parser Agent",
-                "status": "started"
-            })
-            
-            parsed_problem = self.parser_agent.execute({
-                "raw_text": raw_text,
-                "input_type": input_type
-            })
-            
-            self.execution_trace.append({
-                "stage": "Parser Agent",
-                "status": "completed",
-                "output": parsed_problem
-            })
-            
-            # Note if clarification is flagged (but continue solving)
-            needs_clarification_flag = parsed_problem.get("needs_clarification", False)
-            if needs_clarification_flag:
-                logger.warning("Problem flagged for clarification, but will attempt to solve anyway")
-                self.execution_trace.append({
-                    "stage": "Clarification Notice",
-                    "status": "warning",
-                    "message": "Problem may be ambiguous but proceeding with best interpretation"
-                })
-            
-            # Stage 2: Check for similar past problems
-            logger.info("Stage 2: Checking memory for similar problems...")
-            similar_problems = self.memory_system.find_similar_problems(
-                parsed_problem.get("problem_text", ""),
-                parsed_problem.get("topic", ""),
-                n=3
-            )
+            cached = self._cached_result(raw_text, on_event)
+            if cached is not None:
+                return cached
             
-            self.execution_trace.append({
-                "stage": "Memory Retrieval",
-                "status": "completed",
-                "similar_found": len(similar_problems)
-            })
-            
-            # Stage 3: RAG Retrieval
-            logger.info("Stage 3: Retrieving relevant knowledge...")
-            self.execution_trace.append({
-                "stage": "RAG Retrieval",
-                "status": "started"
-            })
-            
-            rag_context = self.rag_pipeline.retrieve(
-                parsed_problem.get("problem_text", "")
+            ctx["speculative_run"] = self._start_speculation(raw_text, input_type)
+            timing = self._pipeline_graph().run(
+                ctx,
+                _get_executor(),
+                poll=deliver_events if on_event else None,
+                on_done=(lambda name: self._emit_stage_partials(ctx, name, on_event)) if on_event else None
             )
+            result = self._solve_result(ctx)
+            self._store_result(raw_text, result)
+            return self._record_timing(result, timing)
+        
+        except RequestCancelledError as e:
+            return self._partial_result(ctx, e)
+        except Exception as e:
+            return self._handle_solve_error(e)
+    
+    def solve_problem_stream(self,
+                             raw_text: str,
+                             input_type: str,
+                             user_edited: bool = False,
+                             timeout: Optional[float] = None,
+                             cancel_token: Optional[CancellationToken] = None,
+                             api_key: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of `solve_problem`: yields events as stages finish
+        
+        The solve runs in a background thread, so partial results can be
+        rendered while later stages are still running. Closing the generator
+        early cancels the solve.
+        
+        Args:
+            raw_text: Problem text (possibly user-edited)
+            input_type: Origin of input
+            user_edited: Whether user edited the text
+            timeout: Deadline in seconds (see `solve_problem`)
+            cancel_token: Token another thread can cancel the solve with
+            api_key: Caller's Gemini API key (see `solve_problem`)
+        
+        Yields:
+            {"type": "partial", "field", "value"} once a result field is
+            final: "parsed_problem", "rag_sources", "strategy", "solution",
+            "verification" and "explanation" (None if deferred), in pipeline
+            order; {"type": "field", "stage", "agent", "field", "value"} for
+            agent output fields as they stream in; and last
+            {"type": "result", "result"} with the complete `solve_problem`
+            result
+        """
+        events: "queue.SimpleQueue[Dict[str, Any]]" = queue.SimpleQueue()
+        token = CancellationToken(parent=cancel_token or current_token())
+        
+        def run() -> None:
+            try:
+                result = self.solve_problem(
+                    raw_text, input_type, user_edited, on_event=events.put,
+                    timeout=timeout, cancel_token=token, api_key=api_key
+                )
+            except Exception as e:
+                result = self._handle_solve_error(e)
+            events.put({"type": "result", "result": result})
+        
+        threading.Thread(
+            target=contextvars.copy_context().run, args=(run,),
+            name="solve-stream", daemon=True
+        ).start()
+        try:
+            while True:
+                event = events.get()
+                yield event
+                if event["type"] == "result":
+                    return
+        finally:
+            # Consumer went away before the result: stop the solve
+            token.cancel("Stream closed by the consumer")
+    
+    async def asolve_problem(self,
+                             raw_text: str,
+                             input_type: str,
+                             user_edited: bool = False,
+                             timeout: Optional[float] = None,
+                             cancel_token: Optional[CancellationToken] = None,
+                             api_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Async problem-solving pipeline
+        
+        Same stages and result shape as `solve_problem`, but LLM calls go
+        through the agents' `aexecute` and blocking memory/RAG work runs in
+        worker threads, so one event loop can serve many solves at once.
+        
+        Args:
+            raw_text: Problem text (possibly user-edited)
+            input_type: Origin of input
+            user_edited: Whether user edited the text
+            timeout: Deadline in seconds (see `solve_problem`)
+            cancel_token: Token another thread can cancel the solve with
+            api_key: Caller's Gemini API key (see `solve_problem`)
+        
+        Returns:
+            Complete solution with all agent outputs
+        """
+        with request_context(api_key), request_scope(self._request_token(timeout, cancel_token)), \
+                self.usage_tracker.track(self.session_id) as llm_calls, \
+                self.latency_recorder.track() as spans:
+            with timed("Solve Pipeline"):
+                result = await self._asolve_problem(raw_text, input_type, user_edited)
+        self._attach_timings(result, spans)
+        return self._attach_usage(result, llm_calls)
+    
+    async def _asolve_problem(self,
+                              raw_text: str,
+                              input_type: str,
+                              user_edited: bool) -> Dict[str, Any]:
+        """Pipeline body of `asolve_problem`"""
+        ctx: StageContext = {
+            "raw_text": raw_text,
+            "input_type": input_type,
+            "timestamp": datetime.now().isoformat(),
+            "on_event": None,
+            "speculative_run": None
+        }
+        
+        try:
+            cached = await asyncio.to_thread(self._cached_result, raw_text)
+            if cached is not None:
+                return cached
             
-            self.execution_trace.append({
-                "stage": "RAG Retrieval",
-                "status": "completed",
-                "documents_retrieved": len(rag_context)
-            })
-            
-            # Stage 4: Intent Routing
-            logger.info("Stage 4: Determining solution strategy...")
-            self.execution_trace.append({
-                "stage": "Intent Router Agent",
-                "status": "started"
-            })
-            
-            strategy = self.intent_router_agent.execute({
-                "parsed_problem": parsed_problem
-            })
-            
-            self.execution_trace.append({
-                "stage": "Intent Router Agent",
-                "status": "completed",
-                "output": strategy
-            })
-            
-            # Stage 5: Solve Problem
-            logger.info("Stage 5: Solving problem...")
-            self.execution_trace.append({
-                "stage": "Solver Agent",
-                "status": "started"
-            })
-            
-            solution = self.solver_agent.execute({
-                "parsed_problem": parsed_problem,
-                "strategy": strategy,
-                "rag_context": rag_context
-            })
-            
-            self.execution_trace.append({
-                "stage": "Solver Agent",
-                "status": "completed",
-                "confidence": solution.get("confidence", 0.0)
-            })
-            
-            # Stage 6: Verify Solution
-            logger.info("Stage 6: Verifying solution...")
-            self.execution_trace.append({
-                "stage": "Verifier Agent",
-                "status": "started"
-            })
-            
-            verification = self.verifier_agent.execute({
-                "parsed_problem": parsed_problem,
-                "solution": solution
-            })
-            
-            self.execution_trace.append({
-                "stage": "Verifier Agent",
-                "status": "completed",
-                "output": verification
-            })
-            
-            # Stage 7: Generate Explanation
-            logger.info("Stage 7: Generating explanation...")
-            self.execution_trace.append({
-                "stage": "Explainer Agent",
-                "status": "started"
-            })
-            
-            explanation = self.explainer_agent.execute({
-                "parsed_problem": parsed_problem,
-                "solution": solution,
-                "verification": verification
-            })
-            
-            self.execution_trace.append({
-                "stage": "Explainer Agent",
-                "status": "completed"
-            })
-            
-            # Store interaction in memory
-            interaction = {
-                "timestamp": timestamp,
-                "raw_input": raw_text,
-                "input_type": input_type,
-                "parsed_problem": parsed_problem,
-                "retrieved_context": rag_context,
-                "solution": solution,
-                "verification": verification,
-                "explanation": explanation,
-                "similar_problems": [p.get('interaction_id') for p in similar_problems]
-            }
-            
-            interaction_id = self.memory_system.store_interaction(interaction)
-            
-            # Prepare result
-            result = {
-                "status": "success",
-                "interaction_id": interaction_id,
-                "parsed_problem": parsed_problem,
-                "strategy": strategy,
-                "solution": solution,
-                "verification": verification,
-                "explanation": explanation,
-                "rag_sources": [
-                    {"source": doc["source"], "content": doc["content"][:200]}
-                    for doc in rag_context
-                ],
-                "similar_problems": similar_problems,
-                "execution_trace": self.execution_trace,
-                "requires_hitl": verification.get("requires_hitl", False),
-                "needs_clarification": needs_clarification_flag  # Add clarification flag
-            }
-            
-            logger.info(f"Problem solved successfully. Interaction ID: {interaction_id}")
-            return result
+            if self.speculative and input_type == "text":
+                logger.info("Starting speculative solve in parallel with parsing...")
+                ctx["speculative_run"] = asyncio.ensure_future(self._aspeculative_solve(raw_text))
             
+            timing = await self._pipeline_graph().arun(ctx)
+            result = await asyncio.to_thread(self._solve_result, ctx)
+            await asyncio.to_thread(self._store_result, raw_text, result)
+            return self._record_timing(result, timing)
+        
+        except RequestCancelledError as e:
+            return self._partial_result(ctx, e)
         except Exception as e:
-            error_msg = str(e)
-            logger.error(f"Error in solve_problem: {e}")
-            
-            # Check if it's a quota error
-            if "quota" in error_msg.lower() or "429" in error_msg:
-                self.execution_trace.append({
-                    "stage": "Error",
-                    "status": "quota_exceeded",
-                    "error": "API quota exceeded"
-                })
-                return {
-                    "status": "quota_exceeded",
-                    "message": "⚠️ **API Quota Exceeded**\n\n"
-                              "You've reached the free tier limit of **20 requests per day**.\n\n"
-                              "**Options:**\n"
-                              "1. ⏰ Wait for the quota to reset (quotas reset automatically)\n"
-                              "2. 🔑 Get a new API key at https://aistudio.google.com/apikey\n"
-                              "3. 💳 Upgrade to a paid plan at https://ai.google.dev/pricing\n\n"
-                              "**Monitor your usage:** https://ai.dev/usage?tab=rate-limit",
-                    "execution_trace": self.execution_trace
-                }
+            return self._handle_solve_error(e)
+    
+    def solve_many(self,
+                   problems: List[str],
+                   concurrency: Optional[int] = None,
+                   input_type: str = "text",
+                   timeout: Optional[float] = None,
+                   cancel_token: Optional[CancellationToken] = None,
+                   api_key: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Solve a batch of problems (e.g. a worksheet) concurrently
+        
+        Problems that are identical after normalizing case and whitespace are
+        solved once. Up to `concurrency` solves run at a time; their LLM calls
+        still go through the shared rate limiter, and concurrent RAG
+        retrievals share batched query embeddings. Once a solve hits the API
+        quota, problems that have not started yet are not attempted. Closing
+        the generator early cancels the solves still running.
+        
+        Args:
+            problems: Problem texts
+            concurrency: Solves running at once (default Config.BATCH_SOLVE_CONCURRENCY)
+            input_type: Origin of the inputs
+            timeout: Deadline in seconds for each solve (see `solve_problem`)
+            cancel_token: Token that cancels the whole batch
+            api_key: Caller's Gemini API key (see `solve_problem`)
             
-            self.execution_trace.append({
+        Yields:
+            {"index", "problem", "result", "duplicate_of"} for every input
+            problem, in completion order. "result" is the `solve_problem`
+            result, with status "error", "quota_exceeded", "timeout" or
+            "cancelled" if that item did not finish; "duplicate_of" is the index of the problem whose solve
+            was reused, or None.
+        """
+        concurrency = max(1, concurrency or Config.BATCH_SOLVE_CONCURRENCY)
+        
+        # Solve each distinct problem once
+        groups: Dict[str, List[int]] = {}
+        for index, problem in enumerate(problems):
+            groups.setdefault(_normalize_problem_text(problem), []).append(index)
+        if not groups:
+            return
+        logger.info(
+            f"Batch solving {len(groups)} distinct problems out of {len(problems)} "
+            f"(concurrency {concurrency})"
+        )
+        
+        # Build it once here rather than in every concurrent retrieval
+        self.rag_pipeline.ensure_vector_store()
+        
+        quota_exceeded = threading.Event()
+        batch_token = CancellationToken(parent=cancel_token or current_token())
+        
+        def solve(index: int) -> Dict[str, Any]:
+            # Each solve_problem call traces into its own request context
+            if quota_exceeded.is_set():
+                return self._handle_solve_error(
+                    QuotaExceededError("API quota exceeded earlier in this batch; not attempted")
+                )
+            try:
+                result = self.solve_problem(
+                    problems[index], input_type, timeout=timeout, cancel_token=batch_token,
+                    api_key=api_key
+                )
+            except Exception as e:
+                result = self._handle_solve_error(e)
+            if result.get("status") == "quota_exceeded":
+                quota_exceeded.set()
+            return result
+        
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-solve")
+        with self.rag_pipeline.batched_embeddings():
+            futures = {
+                executor.submit(contextvars.copy_context().run, solve, indices[0]): indices
+                for indices in groups.values()
+            }
+            try:
+                for future in as_completed(futures):
+                    indices = futures[future]
+                    result = future.result()
+                    for index in indices:
+                        yield {
+                            "index": index,
+                            "problem": problems[index],
+                            "result": result if index == indices[0] else dict(result),
+                            "duplicate_of": None if index == indices[0] else indices[0]
+                        }
+            finally:
+                # The caller may stop early: drop problems that have not
+                # started and stop the running ones
+                executor.shutdown(wait=False, cancel_futures=True)
+                batch_token.cancel("Batch closed by the consumer")
+    
+    def _finalize_solve(self,
+                        raw_text: str,
+                        input_type: str,
+                        timestamp: str,
+                        parsed_problem: Dict[str, Any],
+                        strategy: Dict[str, Any],
+                        rag_context: List[Dict],
+                        similar_problems: List[Dict],
+                        solution: Dict[str, Any],
+                        verification: Dict[str, Any],
+                        explanation: Optional[Dict[str, Any]],
+                        needs_clarification_flag: bool) -> Dict[str, Any]:
+        """Store the interaction in memory and assemble the solve result"""
+        # Store interaction in memory
+        interaction = {
+            "timestamp": timestamp,
+            "raw_input": raw_text,
+            "input_type": input_type,
+            "parsed_problem": parsed_problem,
+            "retrieved_context": rag_context,
+            "solution": solution,
+            "verification": verification,
+            "explanation": explanation,
+            "similar_problems": [p.get('interaction_id') for p in similar_problems]
+        }
+        
+        interaction_id = self.memory_system.store_interaction(interaction)
+        
+        # Prepare result
+        result = {
+            "status": "success",
+            "interaction_id": interaction_id,
+            "parsed_problem": parsed_problem,
+            "strategy": strategy,
+            "solution": solution,
+            "verification": verification,
+            "explanation": explanation,
+            "rag_sources": self._rag_sources(rag_context),
+            "similar_problems": similar_problems,
+            "execution_trace": self.execution_trace,
+            "requires_hitl": verification.get("requires_hitl", False),
+            "needs_clarification": needs_clarification_flag,  # Add clarification flag
+            "explanation_deferred": explanation is None
+        }
+        
+        logger.info(f"Problem solved successfully. Interaction ID: {interaction_id}")
+        return result
+    
+    @staticmethod
+    def _rag_sources(rag_context: List[Dict]) -> List[Dict[str, str]]:
+        return [
+            {"source": doc["source"], "content": doc["content"][:200]}
+            for doc in rag_context
+        ]
+    
+    def _attach_usage(self, result: Dict[str, Any], llm_calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Attach each agent's LLM calls to its trace entry and sum them"""
+        for entry in result.get("execution_trace", []):
+            if entry.get("status") == "completed" and entry["stage"].endswith("Agent"):
+                # Trace stages are display names of the agents ("Parser Agent")
+                agent_name = entry["stage"].replace(" ", "")
+                entry["llm_calls"] = [c for c in llm_calls if c["agent"] == agent_name]
+        
+        result["usage"] = summarize_calls(llm_calls)
+        return result
+    
+    @staticmethod
+    def _substeps(spans: List[Dict[str, Any]], span: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Spans timed directly inside `span`"""
+        return [
+            {k: v for k, v in s.items() if k != "parent"} for s in spans
+            if s["parent"] == span["name"]
+            and span["start_ms"] <= s["start_ms"] and s["end_ms"] <= span["end_ms"]
+        ]
+    
+    def _attach_timings(self, result: Dict[str, Any], spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Attach each stage's span to its trace entry and keep all spans
+        
+        Completed trace entries get "start_ms", "end_ms" and "duration_ms"
+        (from the start of the request) and "substeps": the LLM calls,
+        embeddings, FAISS searches, memory scans and SymPy runs timed
+        inside that stage.
+        """
+        unused = sorted(spans, key=lambda s: s["start_ms"])
+        for entry in result.get("execution_trace", []):
+            if entry.get("status") == "started":
+                continue
+            span = next((s for s in unused if s["name"] == entry.get("stage")), None)
+            if span is None:
+                continue
+            unused.remove(span)
+            entry.update({
+                "start_ms": span["start_ms"],
+                "end_ms": span["end_ms"],
+                "duration_ms": span["duration_ms"],
+                "substeps": self._substeps(spans, span)
+            })
+        result["timings"] = sorted(spans, key=lambda s: s["start_ms"])
+        return result
+    
+    def get_latency_summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Process-wide latency histograms per stage and sub-step
+        
+        Returns:
+            {name: {"count", "mean_ms", "min_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"}}
+        """
+        return self.latency_recorder.summary()
+    
+    def dump_latency_histograms(self, path: Optional[str] = None) -> str:
+        """Write the latency histograms as JSON (default Config.LATENCY_HISTOGRAMS_PATH)"""
+        return str(self.latency_recorder.dump(path))
+    
+    def get_usage_summary(self) -> Dict[str, Any]:
+        """
+        LLM usage for this session and for the whole process
+        
+        Returns:
+            {"session_id", "session": totals, "process": per agent/model/session totals}
+        """
+        return {
+            "session_id": self.session_id,
+            "session": self.usage_tracker.session_summary(self.session_id),
+            "process": self.usage_tracker.summary()
+        }
+    
+    def _handle_solve_error(self, e: Exception) -> Dict[str, Any]:
+        """Convert a pipeline exception into an error result"""
+        error_msg = str(e)
+        logger.error(f"Error in solve_problem: {e}")
+        # Also called outside of a request; keep one trace for both uses
+        request = current_request()
+        
+        # Check if it's a quota error
+        if "quota" in error_msg.lower() or "429" in error_msg:
+            request.trace({
                 "stage": "Error",
-                "status": "failed",
-                "error": str(e)
+                "status": "quota_exceeded",
+                "error": "API quota exceeded"
             })
             return {
-                "status": "error",
-                "message": str(e),
-                "execution_trace": self.execution_trace
+                "status": "quota_exceeded",
+                "message": "⚠️ **API Quota Exceeded**\n\n"
+                          "You've reached the free tier limit of **20 requests per day**.\n\n"
+                          "**Options:**\n"
+                          "1. ⏰ Wait for the quota to reset (quotas reset automatically)\n"
+                          "2. 🔑 Get a new API key at https://aistudio.google.com/apikey\n"
+                          "3. 💳 Upgrade to a paid plan at https://ai.google.dev/pricing\n\n"
+                          "**Monitor your usage:** https://ai.dev/usage?tab=rate-limit",
+                "execution_trace": request.execution_trace
             }
+        
+        request.trace({
+            "stage": "Error",
+            "status": "failed",
+            "error": str(e)
+        })
+        return {
+            "status": "error",
+            "message": str(e),
+            "execution_trace": request.execution_trace
+        }
+    
+    @staticmethod
+    def _request_token(timeout: Optional[float],
+                       cancel_token: Optional[CancellationToken]) -> CancellationToken:
+        """Token of one solve: bounded by `timeout` and cancelled with `cancel_token`"""
+        if timeout is None:
+            timeout = Config.REQUEST_TIMEOUT_SECONDS
+        return CancellationToken(timeout, parent=cancel_token or current_token())
+    
+    def _partial_result(self, ctx: StageContext, error: RequestCancelledError) -> Dict[str, Any]:
+        """
+        Best result available when a solve is cancelled or runs out of time
+        
+        Fields of the stages that finished are filled in, the others are
+        None. Partial results are neither stored in memory nor cached.
+        """
+        logger.warning(f"Solve stopped early ({error.status}): {error}")
+        self._trace({
+            "stage": "Deadline",
+            "status": error.status,
+            "error": str(error)
+        })
+        if ctx.get("semantic") is not None:
+            # Everything needed was served before the deadline
+            return self._served_result(ctx["semantic"], parsed_problem=self._parsed(ctx))
+        
+        parse = ctx.get("parse")
+        parsed_problem = parse["parsed_problem"] if parse else None
+        strategy = ctx.get("route")
+        if ctx.get("speculation") is not None:
+            strategy = dict(SPECULATIVE_STRATEGY)
+        elif self.pipeline_mode == "fused" and parse:
+            strategy = parse["strategy"]
+        if self.pipeline_mode == "fused":
+            review = ctx.get("review") or {}
+            verification, explanation = review.get("verification"), review.get("explanation")
+        else:
+            verification, explanation = ctx.get("verify"), ctx.get("explain")
+        
+        if isinstance(error, DeadlineExceededError):
+            message = "⏱️ The request ran out of time. Showing the stages that finished."
+        else:
+            message = f"🛑 The request was cancelled ({error}). Showing the stages that finished."
+        return {
+            "status": error.status,
+            "message": message,
+            "completed_stages": [name for name in self._pipeline_graph().order if name in ctx],
+            "parsed_problem": parsed_problem,
+            "strategy": strategy,
+            "solution": ctx.get("solve"),
+            "verification": verification,
+            "explanation": explanation,
+            "rag_sources": self._rag_sources(ctx.get("rag") or []),
+            "similar_problems": ctx.get("memory") or [],
+            "execution_trace": self.execution_trace,
+            "requires_hitl": bool(verification and verification.get("requires_hitl", False)),
+            "needs_clarification": bool(parsed_problem and parsed_problem.get("needs_clarification", False)),
+            "explanation_deferred": False
+        }
+    
+    def explain_solution(self,
+                         result: Dict[str, Any],
+                         api_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Generate the explanation of a solve result whose explanation was deferred
+    
+        The result is updated in place (explanation, trace and usage); for a
+        fresh solve the cached copies of the result get the explanation too.
+    
+        Args:
+            result: `solve_problem` result
+            api_key: Caller's Gemini API key (see `solve_problem`)
+    
+        Returns:
+            The explanation, or None if it could not be generated
+        """
+        if result.get("explanation") is not None:
+            return result["explanation"]
+        if result.get("status") != "success":
+            return None
+    
+        logger.info("Generating deferred explanation...")
+        try:
+            with request_context(api_key), \
+                    self.usage_tracker.track(self.session_id) as llm_calls, \
+                    self.latency_recorder.track() as spans:
+                with timed("Explainer Agent", deferred=True) as span:
+                    explanation = self.explainer_agent.execute({
+                        "parsed_problem": result.get("parsed_problem") or {},
+                        "solution": result.get("solution") or {},
+                        "verification": result.get("verification") or {}
+                    })
+        except Exception as e:
+            logger.error(f"Error generating explanation: {e}")
+            return None
+    
+        trace = result.setdefault("execution_trace", [])
+        trace.append({
+            "stage": "Explainer Agent",
+            "status": "completed",
+            "deferred": True,
+            "duration_ms": span["duration_ms"],
+            "substeps": self._substeps(spans, span),
+            "llm_calls": llm_calls
+        })
+        result["usage"] = summarize_calls([c for entry in trace for c in entry.get("llm_calls", [])])
+        result["explanation"] = explanation
+        result["explanation_deferred"] = False
+    
+        if not result.get("cached"):
+            # Cached copies use the original variable names, as this one does
+            for cache in (self.result_cache, self.semantic_cache):
+                if cache is not None:
+                    cache.update_explanation(result.get("interaction_id", ""), explanation)
+        return explanation
     
-    def submit_feedback(self, 
+    def submit_feedback(self,
                        interaction_id: str, 
                        feedback: Dict[str, Any]):
         """
@@ -342,6 +1546,10 @@ class MathMentorOrchestrator:
         """
         try:
             self.memory_system.store_feedback(interaction_id, feedback)
+            if "approved" in feedback:
+                for cache in (self.result_cache, self.semantic_cache):
+                    if cache is not None:
+                        cache.record_feedback(interaction_id, feedback["approved"])
             logger.info(f"Feedback submitted for interaction: {interaction_id}")
         except Exception as e:
             logger.error(f"Error submitting feedback: {e}")
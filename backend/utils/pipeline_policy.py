@@ -0,0 +1,166 @@
+"""
+Pipeline Policy - Decides which LLM stages a solve actually needs
+Routing is skipped for topics with one obvious strategy, verification when the
+solver's own SymPy result confirms its answer, and the explanation is deferred
+until it is asked for.
+"""
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+from utils.config import Config
+from utils.logger import setup_logger
+from utils.sympy_check import sympy_confirms_answer
+
+logger = setup_logger(__name__)
+
+# Strategy the intent router picks for each parser topic in the common case
+TOPIC_STRATEGIES = {
+    "algebra": {
+        "strategy": "symbolic_manipulation",
+        "tools": ["sympy"],
+        "approach": "Set up the equations and solve them symbolically with SymPy"
+    },
+    "calculus": {
+        "strategy": "step_by_step_derivation",
+        "tools": ["sympy"],
+        "approach": "Apply the standard derivative, limit or integral rules step by step, checking with SymPy"
+    },
+    "probability": {
+        "strategy": "probability_analysis",
+        "tools": ["sympy", "manual"],
+        "approach": "Count the sample space and favourable outcomes, then compute the probability"
+    },
+    "linear_algebra": {
+        "strategy": "matrix_operations",
+        "tools": ["sympy", "numpy"],
+        "approach": "Build the matrices and compute the required quantities with SymPy"
+    },
+}
+
+
+@dataclass
+class PolicyDecision:
+    """
+    Decision about one pipeline stage
+
+    Attributes:
+        target: Stage the decision is about (e.g. "Verifier Agent")
+        action: "run", "skip" or "defer"
+        reason: Why, for the execution trace
+    """
+    target: str
+    action: str
+    reason: str
+
+    @property
+    def runs(self) -> bool:
+        return self.action == "run"
+
+    def trace_entry(self) -> Dict[str, Any]:
+        """Execution trace entry for this decision"""
+        entry = asdict(self)
+        return {"stage": "Pipeline Policy", "status": entry.pop("action"), **entry}
+
+
+class PipelinePolicy:
+    """Confidence-gated stage decisions for the adaptive pipeline"""
+
+    def __init__(self,
+                 skip_route_topics: Optional[List[str]] = None,
+                 skip_route_min_confidence: Optional[float] = None,
+                 skip_verify_min_confidence: Optional[float] = None,
+                 sympy_verified_confidence: Optional[float] = None,
+                 defer_explanation: Optional[bool] = None):
+        """
+        Args:
+            skip_route_topics: Topics routed straight to TOPIC_STRATEGIES
+                (default Config.POLICY_SKIP_ROUTE_TOPICS)
+            skip_route_min_confidence: Parser confidence needed to skip routing
+                (default Config.POLICY_SKIP_ROUTE_MIN_CONFIDENCE)
+            skip_verify_min_confidence: Solver confidence needed to skip the
+                verifier (default Config.POLICY_SKIP_VERIFY_MIN_CONFIDENCE)
+            sympy_verified_confidence: Confidence reported for SymPy-confirmed
+                solutions (default Config.POLICY_SYMPY_VERIFIED_CONFIDENCE)
+            defer_explanation: Generate explanations only on request
+                (default Config.POLICY_DEFER_EXPLANATION)
+        """
+        self.skip_route_topics = [
+            topic for topic in (skip_route_topics or Config.POLICY_SKIP_ROUTE_TOPICS)
+            if topic in TOPIC_STRATEGIES
+        ]
+        self.skip_route_min_confidence = (
+            Config.POLICY_SKIP_ROUTE_MIN_CONFIDENCE
+            if skip_route_min_confidence is None else skip_route_min_confidence
+        )
+        self.skip_verify_min_confidence = (
+            Config.POLICY_SKIP_VERIFY_MIN_CONFIDENCE
+            if skip_verify_min_confidence is None else skip_verify_min_confidence
+        )
+        self.sympy_verified_confidence = (
+            Config.POLICY_SYMPY_VERIFIED_CONFIDENCE
+            if sympy_verified_confidence is None else sympy_verified_confidence
+        )
+        self.defer_explanation = (
+            Config.POLICY_DEFER_EXPLANATION if defer_explanation is None else defer_explanation
+        )
+
+    def route(self, parsed_problem: Dict[str, Any]) -> PolicyDecision:
+        """Skip the intent router when the topic has one obvious strategy"""
+        topic = parsed_problem.get("topic", "unknown")
+        confidence = parsed_problem.get("confidence", 0.0)
+        target = "Intent Router Agent"
+        if topic not in self.skip_route_topics:
+            return PolicyDecision(target, "run", f"topic '{topic}' needs routing")
+        if parsed_problem.get("needs_clarification", False):
+            return PolicyDecision(target, "run", "problem needs clarification")
+        if confidence < self.skip_route_min_confidence:
+            return PolicyDecision(
+                target, "run",
+                f"parser confidence {confidence:.2f} < {self.skip_route_min_confidence:.2f}"
+            )
+        return PolicyDecision(
+            target, "skip",
+            f"topic '{topic}' maps to {TOPIC_STRATEGIES[topic]['strategy']} "
+            f"(parser confidence {confidence:.2f})"
+        )
+
+    def topic_strategy(self, parsed_problem: Dict[str, Any]) -> Dict[str, Any]:
+        """Strategy used in place of the intent router's"""
+        return {
+            **TOPIC_STRATEGIES[parsed_problem.get("topic")],
+            "confidence": parsed_problem.get("confidence", 0.0)
+        }
+
+    def verify(self, solution: Dict[str, Any], target: str = "Verifier Agent") -> PolicyDecision:
+        """Skip LLM verification when the solver's SymPy result confirms its answer"""
+        confidence = solution.get("confidence", 0.0)
+        if not solution.get("sympy_result"):
+            return PolicyDecision(target, "run", "no SymPy result to check the answer against")
+        if confidence < self.skip_verify_min_confidence:
+            return PolicyDecision(
+                target, "run",
+                f"solver confidence {confidence:.2f} < {self.skip_verify_min_confidence:.2f}"
+            )
+        if not sympy_confirms_answer(solution.get("final_answer", ""), solution["sympy_result"]):
+            return PolicyDecision(target, "run", "SymPy result does not confirm the final answer")
+        return PolicyDecision(target, "skip", "SymPy result confirms the final answer")
+
+    def sympy_verification(self, solution: Dict[str, Any]) -> Dict[str, Any]:
+        """Verification result standing in for a skipped verifier"""
+        return {
+            "is_correct": True,
+            "confidence": self.sympy_verified_confidence,
+            "issues_found": [],
+            "requires_hitl": False,
+            "verification_details": (
+                f"Final answer '{solution.get('final_answer', '')}' matches the "
+                f"SymPy result {solution.get('sympy_result')}; LLM verification skipped"
+            ),
+            "skipped": True
+        }
+
+    def explain(self, target: str = "Explainer Agent") -> PolicyDecision:
+        """Defer the explanation until the user opens it"""
+        if self.defer_explanation:
+            return PolicyDecision(target, "defer", "explanation generated when requested")
+        return PolicyDecision(target, "run", "explanation deferral disabled")
@@ -0,0 +1,260 @@
+"""
+Rate Limiter for Gemini calls
+Process-wide token buckets per (API key, model) that track requests per
+minute, requests per day and tokens per minute, so callers wait or fail
+fast before the API answers with a 429
+"""
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple
+
+from utils.logger import setup_logger
+from utils.config import Config
+from utils.deadline import cancellable_asleep, cancellable_sleep
+
+logger = setup_logger(__name__)
+
+
+class QuotaExceededError(Exception):
+    """Raised when a call cannot be admitted within the allowed wait time"""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class QuotaLimits:
+    """Quota limits for one (API key, model) pair; 0 disables a limit"""
+    requests_per_minute: int = 0
+    requests_per_day: int = 0
+    tokens_per_minute: int = 0
+
+
+class TokenBucket:
+    """Classic token bucket; not thread-safe on its own"""
+
+    def __init__(self, capacity: float, period_seconds: float):
+        self.capacity = float(capacity)
+        self.refill_rate = self.capacity / period_seconds
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+            self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` tokens are available"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_rate
+
+    def consume(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def drain(self) -> None:
+        """Empty the bucket, e.g. after the server reported exhaustion"""
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+
+
+class ModelQuota:
+    """Buckets and server-imposed backoff for one (API key, model) pair"""
+
+    def __init__(self, limits: QuotaLimits):
+        self.limits = limits
+        self.rpm = TokenBucket(limits.requests_per_minute, 60) if limits.requests_per_minute else None
+        self.rpd = TokenBucket(limits.requests_per_day, 86400) if limits.requests_per_day else None
+        self.tpm = TokenBucket(limits.tokens_per_minute, 60) if limits.tokens_per_minute else None
+        self.blocked_until = 0.0
+        self.admitted = 0
+        self.rejected = 0
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        waits = [max(0.0, self.blocked_until - now)]
+        if self.rpm:
+            waits.append(self.rpm.wait_time(1, now))
+        if self.rpd:
+            waits.append(self.rpd.wait_time(1, now))
+        if self.tpm and tokens:
+            waits.append(self.tpm.wait_time(tokens, now))
+        return max(waits)
+
+    def consume(self, tokens: int) -> None:
+        for bucket in (self.rpm, self.rpd):
+            if bucket:
+                bucket.consume(1)
+        if self.tpm and tokens:
+            self.tpm.consume(tokens)
+        self.admitted += 1
+
+
+class RateLimiter:
+    """Shared quota scheduler that all agents and sessions draw from"""
+
+    def __init__(self,
+                 default_limits: Optional[QuotaLimits] = None,
+                 max_wait_seconds: float = 30.0):
+        self.default_limits = default_limits or QuotaLimits()
+        self.max_wait_seconds = max_wait_seconds
+        self._limits: Dict[str, QuotaLimits] = {}
+        self._quotas: Dict[Tuple[str, str], ModelQuota] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key_id(api_key: str) -> str:
+        """Stable identifier for an API key that never stores the key itself"""
+        return hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+
+    def set_limits(self, model: str, limits: QuotaLimits) -> None:
+        """Override the default limits for a model"""
+        with self._lock:
+            self._limits[model] = limits
+            for (key_id, quota_model) in list(self._quotas):
+                if quota_model == model:
+                    del self._quotas[(key_id, quota_model)]
+
+    def _quota(self, api_key: str, model: str) -> ModelQuota:
+        key = (self._key_id(api_key), model)
+        quota = self._quotas.get(key)
+        if quota is None:
+            quota = ModelQuota(self._limits.get(model, self.default_limits))
+            self._quotas[key] = quota
+        return quota
+
+    def _try_acquire(self, api_key: str, model: str, tokens: int) -> float:
+        """Admit the call if possible; otherwise return seconds to wait"""
+        with self._lock:
+            quota = self._quota(api_key, model)
+            wait = quota.wait_time(tokens, time.monotonic())
+            if wait <= 0:
+                quota.consume(tokens)
+            return wait
+
+    def _reject(self, api_key: str, model: str, wait: float) -> QuotaExceededError:
+        with self._lock:
+            self._quota(api_key, model).rejected += 1
+        logger.warning(f"Rate limit for {model}: call rejected, next slot in {wait:.1f}s")
+        return QuotaExceededError(
+            f"API quota exceeded for {model}: next request slot in {wait:.0f} seconds",
+            retry_after=wait
+        )
+
+    def acquire(self,
+                api_key: str,
+                model: str,
+                tokens: int = 0,
+                max_wait: Optional[float] = None) -> None:
+        """
+        Block until a request slot is available
+
+        Args:
+            api_key: API key the call is billed to
+            model: Model name
+            tokens: Estimated tokens the call will consume
+            max_wait: Longest total wait before failing (default from limiter)
+
+        Raises:
+            QuotaExceededError: If no slot frees up within max_wait
+            DeadlineExceededError: If the slot would only free up after the
+                current request's deadline
+        """
+        max_wait = self.max_wait_seconds if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self._try_acquire(api_key, model, tokens)
+            if wait <= 0:
+                return
+            if time.monotonic() + wait > deadline:
+                raise self._reject(api_key, model, wait)
+            cancellable_sleep(wait)
+
+    async def aacquire(self,
+                       api_key: str,
+                       model: str,
+                       tokens: int = 0,
+                       max_wait: Optional[float] = None) -> None:
+        """Async variant of `acquire` that waits on the event loop"""
+        max_wait = self.max_wait_seconds if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self._try_acquire(api_key, model, tokens)
+            if wait <= 0:
+                return
+            if time.monotonic() + wait > deadline:
+                raise self._reject(api_key, model, wait)
+            await cancellable_asleep(wait)
+
+    def record_tokens(self, api_key: str, model: str, tokens: int) -> None:
+        """Charge tokens reported after a call (e.g. output tokens)"""
+        with self._lock:
+            quota = self._quota(api_key, model)
+            if quota.tpm and tokens > 0:
+                quota.tpm.consume(tokens)
+
+    def penalize(self, api_key: str, model: str, retry_after: float, daily: bool = False) -> None:
+        """
+        Block a key/model after the server returned a 429
+
+        Args:
+            api_key: API key that hit the limit
+            model: Model name
+            retry_after: Seconds the server asked us to wait
+            daily: Whether the daily quota was exhausted
+        """
+        with self._lock:
+            quota = self._quota(api_key, model)
+            quota.blocked_until = max(quota.blocked_until, time.monotonic() + retry_after)
+            if daily and quota.rpd:
+                quota.rpd.drain()
+
+    def stats(self) -> Dict[str, Any]:
+        """Admission counters per key/model"""
+        with self._lock:
+            return {
+                f"{key_id}:{model}": {
+                    "admitted": quota.admitted,
+                    "rejected": quota.rejected,
+                    "blocked_for": max(0.0, quota.blocked_until - time.monotonic())
+                }
+                for (key_id, model), quota in self._quotas.items()
+            }
+
+
+_default_limiter: Optional[RateLimiter] = None
+_default_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """
+    Get the process-wide rate limiter built from Config
+
+    Returns:
+        Shared limiter, or None if rate limiting is disabled
+    """
+    global _default_limiter
+    if not Config.RATE_LIMIT_ENABLED:
+        return None
+
+    with _default_limiter_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter(
+                QuotaLimits(
+                    requests_per_minute=Config.GEMINI_RPM,
+                    requests_per_day=Config.GEMINI_RPD,
+                    tokens_per_minute=Config.GEMINI_TPM
+                ),
+                max_wait_seconds=Config.RATE_LIMIT_MAX_WAIT_SECONDS
+            )
+            logger.info(
+                f"Rate limiter initialized: {Config.GEMINI_RPM} RPM, "
+                f"{Config.GEMINI_RPD} RPD, {Config.GEMINI_TPM} TPM"
+            )
+        return _default_limiter
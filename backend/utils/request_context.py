@@ -0,0 +1,75 @@
+"""
+Request Context - Per-request state of an orchestrator call (execution
+trace, request id, the caller's API key), kept in a context variable so one
+orchestrator can serve many concurrent requests and users
+"""
+import threading
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils.config import Config
+
+# Request currently running; set by `request_context` and inherited by stage
+# threads and tasks started with a copied context
+_current_request: ContextVar[Optional["RequestContext"]] = ContextVar("request_context", default=None)
+
+
+class RequestContext:
+    """State of one `process_input` / `solve_problem` call"""
+
+    def __init__(self, api_key: Optional[str] = None):
+        """
+        Args:
+            api_key: Gemini API key the request's LLM calls are made and
+                rate-limited with (default Config.GEMINI_API_KEY)
+        """
+        self.api_key = api_key
+        self.request_id = uuid.uuid4().hex[:12]
+        self.started_at = datetime.now()
+        self.execution_trace: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def trace(self, entry: Dict[str, Any]) -> None:
+        """Append a trace entry (stages append from several threads)"""
+        with self._lock:
+            self.execution_trace.append(entry)
+
+
+def current_request() -> RequestContext:
+    """
+    Context of the request running in this context
+
+    Outside of `request_context` a new, detached context is returned, so
+    its trace entries are not shared with anything.
+    """
+    request = _current_request.get()
+    return request if request is not None else RequestContext()
+
+
+def current_api_key() -> str:
+    """API key of the request running in this context, else Config.GEMINI_API_KEY"""
+    request = _current_request.get()
+    if request is not None and request.api_key:
+        return request.api_key
+    return Config.GEMINI_API_KEY
+
+
+@contextmanager
+def request_context(api_key: Optional[str] = None) -> Iterator[RequestContext]:
+    """
+    Run the enclosed code (and the stages it starts) as one new request
+
+    Args:
+        api_key: The caller's API key; None inherits the enclosing request's
+            key, if any
+    """
+    parent = _current_request.get()
+    request = RequestContext(api_key or (parent.api_key if parent is not None else None))
+    token = _current_request.set(request)
+    try:
+        yield request
+    finally:
+        _current_request.reset(token)
@@ -0,0 +1,637 @@
+"""
+Result Cache - Whole-pipeline solve results keyed on normalized problem text
+Entries are versioned by the models, agent prompts and knowledge base, and
+human feedback marks them approved (kept over newer results) or rejected.
+A second, semantic tier reuses verified solutions of near-duplicate problems.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.config import Config
+from utils.llm_cache import DiskCache, MemoryLRUCache, ResponseCache, TieredResponseCache
+from utils.logger import setup_logger
+from utils.sympy_check import ascii_math, equations_match, is_math_text
+
+logger = setup_logger(__name__)
+
+# Result fields served from the cache
+CACHED_FIELDS = ("parsed_problem", "strategy", "solution", "verification", "explanation", "rag_sources")
+
+# A standalone single letter ("x" in "2x+1", not in "max"); e and i are
+# constants, "I" is the pronoun and "a"/"A" followed by a word is the article
+_VARIABLE_RE = re.compile(r"(?<![A-Za-z_\\])(?![aA] [A-Za-z]{2})([A-HJ-Za-df-hj-z])(?![A-Za-z_])")
+_VARIABLE_MARK = "§"
+
+# Fields of cached parser and solver output that hold only math (an
+# equation, an answer, a SymPy result), where every standalone letter is a
+# variable; all other strings are prose
+_MATH_FIELDS = {
+    ("parsed_problem", "variables"),
+    ("parsed_problem", "equations"),
+    ("parsed_problem", "constraints"),
+    ("solution", "final_answer"),
+    ("solution", "sympy_result"),
+    ("solution", "sympy_code"),
+}
+# Single letters that are also English words
+_WORD_LETTERS = {"a", "A", "I"}
+_OPERATORS = set("=+-*/^<>")
+
+
+def normalize_problem(text: str) -> Tuple[str, List[str]]:
+    """
+    Normalize a problem statement for cache lookups
+
+    Unicode math symbols and superscripts become ASCII ("x²" -> "x^2"),
+    whitespace around operators is ignored, "**" is "^", standalone
+    variables are renamed in order of first appearance and the rest is
+    lowercased, so "Solve y² − 4 = 0" and "solve x^2-4=0" share a key.
+    Variable names keep their case ("A" and "a" are different variables).
+
+    Args:
+        text: Problem text
+
+    Returns:
+        Tuple of (normalized text, original variable names in order)
+    """
+    text = ascii_math(text)
+    text = text.replace("**", "^")
+    text = re.sub(r"\s*([^\w\s])\s*", r"\1", text)
+    text = re.sub(r"\s+", " ", text).strip().rstrip(".?!")
+    text = re.sub(r"(\d)\*([A-Za-z(])", r"\1\2", text)
+
+    variables: List[str] = []
+
+    def rename(match: re.Match) -> str:
+        name = match.group(1)
+        if name not in variables:
+            variables.append(name)
+        return f"{_VARIABLE_MARK}{variables.index(name)}"
+
+    return _VARIABLE_RE.sub(rename, text).lower(), variables
+
+
+class UnsafeRenameError(ValueError):
+    """Raised when a variable in prose cannot be told apart from a word"""
+
+
+def _rename_in_prose(text: str, match: re.Match, mapping: Dict[str, str]) -> str:
+    """
+    New name for one occurrence of a variable in prose
+
+    A letter that is also a word ("a", "A", "I") is renamed only next to an
+    operator, digit or parenthesis ("a = 4", "2a", "(a+1)") and kept before
+    a word ("a simple equation"); letters between digits ("2x2") are sizes,
+    not variables. Anything else is ambiguous.
+
+    Raises:
+        UnsafeRenameError: If the occurrence is ambiguous
+    """
+    name, start, end = match.group(1), match.start(1), match.end(1)
+    before, after = text[start - 1:start], text[end:end + 1]
+    prev_char, next_char = text[:start].rstrip()[-1:], text[end:].lstrip()[:1]
+    in_math = (
+        prev_char in _OPERATORS or next_char in _OPERATORS
+        or before in ("(", "^") or after in (")", "^", ",") or before.isdigit()
+    )
+    if before.isdigit() and after.isdigit():
+        raise UnsafeRenameError(f"'{name}' between digits in {text!r}")
+    if name not in _WORD_LETTERS or in_math:
+        return mapping[name]
+    if next_char.isalpha() and (prev_char == "" or prev_char.isalpha() or prev_char in ".,:;!?"):
+        return name
+    raise UnsafeRenameError(f"'{name}' may be a word or a variable in {text!r}")
+
+
+def _rename_variables(value: Any, mapping: Dict[str, str], math: bool = False) -> Any:
+    """
+    Rename standalone variables (case-sensitive) in the strings of a value
+
+    Args:
+        value: String, or list / dict of them
+        mapping: Old name -> new name
+        math: Whether the strings are math fields (see `_MATH_FIELDS`); ones
+            that turn out to contain words are treated as prose
+
+    Raises:
+        UnsafeRenameError: If a variable in prose cannot be renamed safely
+    """
+    if isinstance(value, str):
+        pattern = re.compile(
+            r"(?<![A-Za-z_\\])(" + "|".join(map(re.escape, mapping)) + r")(?![A-Za-z_])"
+        )
+        if math and is_math_text(value):
+            return pattern.sub(lambda m: mapping[m.group(1)], value)
+        return pattern.sub(lambda m: _rename_in_prose(value, m, mapping), value)
+    if isinstance(value, list):
+        return [_rename_variables(v, mapping, math) for v in value]
+    if isinstance(value, dict):
+        return {k: _rename_variables(v, mapping, math) for k, v in value.items()}
+    return value
+
+
+def rename_result_variables(result: Dict[str, Any],
+                            cached_variables: List[str],
+                            variables: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Cached result fields with the cached problem's variables renamed to the
+    new problem's
+
+    Returns:
+        The renamed fields, or None if the variables do not correspond or
+        could not be renamed safely (then the lookup is a miss)
+    """
+    if len(cached_variables) != len(variables):
+        return None
+    mapping = {cached: current for cached, current in zip(cached_variables, variables) if cached != current}
+    if not mapping:
+        return result
+    try:
+        return {
+            field: {
+                key: _rename_variables(item, mapping, (field, key) in _MATH_FIELDS)
+                for key, item in value.items()
+            } if isinstance(value, dict) else _rename_variables(value, mapping)
+            for field, value in result.items()
+        }
+    except UnsafeRenameError as e:
+        logger.info(f"Cached result not reused: {e}")
+        return None
+
+
+def _knowledge_base_version() -> str:
+    """Hash of the knowledge base files (names and contents)"""
+    digest = hashlib.sha256()
+    kb_dir = Config.KNOWLEDGE_BASE_DIR
+    if kb_dir.exists():
+        for path in sorted(kb_dir.rglob("*")):
+            if path.is_file():
+                digest.update(str(path.relative_to(kb_dir)).encode("utf-8"))
+                digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def pipeline_version(model_names: Iterable[str],
+                     prompt_fingerprints: Iterable[str],
+                     pipeline_mode: str) -> str:
+    """
+    Version of everything a cached result depends on
+
+    Args:
+        model_names: Primary and fallback models
+        prompt_fingerprints: Agents' prompt fingerprints
+        pipeline_mode: 'standard' or 'fused'
+
+    Returns:
+        Short hex digest; changing any input invalidates cached results
+    """
+    payload = json.dumps([
+        list(model_names), sorted(prompt_fingerprints), pipeline_mode, _knowledge_base_version()
+    ])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class ResultCache:
+    """Solve results per normalized problem and pipeline version"""
+
+    def __init__(self, version: str, store: ResponseCache, memory_system=None):
+        """
+        Args:
+            version: Pipeline version (see `pipeline_version`)
+            store: Key-value store for serialized entries
+            memory_system: MemorySystem used to look up stored feedback
+        """
+        self.version = version
+        self.store = store
+        self.memory_system = memory_system
+        # interaction_id -> cache key of results stored by this process
+        self._keys_by_interaction: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, normalized: str) -> str:
+        return hashlib.sha256(f"{self.version}\n{normalized}".encode("utf-8")).hexdigest()
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = self.store.get(key)
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            return None
+
+    def _save(self, key: str, entry: Dict[str, Any]) -> None:
+        self.store.set(key, json.dumps(entry, ensure_ascii=False))
+
+    def _feedback_approval(self, interaction_id: str) -> Optional[bool]:
+        """Approval recorded in feedback.jsonl, or None without feedback"""
+        if self.memory_system is None or not interaction_id:
+            return None
+        feedback = self.memory_system.get_feedback(interaction_id)
+        return None if feedback is None else bool(feedback.get("approved"))
+
+    def get(self, problem_text: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result
+
+        Args:
+            problem_text: Problem text as submitted
+
+        Returns:
+            The cached result fields plus "interaction_id", "approved" and
+            "cache_key", with variables renamed to the ones used in
+            problem_text; None on a miss or if feedback rejected the entry
+        """
+        normalized, variables = normalize_problem(problem_text)
+        key = self._key(normalized)
+        entry = self._load(key)
+        if entry is None:
+            return None
+
+        # Feedback may have been given after the entry was stored
+        approval = self._feedback_approval(entry.get("interaction_id", ""))
+        if approval is False:
+            logger.info("Cached result was rejected by feedback; solving again")
+            self._save(key, {**entry, "approved": False})
+            return None
+        if entry.get("approved") is False and approval is None:
+            return None
+        if approval and not entry.get("approved"):
+            entry["approved"] = True
+            self._save(key, entry)
+
+        result = {field: entry["result"].get(field) for field in CACHED_FIELDS}
+        if entry.get("variables", []) != variables:
+            result = rename_result_variables(result, entry.get("variables", []), variables)
+            if result is None:
+                return None
+            # The parser's restatement is prose; the submitted text is the problem
+            result["parsed_problem"] = {**(result["parsed_problem"] or {}), "problem_text": problem_text}
+        result.update({
+            "interaction_id": entry.get("interaction_id", ""),
+            "approved": bool(entry.get("approved")),
+            "cache_key": key
+        })
+        return result
+
+    def put(self, problem_text: str, result: Dict[str, Any]) -> bool:
+        """
+        Store a successful solve result
+
+        An approved entry for the same problem is kept instead of being
+        replaced by an unreviewed result.
+
+        Args:
+            problem_text: Problem text as submitted
+            result: `solve_problem` result
+
+        Returns:
+            Whether the result was stored
+        """
+        if (result.get("status") != "success" or result.get("requires_hitl")
+                or result.get("needs_clarification")):
+            return False
+
+        normalized, variables = normalize_problem(problem_text)
+        key = self._key(normalized)
+        existing = self._load(key)
+        if existing is not None and existing.get("approved"):
+            return False
+
+        interaction_id = result.get("interaction_id", "")
+        self._save(key, {
+            "version": self.version,
+            "normalized": normalized,
+            "variables": variables,
+            "interaction_id": interaction_id,
+            "approved": None,
+            "result": {field: result.get(field) for field in CACHED_FIELDS}
+        })
+        if interaction_id:
+            with self._lock:
+                self._keys_by_interaction[interaction_id] = key
+        return True
+
+    def record_feedback(self, interaction_id: str, approved: bool) -> None:
+        """
+        Mark the entry stored for an interaction as approved or rejected
+
+        Entries stored by other processes pick the feedback up from
+        feedback.jsonl on their next lookup.
+        """
+        with self._lock:
+            key = self._keys_by_interaction.get(interaction_id)
+        entry = self._load(key) if key else None
+        if entry is None:
+            return
+        entry["approved"] = bool(approved)
+        self._save(key, entry)
+        logger.info(f"Cached result {'approved' if approved else 'rejected'} by feedback")
+
+    def update_explanation(self, interaction_id: str, explanation: Dict[str, Any]) -> None:
+        """Fill in the explanation of an entry stored without one (deferred)"""
+        with self._lock:
+            key = self._keys_by_interaction.get(interaction_id)
+        entry = self._load(key) if key else None
+        if entry is None or entry["result"].get("explanation") is not None:
+            return
+        entry["result"]["explanation"] = explanation
+        self._save(key, entry)
+
+    def clear(self) -> None:
+        self.store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"version": self.version, **self.store.stats()}
+
+
+def _numbers(text: str) -> List[str]:
+    return sorted(re.findall(r"\d+(?:\.\d+)?", ascii_math(text)))
+
+
+class SemanticResultCache:
+    """
+    Verified solutions looked up by embedding similarity of the parsed
+    problem, reused only after a SymPy check that the equations match
+
+    Vectors are kept in memory as a normalized matrix (cosine similarity by
+    one matrix product) and entries are persisted as JSONL, one file per
+    pipeline version.
+    """
+
+    # Nearest entries checked per lookup
+    CANDIDATES = 5
+
+    def __init__(self,
+                 version: str,
+                 embed: Callable[[str], List[float]],
+                 cache_dir: Path,
+                 memory_system=None,
+                 threshold: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        """
+        Args:
+            version: Pipeline version (see `pipeline_version`)
+            embed: Embedding function (the RAG pipeline's MiniLM model)
+            cache_dir: Directory for the persisted index
+            memory_system: MemorySystem used to look up stored feedback
+            threshold: Minimum cosine similarity (default Config.SEMANTIC_CACHE_THRESHOLD)
+            max_entries: Index size cap, oldest dropped first
+        """
+        self.version = version
+        self.embed = embed
+        self.path = Path(cache_dir) / f"{version}.jsonl"
+        self.memory_system = memory_system
+        self.threshold = threshold or Config.SEMANTIC_CACHE_THRESHOLD
+        self.max_entries = max_entries or Config.SEMANTIC_CACHE_MAX_ENTRIES
+        self.hits = 0
+        self.misses = 0
+        self._entries: List[Dict[str, Any]] = []
+        self._vectors: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def _unit(vector: List[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+        except Exception as e:
+            logger.warning(f"Failed to load semantic cache index: {e}")
+            return
+        self._entries = entries[-self.max_entries:]
+        self._rebuild()
+        logger.info(f"Semantic cache loaded {len(self._entries)} entries")
+
+    def _rebuild(self) -> None:
+        self._vectors = (
+            np.stack([self._unit(e["vector"]) for e in self._entries]) if self._entries else None
+        )
+
+    def _rewrite(self) -> None:
+        """Persist the current entries (after eviction or feedback)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in self._entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.path)
+
+    def _feedback_approval(self, entry: Dict[str, Any]) -> Optional[bool]:
+        if entry.get("approved") is not None:
+            return entry["approved"]
+        if self.memory_system is None or not entry.get("interaction_id"):
+            return None
+        feedback = self.memory_system.get_feedback(entry["interaction_id"])
+        return None if feedback is None else bool(feedback.get("approved"))
+
+    def _compatible(self,
+                    parsed_problem: Dict[str, Any],
+                    entry: Dict[str, Any],
+                    similarity: float) -> bool:
+        """Cheap checks that a near-duplicate really is the same problem"""
+        cached_problem = entry["parsed_problem"]
+        if parsed_problem.get("topic") != cached_problem.get("topic"):
+            return False
+        if _numbers(parsed_problem.get("problem_text", "")) != _numbers(cached_problem.get("problem_text", "")):
+            return False
+        equations = parsed_problem.get("equations") or []
+        cached_equations = cached_problem.get("equations") or []
+        if not equations and not cached_equations:
+            # Nothing for SymPy to compare: ask for a closer paraphrase
+            return similarity >= Config.SEMANTIC_CACHE_NO_EQUATION_THRESHOLD
+        return equations_match(equations, cached_equations)
+
+    def get(self, parsed_problem: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Find a verified solution of a near-duplicate problem
+
+        Args:
+            parsed_problem: Parser output for the new problem
+
+        Returns:
+            The cached result fields (variables renamed to the new problem's)
+            plus "interaction_id", "approved" and "similarity", or None
+        """
+        problem_text = parsed_problem.get("problem_text", "")
+        with self._lock:
+            entries, vectors = list(self._entries), self._vectors
+        if not problem_text or vectors is None:
+            return None
+
+        try:
+            similarities = vectors @ self._unit(self.embed(problem_text))
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            return None
+
+        nearest = np.argsort(-similarities)[:self.CANDIDATES]
+        candidates = [(entries[i], float(similarities[i])) for i in nearest
+                      if similarities[i] >= self.threshold]
+        # Entries approved by feedback first, then the closest
+        candidates.sort(key=lambda c: (self._feedback_approval(c[0]) is not True, -c[1]))
+
+        for entry, similarity in candidates:
+            if self._feedback_approval(entry) is False:
+                continue
+            if not self._compatible(parsed_problem, entry, similarity):
+                continue
+
+            # The new problem's own parse is served, so it is not renamed
+            result = {field: entry["result"].get(field) for field in CACHED_FIELDS if field != "parsed_problem"}
+            _, cached_vars = normalize_problem(entry["parsed_problem"].get("problem_text", ""))
+            _, current_vars = normalize_problem(problem_text)
+            result = rename_result_variables(result, cached_vars, current_vars)
+            if result is None:
+                continue
+            result.update({
+                "parsed_problem": parsed_problem,
+                "interaction_id": entry.get("interaction_id", ""),
+                "approved": self._feedback_approval(entry) is True,
+                "similarity": round(similarity, 4)
+            })
+            self.hits += 1
+            return result
+
+        self.misses += 1
+        return None
+
+    def put(self, parsed_problem: Dict[str, Any], result: Dict[str, Any]) -> bool:
+        """
+        Index a solve result if the verifier confirmed it
+
+        Args:
+            parsed_problem: Parser output the result was solved from
+            result: `solve_problem` result
+
+        Returns:
+            Whether the result was indexed
+        """
+        verification = result.get("verification") or {}
+        if (result.get("status") != "success" or result.get("requires_hitl")
+                or not verification.get("is_correct")
+                or verification.get("confidence", 0.0) < Config.VERIFIER_CONFIDENCE_THRESHOLD):
+            return False
+        problem_text = parsed_problem.get("problem_text", "")
+        if not problem_text:
+            return False
+
+        try:
+            vector = [float(x) for x in self.embed(problem_text)]
+        except Exception as e:
+            logger.warning(f"Semantic cache indexing failed: {e}")
+            return False
+
+        entry = {
+            "vector": vector,
+            "parsed_problem": parsed_problem,
+            "interaction_id": result.get("interaction_id", ""),
+            "approved": None,
+            "result": {field: result.get(field) for field in CACHED_FIELDS}
+        }
+        with self._lock:
+            self._entries.append(entry)
+            try:
+                if len(self._entries) > self.max_entries:
+                    self._entries = self._entries[-self.max_entries:]
+                    self._rewrite()
+                else:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            except Exception as e:
+                logger.warning(f"Failed to persist semantic cache entry: {e}")
+            self._rebuild()
+        return True
+
+    def record_feedback(self, interaction_id: str, approved: bool) -> None:
+        """Mark the entries of an interaction approved, or drop them if rejected"""
+        with self._lock:
+            matching = [e for e in self._entries if e.get("interaction_id") == interaction_id]
+            if not matching:
+                return
+            if approved:
+                for entry in matching:
+                    entry["approved"] = True
+            else:
+                self._entries = [e for e in self._entries if e.get("interaction_id") != interaction_id]
+                self._rebuild()
+            try:
+                self._rewrite()
+            except Exception as e:
+                logger.warning(f"Failed to persist semantic cache feedback: {e}")
+
+    def update_explanation(self, interaction_id: str, explanation: Dict[str, Any]) -> None:
+        """Fill in the explanation of entries indexed without one (deferred)"""
+        with self._lock:
+            matching = [
+                e for e in self._entries
+                if e.get("interaction_id") == interaction_id and e["result"].get("explanation") is None
+            ]
+            if not matching:
+                return
+            for entry in matching:
+                entry["result"]["explanation"] = explanation
+            try:
+                self._rewrite()
+            except Exception as e:
+                logger.warning(f"Failed to persist semantic cache explanation: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+
+_result_store: Optional[ResponseCache] = None
+_result_store_lock = threading.Lock()
+
+
+def get_result_store() -> Optional[ResponseCache]:
+    """
+    Process-wide store for cached solve results, built from Config
+
+    Returns:
+        Shared store, or None if the result cache is disabled
+    """
+    global _result_store
+    if not Config.RESULT_CACHE_ENABLED:
+        return None
+
+    with _result_store_lock:
+        if _result_store is None:
+            disk = None
+            if Config.RESULT_CACHE_MAX_DISK_MB > 0:
+                try:
+                    disk = DiskCache(
+                        Config.RESULT_CACHE_DIR,
+                        max_bytes=int(Config.RESULT_CACHE_MAX_DISK_MB * 1024 * 1024),
+                        ttl_seconds=Config.RESULT_CACHE_TTL_SECONDS or None
+                    )
+                except Exception as e:
+                    logger.warning(f"Result disk cache unavailable, using memory only: {e}")
+            memory = MemoryLRUCache(
+                Config.RESULT_CACHE_MAX_ENTRIES,
+                ttl_seconds=Config.RESULT_CACHE_TTL_SECONDS or None
+            )
+            _result_store = TieredResponseCache(memory, disk)
+            logger.info("Result cache initialized")
+        return _result_store
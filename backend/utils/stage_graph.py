@@ -0,0 +1,244 @@
+"""
+Stage Graph - Declarative pipeline stages with a dependency-aware scheduler
+Independent stages run concurrently on a thread pool (sync) or the event loop
+(async), and per-stage and critical-path timings are recorded
+"""
+import asyncio
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from utils.deadline import check_cancelled, time_left
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+StageContext = Dict[str, Any]
+
+
+@dataclass
+class Stage:
+    """
+    One pipeline stage
+
+    Attributes:
+        name: Unique stage name; its result is stored in the context under it
+        fn: Callable taking the shared context and returning the stage result
+        deps: Names of stages that must finish first
+        afn: Optional coroutine function used by `arun` instead of running
+            `fn` in a worker thread
+        when: Optional predicate on the context; when it returns False the
+            stage is skipped and its result is None
+    """
+    name: str
+    fn: Callable[[StageContext], Any]
+    deps: Tuple[str, ...] = ()
+    afn: Optional[Callable[[StageContext], Awaitable[Any]]] = None
+    when: Optional[Callable[[StageContext], bool]] = None
+
+
+class StageGraph:
+    """Dependency graph of stages and its schedulers"""
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Duplicate stage names in stage graph")
+        for stage in stages:
+            missing = [d for d in stage.deps if d not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages: {missing}")
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        order: List[str] = []
+        state: Dict[str, int] = {}
+
+        def visit(name: str) -> None:
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise ValueError(f"Cycle in stage graph at {name}")
+            state[name] = 1
+            for dep in self.stages[name].deps:
+                visit(dep)
+            state[name] = 2
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def _ready(self, done: set, started: set) -> List[str]:
+        return [
+            name for name in self.order
+            if name not in started and all(d in done for d in self.stages[name].deps)
+        ]
+
+    def _should_run(self, stage: Stage, ctx: StageContext) -> bool:
+        return stage.when is None or stage.when(ctx)
+
+    def _timing(self, spans: Dict[str, Dict[str, Any]], run_started: float) -> Dict[str, Any]:
+        """Per-stage spans (ms from run start) and the critical path"""
+        stages = {
+            name: {
+                "start_ms": round((span["start"] - run_started) * 1000.0, 1),
+                "end_ms": round((span["end"] - run_started) * 1000.0, 1),
+                "duration_ms": round((span["end"] - span["start"]) * 1000.0, 1),
+                "skipped": span["skipped"]
+            }
+            for name, span in spans.items()
+        }
+
+        # Walk back from the last stage to finish through its latest-finishing
+        # dependency; skipped stages took no time and are left out
+        ran = {name: span for name, span in spans.items() if not span["skipped"]}
+        critical_path: List[str] = []
+        current = max(ran, key=lambda n: ran[n]["end"]) if ran else None
+        while current is not None:
+            critical_path.append(current)
+            deps = [d for d in self.stages[current].deps if d in ran]
+            current = max(deps, key=lambda n: ran[n]["end"]) if deps else None
+        critical_path.reverse()
+
+        total_ms = max((s["end_ms"] for s in stages.values()), default=0.0)
+        busy_ms = sum(s["duration_ms"] for s in stages.values())
+        return {
+            "stages": stages,
+            "critical_path": critical_path,
+            "critical_path_ms": round(sum(stages[n]["duration_ms"] for n in critical_path), 1),
+            "total_ms": total_ms,
+            # > 1.0 means stages overlapped
+            "parallelism": round(busy_ms / total_ms, 2) if total_ms else 0.0
+        }
+
+    def run(self,
+            ctx: StageContext,
+            executor: Executor,
+            poll: Optional[Callable[[], None]] = None,
+            on_done: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """
+        Run all stages, each as soon as its dependencies are done
+
+        Args:
+            ctx: Shared context; inputs go in up front, each stage's result is
+                stored under its name
+            executor: Pool the stages run on
+            poll: Called on the calling thread between waits (e.g. to deliver
+                queued UI events from the worker threads)
+            on_done: Called on the calling thread with each stage's name once
+                its result is in the context
+
+        Returns:
+            Timing dict (see `_timing`)
+
+        Raises:
+            The first exception raised by a stage, or RequestCancelledError
+            once the current request is cancelled or out of time; stages that
+            have not started yet are not run
+        """
+        run_started = time.perf_counter()
+        spans: Dict[str, Dict[str, Any]] = {}
+        done: set = set()
+        started: set = set()
+        running: Dict[Future, str] = {}
+
+        def execute(stage: Stage) -> Any:
+            spans[stage.name] = {"start": time.perf_counter(), "skipped": False}
+            try:
+                check_cancelled()
+                if not self._should_run(stage, ctx):
+                    spans[stage.name]["skipped"] = True
+                    return None
+                return stage.fn(ctx)
+            finally:
+                spans[stage.name]["end"] = time.perf_counter()
+
+        try:
+            while len(done) < len(self.stages):
+                check_cancelled()
+                for name in self._ready(done, started):
+                    started.add(name)
+                    future = executor.submit(
+                        contextvars.copy_context().run, execute, self.stages[name]
+                    )
+                    running[future] = name
+
+                # Wake up at the request deadline even if no stage finishes,
+                # so a stuck stage cannot hold the caller past it
+                finished, _ = wait(
+                    list(running), timeout=time_left(0.05 if poll else None),
+                    return_when=FIRST_COMPLETED
+                )
+                if poll:
+                    poll()
+                check_cancelled()
+                for future in finished:
+                    name = running.pop(future)
+                    ctx[name] = future.result()
+                    done.add(name)
+                    if on_done:
+                        on_done(name)
+        finally:
+            for future in running:
+                future.cancel()
+            if poll:
+                poll()
+
+        return self._timing(spans, run_started)
+
+    async def arun(self, ctx: StageContext) -> Dict[str, Any]:
+        """
+        Async variant of `run`: stages with `afn` run on the event loop,
+        the others in worker threads
+
+        Args:
+            ctx: Shared context (see `run`)
+
+        Returns:
+            Timing dict (see `_timing`)
+
+        Raises:
+            As `run`
+        """
+        run_started = time.perf_counter()
+        spans: Dict[str, Dict[str, Any]] = {}
+        done: set = set()
+        started: set = set()
+        running: Dict[asyncio.Task, str] = {}
+
+        async def execute(stage: Stage) -> Any:
+            spans[stage.name] = {"start": time.perf_counter(), "skipped": False}
+            try:
+                check_cancelled()
+                if not self._should_run(stage, ctx):
+                    spans[stage.name]["skipped"] = True
+                    return None
+                if stage.afn is not None:
+                    return await stage.afn(ctx)
+                return await asyncio.to_thread(stage.fn, ctx)
+            finally:
+                spans[stage.name]["end"] = time.perf_counter()
+
+        try:
+            while len(done) < len(self.stages):
+                check_cancelled()
+                for name in self._ready(done, started):
+                    started.add(name)
+                    running[asyncio.ensure_future(execute(self.stages[name]))] = name
+
+                finished, _ = await asyncio.wait(
+                    list(running), timeout=time_left(0.1), return_when=asyncio.FIRST_COMPLETED
+                )
+                check_cancelled()
+                for task in finished:
+                    name = running.pop(task)
+                    ctx[name] = task.result()
+                    done.add(name)
+        finally:
+            for task in running:
+                task.cancel()
+
+        return self._timing(spans, run_started)
@@ -0,0 +1,290 @@
+"""
+SymPy Checks - Cheap symbolic comparisons of equations and answers
+Used to match near-duplicate problems and to confirm a solver's final answer
+against its own SymPy tool result without another LLM call.
+
+The text compared is written by users and the LLM, and parsing or simplifying
+it can run for arbitrarily long ("factorial(10**7)"), so the public checks run
+in a SymPy sandbox process (utils/sympy_sandbox.py) with a time limit and
+count as "no match" when it expires.
+"""
+import json
+import re
+import unicodedata
+from typing import Any, List, Optional
+
+import sympy as sp
+from sympy.parsing.sympy_parser import (
+    convert_xor,
+    implicit_multiplication_application,
+    parse_expr,
+    standard_transformations,
+)
+
+from utils.config import Config
+from utils.deadline import time_left
+from utils.logger import setup_logger
+from utils.sympy_sandbox import run_sympy_code
+
+logger = setup_logger(__name__)
+
+_MATH_SYMBOLS = {
+    "×": "*", "·": "*", "∗": "*", "⋅": "*", "÷": "/", "∕": "/",
+    "−": "-", "–": "-", "—": "-",
+    "≤": "<=", "⩽": "<=", "≥": ">=", "⩾": ">=", "≠": "!=",
+    "√": "sqrt", "π": "pi", "∞": "oo", "θ": "theta",
+}
+_SUPERSCRIPTS = str.maketrans("⁰¹²³⁴⁵⁶⁷⁸⁹⁺⁻", "0123456789+-")
+_SUPERSCRIPT_RE = re.compile(r"[⁰¹²³⁴⁵⁶⁷⁸⁹⁺⁻]+")
+
+_SYMPY_TRANSFORMATIONS = standard_transformations + (implicit_multiplication_application, convert_xor)
+
+# Text is only handed to SymPy if it looks like plain algebra
+_SAFE_EQUATION_RE = re.compile(r"^[\w\s+\-*/^().,=]{1,200}$")
+# SymPy tool results may also be lists, tuples and dicts ("[-3, -2]", "{x: 2}")
+_SAFE_RESULT_RE = re.compile(r"^[\w\s+\-*/^().,\[\]{}:]{1,500}$")
+
+# Separators between the values of a multi-valued answer ("x = -2 or x = -3")
+_ANSWER_SPLIT_RE = re.compile(r"\bor\b|\band\b|[,;]", re.IGNORECASE)
+
+# Relative tolerance for numeric comparison of answer values
+_NUMERIC_TOLERANCE = 1e-6
+
+# Words of two or more letters (not LaTeX commands such as "\\frac")
+_WORD_RE = re.compile(r"(?<![\\\w])[A-Za-z_]\w+")
+
+
+def is_math_text(text: str) -> bool:
+    """
+    Whether text is only algebra: every word in it is a SymPy name (sqrt,
+    det, pi, ...) or "or"/"and", so its single letters are all symbols
+    """
+    return all(word in ("or", "and") or hasattr(sp, word) for word in _WORD_RE.findall(text))
+
+
+def _sandboxed(check: str, *args: Any) -> Optional[bool]:
+    """
+    Run `check(*args)` (a function of this module) in a sandbox process
+
+    Returns:
+        Its result, or None if it failed or ran out of time
+    """
+    code = (
+        "import json\n"
+        f"from utils.sympy_check import {check}\n"
+        f"result = {check}(*json.loads({json.dumps(list(args))!r}))"
+    )
+    reply = run_sympy_code(code, time_left(Config.SYMPY_CHECK_TIMEOUT_SECONDS or None))
+    return {"True": True, "False": False}.get(reply)
+
+
+def ascii_math(text: str) -> str:
+    """Replace Unicode math symbols and superscripts with ASCII forms"""
+    text = _SUPERSCRIPT_RE.sub(lambda m: "^" + m.group(0).translate(_SUPERSCRIPTS), text)
+    for symbol, ascii_form in _MATH_SYMBOLS.items():
+        text = text.replace(symbol, ascii_form)
+    return unicodedata.normalize("NFKC", text)
+
+
+def _parse(text: str) -> Optional[Any]:
+    try:
+        return parse_expr(text, transformations=_SYMPY_TRANSFORMATIONS)
+    except Exception:
+        return None
+
+
+def parse_equation(equation: str) -> Optional[sp.Expr]:
+    """SymPy expression that is zero when the equation holds, or None"""
+    text = ascii_math(equation).strip()
+    if not _SAFE_EQUATION_RE.match(text) or "__" in text or text.count("=") > 1:
+        return None
+    if "=" in text:
+        lhs, rhs = (_parse(side) for side in text.split("="))
+        if lhs is None or rhs is None:
+            return None
+        try:
+            return lhs - rhs
+        except Exception:
+            return None
+    return _parse(text)
+
+
+def _canonical_symbols(exprs: List[sp.Expr]) -> List[sp.Expr]:
+    """Rename free symbols to v0, v1, ... by sorted name (consistently across exprs)"""
+    symbols = sorted(set().union(*(e.free_symbols for e in exprs)), key=lambda sym: sym.name)
+    mapping = {sym: sp.Symbol(f"v{i}") for i, sym in enumerate(symbols)}
+    return [e.xreplace(mapping) for e in exprs]
+
+
+def _same_equation(a: sp.Expr, b: sp.Expr) -> bool:
+    """Whether two "expr = 0" forms are the same equation (up to a constant factor)"""
+    if sp.expand(a - b) == 0 or sp.expand(a + b) == 0:
+        return True
+    if b == 0:
+        return False
+    ratio = sp.cancel(a / b)
+    return bool(ratio.is_number) and ratio != 0
+
+
+def equations_match(equations_a: List[str], equations_b: List[str]) -> bool:
+    """
+    Cheap SymPy check that two problems state the same equations
+
+    Equations are compared as "lhs - rhs" up to variable names, sign and a
+    constant factor; unparseable equations never match.
+
+    Args:
+        equations_a: Equations of one problem (parser output)
+        equations_b: Equations of the other
+
+    Returns:
+        True if every equation has a matching counterpart
+    """
+    if len(equations_a) != len(equations_b):
+        return False
+    if not equations_a:
+        return True
+    return _sandboxed("_equations_match", equations_a, equations_b) is True
+
+
+def _equations_match(equations_a: List[str], equations_b: List[str]) -> bool:
+    """`equations_match`, in-process"""
+    if len(equations_a) != len(equations_b):
+        return False
+    parsed_a = [parse_equation(e) for e in equations_a]
+    parsed_b = [parse_equation(e) for e in equations_b]
+    if any(e is None for e in parsed_a + parsed_b):
+        return False
+    if not parsed_a:
+        return True
+
+    unmatched = _canonical_symbols(parsed_b)
+    for a in _canonical_symbols(parsed_a):
+        match = next((b for b in unmatched if _same_equation(a, b)), None)
+        if match is None:
+            return False
+        unmatched.remove(match)
+    return True
+
+
+def answer_values(final_answer: str) -> Optional[List[sp.Expr]]:
+    """
+    Values stated by a final answer ("x = -2 or x = -3" -> [-2, -3])
+
+    Returns:
+        The values, or None if any part of the answer is not plain algebra
+    """
+    parts = [part.strip() for part in _ANSWER_SPLIT_RE.split(ascii_math(final_answer))]
+    values = []
+    for part in filter(None, parts):
+        value_text = part.rsplit("=", 1)[-1].strip()
+        if not _SAFE_EQUATION_RE.match(value_text) or "__" in value_text:
+            return None
+        value = _parse(value_text)
+        if not isinstance(value, sp.Basic):
+            return None
+        values.append(value)
+    return values or None
+
+
+def _flatten(value: Any) -> List[Any]:
+    if isinstance(value, dict):
+        return [v for item in value.values() for v in _flatten(item)]
+    if isinstance(value, (list, tuple, set, sp.FiniteSet)):
+        return [v for item in value for v in _flatten(item)]
+    return [value]
+
+
+def _tool_values(sympy_result: str) -> Optional[List[sp.Expr]]:
+    """Values in a SymPy tool result string ("[-3, -2]", "{x: 2}", "2*x")"""
+    text = sympy_result.strip()
+    if not _SAFE_RESULT_RE.match(text) or "__" in text:
+        return None
+    parsed = _parse(text)
+    if parsed is None:
+        return None
+    values = _flatten(parsed)
+    if not values or not all(isinstance(v, sp.Basic) for v in values):
+        return None
+    return values
+
+
+def _same_value(a: sp.Expr, b: sp.Expr) -> bool:
+    try:
+        if a.is_number and b.is_number:
+            a_value, b_value = complex(a), complex(b)
+            return abs(a_value - b_value) <= _NUMERIC_TOLERANCE * max(1.0, abs(b_value))
+        return sp.simplify(a - b) == 0
+    except Exception:
+        return False
+
+
+def sympy_confirms_answer(final_answer: str, sympy_result: str) -> bool:
+    """
+    Whether a solver's SymPy tool result states exactly its final answer
+
+    Both sides are reduced to a multiset of values (solutions of an equation,
+    a derivative, a determinant, ...) and compared symbolically, or within a
+    small tolerance for numbers. Anything that does not parse cleanly is not
+    a confirmation.
+
+    Args:
+        final_answer: Solver's final answer text
+        sympy_result: String result of the solver's SymPy code
+
+    Returns:
+        True if every answer value matches exactly one tool result value
+    """
+    if not final_answer or not sympy_result or sympy_result.startswith("Error executing"):
+        return False
+    if _sandboxed("_confirms_answer", final_answer, sympy_result) is not True:
+        return False
+    logger.debug(f"SymPy result {sympy_result!r} confirms answer {final_answer!r}")
+    return True
+
+
+def _confirms_answer(final_answer: str, sympy_result: str) -> bool:
+    """`sympy_confirms_answer`, in-process"""
+    answers = answer_values(final_answer)
+    tool_values = _tool_values(sympy_result)
+    return answers is not None and tool_values is not None and _same_values(answers, tool_values)
+
+
+def _same_values(values_a: List[sp.Expr], values_b: List[sp.Expr]) -> bool:
+    """Whether two value lists are equal as multisets"""
+    if len(values_a) != len(values_b):
+        return False
+    unmatched = list(values_b)
+    for value in values_a:
+        match = next((v for v in unmatched if _same_value(value, v)), None)
+        if match is None:
+            return False
+        unmatched.remove(match)
+    return True
+
+
+def answers_match(answer_a: str, answer_b: str) -> Optional[bool]:
+    """
+    Whether two final answers state the same values
+
+    Returns:
+        True or False, or None if either answer is not plain algebra (then
+        only identical text counts as a match)
+    """
+    if ascii_math(answer_a).replace(" ", "").lower() == ascii_math(answer_b).replace(" ", "").lower():
+        return True
+    if not answer_a or not answer_b:
+        return None
+    # Prose would parse as a product of symbols ("two apples" -> t*w*o*...)
+    if not is_math_text(ascii_math(answer_a)) or not is_math_text(ascii_math(answer_b)):
+        return None
+    return _sandboxed("_answers_match", answer_a, answer_b)
+
+
+def _answers_match(answer_a: str, answer_b: str) -> Optional[bool]:
+    """`answers_match`, in-process"""
+    values_a = answer_values(answer_a) if answer_a else None
+    values_b = answer_values(answer_b) if answer_b else None
+    if values_a is None or values_b is None:
+        return None
+    return _same_values(values_a, values_b)
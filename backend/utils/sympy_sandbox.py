@@ -0,0 +1,179 @@
+"""
+SymPy Sandbox - Runs solver-generated SymPy code in child processes
+so a runaway computation can be killed at its time limit (or when the
+request is cancelled) instead of pinning a worker thread
+"""
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.deadline import check_cancelled
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Directory `python -m utils.sympy_sandbox` is started from
+_BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Idle workers kept for reuse; a worker is discarded when it is killed
+_MAX_IDLE_WORKERS = 4
+_idle_workers: List["_Worker"] = []
+_idle_workers_lock = threading.Lock()
+
+
+def _namespace() -> Dict[str, Any]:
+    """Restricted namespace the code runs in"""
+    import sympy as sp
+
+    return {
+        'sp': sp,
+        'Symbol': sp.Symbol,
+        'symbols': sp.symbols,
+        'solve': sp.solve,
+        'simplify': sp.simplify,
+        'expand': sp.expand,
+        'factor': sp.factor,
+        'diff': sp.diff,
+        'integrate': sp.integrate,
+        'limit': sp.limit,
+        'sqrt': sp.sqrt,
+        'log': sp.log,
+        'exp': sp.exp,
+        'sin': sp.sin,
+        'cos': sp.cos,
+        'tan': sp.tan,
+        'pi': sp.pi,
+        'oo': sp.oo,
+        'Matrix': sp.Matrix,
+        'det': lambda m: m.det(),
+    }
+
+
+class _Worker:
+    """Child interpreter with SymPy loaded that runs one snippet at a time"""
+
+    def __init__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "utils.sympy_sandbox"],
+            cwd=_BACKEND_DIR,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8"
+        )
+        self._replies: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+        threading.Thread(target=self._read, name="sympy-sandbox-reader", daemon=True).start()
+
+    def _read(self) -> None:
+        for line in self.process.stdout:  # type: ignore[union-attr]
+            self._replies.put(line)
+        self._replies.put(None)
+
+    def run(self, code: str, timeout: Optional[float]) -> Optional[str]:
+        """
+        Returns:
+            str(result) or an error message, None if `timeout` passed first
+
+        Raises:
+            RequestCancelledError: If the current request stops first
+        """
+        self.process.stdin.write(json.dumps({"code": code}) + "\n")  # type: ignore[union-attr]
+        self.process.stdin.flush()  # type: ignore[union-attr]
+        ends = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            try:
+                line = self._replies.get(timeout=0.05)
+            except queue.Empty:
+                check_cancelled()
+                if ends is not None and time.monotonic() >= ends:
+                    return None
+                continue
+            if line is None:
+                return f"Error executing code: worker exited with code {self.process.wait()}"
+            return json.loads(line)["result"]
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.wait()
+
+
+def run_sympy_code(code: str, timeout: Optional[float]) -> str:
+    """
+    Execute SymPy code in a sandbox process
+
+    Args:
+        code: Python code; its answer is read from a `result` variable
+        timeout: Seconds before the process is killed (None: no limit)
+
+    Returns:
+        str(result), or an "Error executing code: ..." message
+
+    Raises:
+        RequestCancelledError: If the current request is cancelled or runs
+            out of time first (the process is killed)
+    """
+    with _idle_workers_lock:
+        worker = _idle_workers.pop() if _idle_workers else None
+    if worker is None:
+        worker = _Worker()
+
+    try:
+        result = worker.run(code, timeout)
+    except BaseException:
+        worker.kill()
+        raise
+    if result is None:
+        worker.kill()
+        logger.warning(f"SymPy code timed out after {timeout:g}s")
+        return f"Error executing code: timed out after {timeout:g}s"
+
+    with _idle_workers_lock:
+        if worker.process.poll() is None and len(_idle_workers) < _MAX_IDLE_WORKERS:
+            _idle_workers.append(worker)
+            worker = None
+    if worker is not None:
+        worker.kill()
+    return result
+
+
+def warm_up() -> None:
+    """Start an idle worker and wait until SymPy is imported in it"""
+    worker = _Worker()
+    if worker.run("result = 1", timeout=60.0) is None:
+        worker.kill()
+        raise RuntimeError("SymPy sandbox worker did not start")
+    with _idle_workers_lock:
+        if len(_idle_workers) < _MAX_IDLE_WORKERS:
+            _idle_workers.append(worker)
+            return
+    worker.kill()
+
+
+def _serve() -> None:
+    """Worker side: run snippets read from stdin, one JSON line each"""
+    import sympy  # noqa: F401  (loaded once, before the first snippet)
+
+    # Replies go to the original stdout; anything the snippets print is dropped
+    replies = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+
+    for line in sys.stdin:
+        try:
+            namespace = _namespace()
+            exec(json.loads(line)["code"], namespace)
+            result = str(namespace.get('result', 'No result variable defined'))
+        except Exception as e:
+            result = f"Error executing code: {str(e)}"
+        replies.write(json.dumps({"result": result}) + "\n")
+        replies.flush()
+
+
+if __name__ == "__main__":
+    _serve()
@@ -0,0 +1,234 @@
+"""
+Timing - Monotonic spans for pipeline stages and sub-steps, aggregated into
+process-wide latency histograms (p50/p95/p99 per stage)
+"""
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from utils.config import Config
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Span log and time origin of the request currently running, and the span
+# new spans are nested under; set by `LatencyRecorder.track` and `timed`
+_current_spans: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("timing_spans", default=None)
+_current_origin: ContextVar[Optional[float]] = ContextVar("timing_origin", default=None)
+_current_parent: ContextVar[Optional[str]] = ContextVar("timing_parent", default=None)
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram
+
+    Buckets grow by `growth` per step from `min_ms`, so percentiles are
+    accurate to about half that ratio (2.5% by default) at any scale while
+    memory stays constant.
+    """
+
+    def __init__(self, min_ms: float = 0.01, growth: float = 1.05):
+        self.min_ms = min_ms
+        self._log_growth = math.log(growth)
+        self._buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_seen = math.inf
+        self.max_seen = 0.0
+
+    def _bucket(self, latency_ms: float) -> int:
+        if latency_ms <= self.min_ms:
+            return 0
+        return int(math.log(latency_ms / self.min_ms) / self._log_growth) + 1
+
+    def _bucket_value(self, bucket: int) -> float:
+        """Geometric midpoint of a bucket"""
+        if bucket == 0:
+            return self.min_ms
+        return self.min_ms * math.exp((bucket - 0.5) * self._log_growth)
+
+    def observe(self, latency_ms: float) -> None:
+        latency_ms = max(0.0, latency_ms)
+        bucket = self._bucket(latency_ms)
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total_ms += latency_ms
+        self.min_seen = min(self.min_seen, latency_ms)
+        self.max_seen = max(self.max_seen, latency_ms)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Approximate percentile
+
+        Args:
+            q: Percentile in [0, 100]
+
+        Returns:
+            Latency in milliseconds, or None without samples
+        """
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q / 100.0 * self.count))
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                return min(max(self._bucket_value(bucket), self.min_seen), self.max_seen)
+        return self.max_seen
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 2),
+            "min_ms": round(self.min_seen, 2),
+            "p50_ms": round(self.percentile(50), 2),
+            "p95_ms": round(self.percentile(95), 2),
+            "p99_ms": round(self.percentile(99), 2),
+            "max_ms": round(self.max_seen, 2),
+        }
+
+
+class LatencyRecorder:
+    """Process-wide latency histograms per stage / sub-step name"""
+
+    def __init__(self):
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, latency_ms: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram()
+            histogram.observe(latency_ms)
+
+    def percentile(self, name: str, q: float) -> Optional[float]:
+        """Approximate latency percentile of a stage, or None without samples"""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            return histogram.percentile(q) if histogram else None
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """count, mean, min, p50, p95, p99 and max (ms) per stage / sub-step"""
+        with self._lock:
+            return {name: h.summary() for name, h in sorted(self._histograms.items())}
+
+    def dump(self, path: Optional[Union[str, Path]] = None) -> Path:
+        """
+        Write the histogram summary as JSON
+
+        Args:
+            path: Output file (default Config.LATENCY_HISTOGRAMS_PATH)
+
+        Returns:
+            Path written
+        """
+        path = Path(path or Config.LATENCY_HISTOGRAMS_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"generated_at": datetime.now().isoformat(), "histograms": self.summary()}
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2)
+        tmp_path.replace(path)
+        logger.info(f"Latency histograms written to {path}")
+        return path
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    @contextmanager
+    def track(self) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Collect the spans recorded in this context (and tasks/threads it
+        spawns with a copied context)
+
+        Yields:
+            List that receives a dict per span, with times in ms from the
+            start of this context
+        """
+        spans: List[Dict[str, Any]] = []
+        spans_token = _current_spans.set(spans)
+        origin_token = _current_origin.set(time.perf_counter())
+        parent_token = _current_parent.set(None)
+        try:
+            yield spans
+        finally:
+            _current_parent.reset(parent_token)
+            _current_origin.reset(origin_token)
+            _current_spans.reset(spans_token)
+
+
+_latency_recorder = LatencyRecorder()
+
+
+def get_latency_recorder() -> LatencyRecorder:
+    """Get the process-wide latency recorder"""
+    return _latency_recorder
+
+
+def record_span(name: str,
+                started: float,
+                ended: Optional[float] = None,
+                **attrs: Any) -> Dict[str, Any]:
+    """
+    Record a finished span
+
+    Args:
+        name: Stage or sub-step name (the histogram key)
+        started: `time.perf_counter()` value at the start
+        ended: `time.perf_counter()` value at the end (default now)
+        **attrs: Extra fields kept on the span (e.g. agent, model)
+
+    Returns:
+        Span dict {"name", "parent", "start_ms", "end_ms", "duration_ms", ...}
+    """
+    ended = time.perf_counter() if ended is None else ended
+    duration_ms = (ended - started) * 1000.0
+    _latency_recorder.observe(name, duration_ms)
+
+    origin = _current_origin.get()
+    if origin is None:
+        origin = started
+    span = {
+        "name": name,
+        "parent": _current_parent.get(),
+        "start_ms": round((started - origin) * 1000.0, 2),
+        "end_ms": round((ended - origin) * 1000.0, 2),
+        "duration_ms": round(duration_ms, 2),
+        **attrs
+    }
+    spans = _current_spans.get()
+    if spans is not None:
+        spans.append(span)
+    return span
+
+
+@contextmanager
+def timed(name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Time a block as a span; spans recorded inside it are its sub-steps
+
+    Args:
+        name: Stage or sub-step name (the histogram key)
+        **attrs: Extra fields kept on the span
+
+    Yields:
+        Dict that receives the span fields when the block exits
+    """
+    span: Dict[str, Any] = {}
+    parent_token = _current_parent.set(name)
+    started = time.perf_counter()
+    try:
+        yield span
+    finally:
+        _current_parent.reset(parent_token)
+        span.update(record_span(name, started, **attrs))
@@ -0,0 +1,187 @@
+"""
+LLM Usage Tracker
+Per-call token, latency and payload accounting, aggregated per agent,
+model and session
+"""
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Session and per-request call log for the code currently running; set by
+# the orchestrator, read by BaseAgent when it records a call
+_current_session: ContextVar[Optional[str]] = ContextVar("usage_session", default=None)
+_current_calls: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("usage_calls", default=None)
+
+
+@dataclass
+class LLMCallRecord:
+    """One LLM call (or cache hit) made by an agent"""
+    agent: str
+    model: str
+    backend: str
+    prompt_chars: int
+    prompt_tokens: int
+    output_tokens: int
+    total_tokens: int
+    latency_ms: float
+    cached: bool = False
+    streamed: bool = False
+    status: str = "ok"
+    error: Optional[str] = None
+    session_id: Optional[str] = None
+    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+
+
+class _Totals:
+    """Running totals for one aggregation bucket"""
+
+    __slots__ = ("calls", "cache_hits", "errors", "prompt_chars",
+                 "prompt_tokens", "output_tokens", "latency_ms")
+
+    def __init__(self):
+        self.calls = 0
+        self.cache_hits = 0
+        self.errors = 0
+        self.prompt_chars = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.latency_ms = 0.0
+
+    def add(self, record: LLMCallRecord) -> None:
+        self.calls += 1
+        self.cache_hits += int(record.cached)
+        self.errors += int(record.status != "ok")
+        self.prompt_chars += record.prompt_chars
+        self.prompt_tokens += record.prompt_tokens
+        self.output_tokens += record.output_tokens
+        self.latency_ms += record.latency_ms
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "errors": self.errors,
+            "prompt_chars": self.prompt_chars,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "total_latency_ms": round(self.latency_ms, 1),
+            "avg_latency_ms": round(self.latency_ms / self.calls, 1) if self.calls else 0.0,
+        }
+
+
+class UsageTracker:
+    """Process-wide aggregation of LLM call records"""
+
+    def __init__(self, max_sessions: int = 1000):
+        self.max_sessions = max_sessions
+        self._by_agent: Dict[str, _Totals] = {}
+        self._by_model: Dict[str, _Totals] = {}
+        self._by_session: "OrderedDict[str, _Totals]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, record: LLMCallRecord) -> None:
+        """Add a call to the aggregates and to the active request's call log"""
+        if record.session_id is None:
+            record.session_id = _current_session.get()
+
+        with self._lock:
+            self._by_agent.setdefault(record.agent, _Totals()).add(record)
+            self._by_model.setdefault(record.model, _Totals()).add(record)
+            if record.session_id:
+                totals = self._by_session.get(record.session_id)
+                if totals is None:
+                    totals = self._by_session[record.session_id] = _Totals()
+                    while len(self._by_session) > self.max_sessions:
+                        self._by_session.popitem(last=False)
+                self._by_session.move_to_end(record.session_id)
+                totals.add(record)
+
+        calls = _current_calls.get()
+        if calls is not None:
+            calls.append(asdict(record))
+
+        logger.debug(
+            f"LLM call {record.agent} [{record.model}] {record.status}: "
+            f"{record.prompt_tokens}+{record.output_tokens} tokens, "
+            f"{record.latency_ms:.0f} ms{' (cached)' if record.cached else ''}"
+        )
+
+    @contextmanager
+    def track(self, session_id: Optional[str] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Collect the calls made in this context (and tasks/threads it spawns
+        with a copied context)
+
+        Args:
+            session_id: Session the calls are attributed to
+
+        Yields:
+            List that receives a dict per LLMCallRecord
+        """
+        calls: List[Dict[str, Any]] = []
+        session_token = _current_session.set(session_id)
+        calls_token = _current_calls.set(calls)
+        try:
+            yield calls
+        finally:
+            _current_calls.reset(calls_token)
+            _current_session.reset(session_token)
+
+    def session_summary(self, session_id: str) -> Dict[str, Any]:
+        """Totals for one session"""
+        with self._lock:
+            totals = self._by_session.get(session_id)
+            return totals.as_dict() if totals else _Totals().as_dict()
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals per agent, model and session"""
+        with self._lock:
+            return {
+                "by_agent": {k: v.as_dict() for k, v in self._by_agent.items()},
+                "by_model": {k: v.as_dict() for k, v in self._by_model.items()},
+                "by_session": {k: v.as_dict() for k, v in self._by_session.items()},
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._by_agent.clear()
+            self._by_model.clear()
+            self._by_session.clear()
+
+
+def summarize_calls(calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aggregate a request's call log per agent
+
+    Args:
+        calls: Call dicts collected by UsageTracker.track
+
+    Returns:
+        {"total": {...}, "by_agent": {agent: {...}}}
+    """
+    total = _Totals()
+    by_agent: Dict[str, _Totals] = {}
+    for call in calls:
+        record = LLMCallRecord(**call)
+        total.add(record)
+        by_agent.setdefault(record.agent, _Totals()).add(record)
+    return {
+        "total": total.as_dict(),
+        "by_agent": {k: v.as_dict() for k, v in by_agent.items()},
+    }
+
+
+_usage_tracker = UsageTracker()
+
+
+def get_usage_tracker() -> UsageTracker:
+    """Get the process-wide usage tracker"""
+    return _usage_tracker
@@ -0,0 +1,97 @@
+"""
+Warm-up - Loads heavy components (embedding model, FAISS index, EasyOCR,
+Whisper, a SymPy sandbox worker) concurrently in background threads, with
+readiness reported per component
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class WarmUp:
+    """
+    Runs one loader per component, each in its own daemon thread
+
+    Loaders are the components' own lazy initializers, which are locked: a
+    request that needs a component while it is loading waits for that load
+    instead of starting another, and requests that do not need it (e.g.
+    text solves while Whisper loads) are not held up at all.
+    """
+
+    def __init__(self, loaders: Dict[str, Callable[[], Any]]):
+        """
+        Args:
+            loaders: Component name -> function that loads it
+        """
+        self._loaders = dict(loaders)
+        self._status: Dict[str, Dict[str, Any]] = {
+            name: {"status": PENDING, "seconds": None, "error": None} for name in self._loaders
+        }
+        self._done = {name: threading.Event() for name in self._loaders}
+        self._lock = threading.Lock()
+        self._started_at: Optional[float] = None
+
+    def start(self) -> "WarmUp":
+        """Start loading every component; returns immediately"""
+        with self._lock:
+            if self._started_at is not None:
+                return self
+            self._started_at = time.monotonic()
+        logger.info(f"Warming up in the background: {', '.join(self._loaders)}")
+        for name in self._loaders:
+            threading.Thread(target=self._load, args=(name,), name=f"warmup-{name}", daemon=True).start()
+        return self
+
+    def _load(self, name: str) -> None:
+        start = time.monotonic()
+        with self._lock:
+            self._status[name]["status"] = LOADING
+        try:
+            self._loaders[name]()
+            status, error = READY, None
+            logger.info(f"Warm-up: {name} ready in {time.monotonic() - start:.1f}s")
+        except Exception as e:
+            # Not fatal: the component is loaded again on first use and fails there
+            status, error = FAILED, str(e)
+            logger.warning(f"Warm-up: {name} failed: {e}")
+        with self._lock:
+            self._status[name].update(
+                status=status, error=error, seconds=round(time.monotonic() - start, 2)
+            )
+        self._done[name].set()
+
+    def is_ready(self, name: str) -> bool:
+        with self._lock:
+            return name in self._status and self._status[name]["status"] == READY
+
+    def wait(self, names: Optional[Iterable[str]] = None, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the given components (default: all) finished loading
+
+        Returns:
+            True if they are all ready; False if one failed or `timeout` passed
+        """
+        names = [n for n in (names or self._loaders) if n in self._done]
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for name in names:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not self._done[name].wait(remaining):
+                return False
+        return all(self.is_ready(name) for name in names)
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns:
+            {component: {"status": pending|loading|ready|failed, "seconds", "error"}}
+        """
+        with self._lock:
+            return {name: dict(status) for name, status in self._status.items()}